@@ -1,5 +1,133 @@
-def verify_password(plain_password, stored_password):
-    return plain_password == stored_password
+import asyncio
+import base64
+import functools
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Passwords are stored as scrypt hashes: "scrypt$n$r$p$salt$hash", salt and
+# hash base64. Each hash costs ~50 ms and 16 MB, so logins hash on a small
+# dedicated pool (WEBSAGA_HASH_WORKERS threads; hashlib releases the GIL)
+# instead of the event loop or the shared request threadpool, and a burst of
+# logins queues there rather than starving every other request.
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+HASH_WORKERS = int(os.environ.get("WEBSAGA_HASH_WORKERS", 4))
+
+# Login hands out a signed token (HMAC-SHA256 over its claims) that later
+# requests check without a database lookup. WEBSAGA_SECRET_KEY must be set,
+# and shared, when more than one worker serves requests; without it each
+# process signs with its own random key and tokens die with the process.
+SECRET_KEY = os.environ.get("WEBSAGA_SECRET_KEY") or secrets.token_hex(32)
+TOKEN_TTL_SECONDS = int(os.environ.get("WEBSAGA_TOKEN_TTL_SECONDS", 8 * 3600))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=128 * r * (n + p + 2), dklen=32)
+
 
 def get_password_hash(password):
-    return password
\ No newline at end of file
+    salt = os.urandom(16)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def verify_password(plain_password, stored_password):
+    # Rows written before hashing hold the password itself; they still log in
+    # (and are rehashed by the login route, see needs_rehash)
+    if not stored_password.startswith("scrypt$"):
+        return hmac.compare_digest(plain_password.encode(), stored_password.encode())
+    try:
+        _, n, r, p, salt, digest = stored_password.split("$")
+        expected = _b64decode(digest)
+        actual = _scrypt(plain_password, _b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def needs_rehash(stored_password):
+    # Plaintext rows, and hashes made with other parameters than today's
+    return not stored_password.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+
+@functools.lru_cache(maxsize=None)
+def _unknown_user_hash():
+    # Checked against when the username does not exist, so unknown users take
+    # as long to reject as wrong passwords
+    return get_password_hash(secrets.token_hex(16))
+
+
+def _hash_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+        return _executor
+
+
+async def hash_password_async(password):
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor(), get_password_hash, password)
+
+
+async def verify_password_async(plain_password, stored_password):
+    if stored_password is None:
+        stored_password = _unknown_user_hash()
+    return await asyncio.get_running_loop().run_in_executor(
+        _hash_executor(), verify_password, plain_password, stored_password
+    )
+
+
+def _sign(payload):
+    return _b64encode(hmac.new(SECRET_KEY.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(faculty, now=None):
+    issued_at = int(now if now is not None else time.time())
+    claims = {
+        "sub": faculty.id, "name": faculty.name, "role": faculty.user_type,
+        "iat": issued_at, "exp": issued_at + TOKEN_TTL_SECONDS,
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_token(token, now=None):
+    # The token's claims, or None when it is malformed, forged or expired
+    payload, _, signature = (token or "").partition(".")
+    if not payload or not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if not isinstance(claims, dict) or not isinstance(claims.get("exp"), int):
+        return None
+    if claims["exp"] <= (now if now is not None else time.time()):
+        return None
+    return claims
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,168 @@
+import json
+import threading
+import uuid
+from concurrent.futures import as_completed
+from datetime import datetime
+from sqlalchemy.orm import Session
+from . import models, schemas, qp_generator, qp_items
+from .database import SessionLocal
+from .jobs import JobRegistry
+from .workers import get_executor
+
+_jobs = JobRegistry()
+
+
+class BatchJob:
+    def __init__(self, request):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.status = "pending"  # pending, running, completed, failed
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self.errors = {}  # course_id -> reason
+        self.generated_qp_ids = []
+        self.created_at = datetime.utcnow().isoformat()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "regulation_id": self.request.regulation_id,
+                "year": self.request.year,
+                "semester": self.request.semester,
+                "assessment_type": self.request.assessment_type,
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+                "errors": dict(self.errors),
+                "generated_qp_ids": list(self.generated_qp_ids),
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+
+def get_job(job_id: str):
+    return _jobs.get(job_id)
+
+
+def list_jobs():
+    return _jobs.list()
+
+
+def _matching_courses(db: Session, request):
+    # (course_id, program_id) for every active course of the regulation/year/semester.
+    # The program comes from the course branch's program mapping unless given.
+    query = db.query(models.Course.id, models.ProgramBranchMapping.program_id).outerjoin(
+        models.ProgramBranchMapping,
+        models.ProgramBranchMapping.branch_id == models.Course.branch_id,
+    ).filter(
+        models.Course.regulation_id == request.regulation_id,
+        models.Course.year == request.year,
+        models.Course.semester == request.semester,
+        models.Course.status == True,
+    )
+    courses = {}
+    for course_id, program_id in query.all():
+        courses.setdefault(course_id, request.program_id or program_id)
+    return courses
+
+
+def _course_blueprint(request, course_id):
+    # Keep batch runs reproducible while giving every course its own draw
+    data = request.blueprint.dict()
+    if data.get("seed") is not None:
+        data["seed"] = data["seed"] + course_id
+    data["academic_year"] = data.get("academic_year") or request.academic_year
+    return schemas.QPBlueprint(course_id=course_id, **data)
+
+
+def start_batch_job(db: Session, request):
+    job = BatchJob(request)
+    courses = _matching_courses(db, request)
+    job.total = len(courses)
+    pools = qp_generator.load_pools(db, list(courses))
+    usages = qp_generator.load_usages(db, list(courses)) if request.blueprint.avoid_reuse else {}
+    _jobs.add(job)
+    thread = threading.Thread(target=_run_job, args=(job, courses, pools, usages), daemon=True)
+    thread.start()
+    return job
+
+
+def _run_job(job, courses, pools, usages):
+    with job._lock:
+        job.status = "running"
+    results = {}
+    try:
+        executor = get_executor()
+        futures = {}
+        for course_id, program_id in courses.items():
+            if program_id is None:
+                with job._lock:
+                    job.failed += 1
+                    job.errors[course_id] = "Course branch is not mapped to a program"
+                continue
+            blueprint = _course_blueprint(job.request, course_id)
+            future = executor.submit(qp_generator.select_questions, pools[course_id], blueprint, None, usages.get(course_id))
+            futures[future] = course_id
+
+        for future in as_completed(futures):
+            course_id = futures[future]
+            try:
+                results[course_id] = future.result()
+                with job._lock:
+                    job.completed += 1
+            except Exception as e:
+                with job._lock:
+                    job.failed += 1
+                    job.errors[course_id] = str(e)
+
+        if results:
+            qp_ids = _save_papers(job.request, courses, results)
+            with job._lock:
+                job.generated_qp_ids = qp_ids
+        with job._lock:
+            job.status = "completed"
+    except Exception as e:
+        with job._lock:
+            job.status = "failed"
+            job.errors[0] = str(e)
+    finally:
+        with job._lock:
+            job.finished_at = datetime.utcnow().isoformat()
+        _jobs.finish(job)
+
+
+def _save_papers(request, courses, results):
+    db = SessionLocal()
+    try:
+        question_ids = [c[0] for chosen, _ in results.values() for c in chosen]
+        texts = qp_generator.fetch_question_texts(db, question_ids)
+        created_at = datetime.utcnow().isoformat()
+        papers = []
+        for course_id, (chosen, unmet) in results.items():
+            paper = qp_generator.build_paper(course_id, chosen, unmet, texts)
+            papers.append(models.GeneratedQP(
+                program_id=courses[course_id],
+                course_id=course_id,
+                assessment_type=request.assessment_type,
+                date_of_exam=request.date_of_exam,
+                regulation_id=request.regulation_id,
+                year=request.year,
+                semester=request.semester,
+                academic_year=request.academic_year,
+                questions=json.dumps(paper["questions"]),
+                created_at=created_at,
+            ))
+        # The flush assigns each paper its own id; nothing is matched back
+        # by value, so concurrent batches cannot pick up each other's rows
+        db.add_all(papers)
+        db.flush()
+        qp_items.save_items(db, [(qp.id, qp.course_id, qp.academic_year, qp.questions) for qp in papers])
+        db.commit()
+        return [qp.id for qp in papers]
+    finally:
+        db.close()
@@ -0,0 +1,170 @@
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from . import models
+from .database import on_commit
+
+CACHE_ENABLED = os.environ.get("WEBSAGA_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+CACHE_TTL_SECONDS = float(os.environ.get("WEBSAGA_CACHE_TTL_SECONDS", 300))
+CACHE_MAX_ENTRIES = int(os.environ.get("WEBSAGA_CACHE_MAX_ENTRIES", 1024))
+
+# How often a worker re-reads the shared version counters to notice writes made
+# by other processes. Writes made by this process are noticed immediately.
+VERSION_CHECK_SECONDS = float(os.environ.get("WEBSAGA_CACHE_VERSION_CHECK_SECONDS", 1.0))
+
+
+class LRUCache:
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": CACHE_ENABLED,
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+lookup_cache = LRUCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+
+_versions = {}
+_versions_checked_at = 0.0
+_versions_lock = threading.Lock()
+
+
+def _current_versions(db):
+    global _versions, _versions_checked_at
+    now = time.monotonic()
+    with _versions_lock:
+        if now - _versions_checked_at < VERSION_CHECK_SECONDS:
+            return _versions
+    rows = db.query(models.CacheVersion.name, models.CacheVersion.version).all()
+    with _versions_lock:
+        _versions = dict(rows)
+        _versions_checked_at = now
+        return _versions
+
+
+def table_versions(db, tables):
+    # Fresh (version, updated_at) per table, for callers that cannot accept the
+    # short cross-process lag of the cached counters. The same read is pinned
+    # to the session, so cached getters called with it afterwards key on
+    # exactly these versions: an ETag built from them always describes the
+    # body served with it. The shared snapshot is refreshed on the way.
+    global _versions, _versions_checked_at
+    now = time.monotonic()
+    rows = db.query(models.CacheVersion.name, models.CacheVersion.version, models.CacheVersion.updated_at).all()
+    versions = {name: version for name, version, _ in rows}
+    db.info["cache_versions"] = versions
+    with _versions_lock:
+        _versions = versions
+        _versions_checked_at = now
+    found = {name: (version, updated_at) for name, version, updated_at in rows}
+    return {table: found.get(table, (0, None)) for table in tables}
+
+
+def _expire_versions():
+    global _versions_checked_at
+    with _versions_lock:
+        _versions_checked_at = 0.0
+
+
+def bump(db, *tables):
+    # Called by crud inside the write transaction, so the new version becomes
+    # visible to other workers exactly when the data does
+    table = models.CacheVersion.__table__
+    dialect = db.get_bind().dialect.name
+    now = datetime.utcnow().replace(microsecond=0)
+    for name in tables:
+        if dialect == "postgresql":
+            db.execute(postgresql.insert(table).values(name=name, version=0).on_conflict_do_nothing())
+        elif dialect == "sqlite":
+            db.execute(sqlite.insert(table).values(name=name, version=0).on_conflict_do_nothing())
+        elif db.query(models.CacheVersion.name).filter(models.CacheVersion.name == name).first() is None:
+            db.execute(table.insert().values(name=name, version=0))
+        db.execute(table.update().where(table.c.name == name).values(version=table.c.version + 1, updated_at=now))
+    db.info.pop("cache_versions", None)
+    on_commit(db, _expire_versions)
+
+
+# Caches a crud getter. The result is stored as the given pydantic schema
+# (or a list of them with many=True) so cached values never hold a session.
+# Entries are keyed on the current version of every table the getter reads,
+# or on the versions pinned to the session by table_versions.
+def cached(tables, schema, many=False):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(db, *args, **kwargs):
+            if not CACHE_ENABLED:
+                return fn(db, *args, **kwargs)
+            versions = db.info.get("cache_versions") or _current_versions(db)
+            key = (
+                fn.__name__,
+                args,
+                tuple(sorted(kwargs.items())),
+                tuple(versions.get(table, 0) for table in tables),
+            )
+            found, value = lookup_cache.get(key)
+            if found:
+                return value
+            result = fn(db, *args, **kwargs)
+            if many:
+                value = [schema.model_validate(row) for row in result]
+            else:
+                value = schema.model_validate(result) if result is not None else None
+            lookup_cache.set(key, value)
+            return value
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
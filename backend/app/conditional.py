@@ -0,0 +1,61 @@
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Depends, HTTPException, Request, Response
+from . import cache
+from .database import DBSession, get_read_session
+
+
+def _etag(request: Request, versions):
+    # Strong validator: same URL and same table versions means same body
+    parts = [request.url.path, request.url.query]
+    parts.extend(f"{table}:{version}" for table, (version, _) in sorted(versions.items()))
+    return '"' + hashlib.sha1("|".join(parts).encode()).hexdigest()[:20] + '"'
+
+
+def _last_modified(versions):
+    stamps = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+    return max(stamps) if stamps else None
+
+
+def etag_matches(if_none_match, etag):
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _not_modified_since(if_modified_since, last_modified):
+    # Last-Modified has one second resolution, so a date in the same second as
+    # the last write cannot rule out a second write later in that second; only
+    # a strictly later date counts. The ETag is the exact validator.
+    try:
+        since = parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return False
+    return last_modified.replace(microsecond=0) < since
+
+
+# Route dependency for conditional GETs on data stored in the given tables.
+# Answers 304 before the handler runs, so unchanged rows are never loaded or
+# serialized; otherwise sets ETag and Last-Modified on the response. The
+# versions read here are pinned to the request's session, and the handler's
+# cached getters key on them, so the body always matches the ETag.
+def conditional_get(*tables):
+    async def dependency(request: Request, response: Response,
+                         db: DBSession = Depends(get_read_session, scope="function")):
+        versions = await db.run(cache.table_versions, tables)
+        etag = _etag(request, versions)
+        last_modified = _last_modified(versions)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if last_modified is not None:
+            headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            not_modified = etag_matches(if_none_match, etag)
+        else:
+            if_modified_since = request.headers.get("if-modified-since")
+            not_modified = bool(if_modified_since and last_modified and _not_modified_since(if_modified_since, last_modified))
+        if not_modified:
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return dependency
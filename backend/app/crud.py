@@ -1,19 +1,46 @@
+from pydantic import ValidationError
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import models, schemas, qp_generator, cache, dedupe, qp_items
+from .database import on_commit
 from datetime import datetime
 
+# Every write to a cached or conditionally served table goes through here: it
+# bumps the shared table versions, which key the lookup cache and HTTP ETags.
+def _tables_changed(db: Session, *tables):
+    cache.bump(db, *tables)
+
+# List getters page in id order. Offset paging costs O(skip) rows per page;
+# with after_id (the last id of the previous page) the primary key or a
+# (filter, id) index seeks straight to the next page.
+def _paginate(query, id_column, skip=0, limit=100, after_id=None):
+    if after_id is not None:
+        return query.filter(id_column > after_id).order_by(id_column).limit(limit).all()
+    return query.order_by(id_column).offset(skip).limit(limit).all()
+
+# Lean reads for the big list endpoints: only the columns the response schema
+# shows, as plain dicts, skipping ORM hydration. Routes send these straight to
+# orjson (pagination.json_page) without a response_model pass.
+def _schema_query(db: Session, model, schema):
+    return db.query(*(model.__table__.c[name] for name in schema.model_fields))
+
+def _as_dicts(rows):
+    return [dict(row._mapping) for row in rows]
+
 # Programs
-def get_programs(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Program).offset(skip).limit(limit).all()
+@cache.cached(("programs",), schemas.Program, many=True)
+def get_programs(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    return _paginate(db.query(models.Program), models.Program.id, skip, limit, after_id)
 
+@cache.cached(("programs",), schemas.Program)
 def get_program(db: Session, program_id: int):
     return db.query(models.Program).filter(models.Program.id == program_id).first()
 
 def create_program(db: Session, program: schemas.ProgramCreate):
     db_program = models.Program(**program.dict())
     db.add(db_program)
-    db.commit()
-    db.refresh(db_program)
+    db.flush()
+    _tables_changed(db, "programs")
     return db_program
 
 def update_program(db: Session, program_id: int, program: schemas.ProgramUpdate):
@@ -22,36 +49,57 @@ def update_program(db: Session, program_id: int, program: schemas.ProgramUpdate)
         update_data = program.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_program, key, value)
-        db.commit()
-        db.refresh(db_program)
+        db.flush()
+        _tables_changed(db, "programs")
     return db_program
 
 def delete_program(db: Session, program_id: int):
     db_program = db.query(models.Program).filter(models.Program.id == program_id).first()
     if db_program:
         db.delete(db_program)
-        db.commit()
+        db.flush()
+        _tables_changed(db, "programs")
     return db_program
 
 # Branches
-def get_branches(db: Session, skip: int = 0, limit: int = 100):
-    branches = db.query(models.Branch).offset(skip).limit(limit).all()
-    # Add program_name to each branch
-    for branch in branches:
-        mapping = db.query(models.ProgramBranchMapping).filter(models.ProgramBranchMapping.branch_id == branch.id).first()
-        if mapping:
-            program = db.query(models.Program).filter(models.Program.id == mapping.program_id).first()
-            branch.program_name = program.name if program else None
-    return branches
+# Name of a program for Branch.program_name on writes: one primary key lookup,
+# read in the writing transaction so it is never stale
+def _program_name(db: Session, program_id: int):
+    program = db.query(models.Program.name).filter(models.Program.id == program_id).first()
+    return program.name if program else None
+
+def _branch_program_name():
+    # Name of the program of the branch's first mapping, resolved in the same statement
+    return (
+        select(models.Program.name)
+        .join(models.ProgramBranchMapping, models.ProgramBranchMapping.program_id == models.Program.id)
+        .where(models.ProgramBranchMapping.branch_id == models.Branch.id)
+        .order_by(models.ProgramBranchMapping.id)
+        .limit(1)
+        .correlate(models.Branch)
+        .scalar_subquery()
+    )
+
+def _query_branches(db: Session):
+    return db.query(models.Branch, _branch_program_name().label("program_name"))
+
+def _with_program_name(row):
+    branch, program_name = row
+    branch.program_name = program_name
+    return branch
 
+# Branch reads also depend on program names and mappings
+BRANCH_TABLES = ("branches", "programs", "program_branch_mappings")
+
+@cache.cached(BRANCH_TABLES, schemas.Branch, many=True)
+def get_branches(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    rows = _paginate(_query_branches(db), models.Branch.id, skip, limit, after_id)
+    return [_with_program_name(row) for row in rows]
+
+@cache.cached(BRANCH_TABLES, schemas.Branch)
 def get_branch(db: Session, branch_id: int):
-    branch = db.query(models.Branch).filter(models.Branch.id == branch_id).first()
-    if branch:
-        mapping = db.query(models.ProgramBranchMapping).filter(models.ProgramBranchMapping.branch_id == branch.id).first()
-        if mapping:
-            program = db.query(models.Program).filter(models.Program.id == mapping.program_id).first()
-            branch.program_name = program.name if program else None
-    return branch
+    row = _query_branches(db).filter(models.Branch.id == branch_id).first()
+    return _with_program_name(row) if row else None
 
 def create_branch(db: Session, branch: schemas.BranchCreate):
     # Extract program_id
@@ -61,17 +109,16 @@ def create_branch(db: Session, branch: schemas.BranchCreate):
     
     db_branch = models.Branch(**branch_data)
     db.add(db_branch)
-    db.commit()
-    db.refresh(db_branch)
+    db.flush()
     
     # Create mapping
     mapping = schemas.ProgramBranchMappingCreate(program_id=program_id, branch_id=db_branch.id)
     create_program_branch_mapping(db, mapping)
     
     # Add program_name to response
-    program = db.query(models.Program).filter(models.Program.id == program_id).first()
-    db_branch.program_name = program.name if program else None
+    db_branch.program_name = _program_name(db, program_id)
     
+    _tables_changed(db, "branches")
     return db_branch
 
 def update_branch(db: Session, branch_id: int, branch: schemas.BranchCreate):
@@ -85,43 +132,48 @@ def update_branch(db: Session, branch_id: int, branch: schemas.BranchCreate):
         # Update branch fields
         for key, value in branch_data.items():
             setattr(db_branch, key, value)
-        db.commit()
-        db.refresh(db_branch)
         
         # Update mapping
-        existing_mapping = db.query(models.ProgramBranchMapping).filter(models.ProgramBranchMapping.branch_id == branch_id).first()
+        existing_mapping = db.query(models.ProgramBranchMapping).filter(models.ProgramBranchMapping.branch_id == branch_id).order_by(models.ProgramBranchMapping.id).first()
         if existing_mapping:
             existing_mapping.program_id = program_id
-            db.commit()
+            db.flush()
+            _tables_changed(db, "program_branch_mappings")
         else:
             # Create new mapping if not exists
             mapping = schemas.ProgramBranchMappingCreate(program_id=program_id, branch_id=branch_id)
             create_program_branch_mapping(db, mapping)
         
         # Add program_name
-        program = db.query(models.Program).filter(models.Program.id == program_id).first()
-        db_branch.program_name = program.name if program else None
+        db_branch.program_name = _program_name(db, program_id)
+        _tables_changed(db, "branches")
     return db_branch
 
 def delete_branch(db: Session, branch_id: int):
     db_branch = db.query(models.Branch).filter(models.Branch.id == branch_id).first()
     if db_branch:
+        # The branch's program mappings go with it
+        db.query(models.ProgramBranchMapping).filter(models.ProgramBranchMapping.branch_id == branch_id).delete(
+            synchronize_session=False)
         db.delete(db_branch)
-        db.commit()
+        db.flush()
+        _tables_changed(db, "branches", "program_branch_mappings")
     return db_branch
 
 # Regulations
-def get_regulations(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Regulation).offset(skip).limit(limit).all()
+@cache.cached(("regulations",), schemas.Regulation, many=True)
+def get_regulations(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    return _paginate(db.query(models.Regulation), models.Regulation.id, skip, limit, after_id)
 
+@cache.cached(("regulations",), schemas.Regulation)
 def get_regulation(db: Session, regulation_id: int):
     return db.query(models.Regulation).filter(models.Regulation.id == regulation_id).first()
 
 def create_regulation(db: Session, regulation: schemas.RegulationCreate):
     db_regulation = models.Regulation(**regulation.dict())
     db.add(db_regulation)
-    db.commit()
-    db.refresh(db_regulation)
+    db.flush()
+    _tables_changed(db, "regulations")
     return db_regulation
 
 def update_regulation(db: Session, regulation_id: int, regulation: schemas.RegulationCreate):
@@ -129,42 +181,33 @@ def update_regulation(db: Session, regulation_id: int, regulation: schemas.Regul
     if db_regulation:
         for key, value in regulation.dict().items():
             setattr(db_regulation, key, value)
-        db.commit()
-        db.refresh(db_regulation)
+        db.flush()
+        _tables_changed(db, "regulations")
     return db_regulation
 
 def delete_regulation(db: Session, regulation_id: int):
     db_regulation = db.query(models.Regulation).filter(models.Regulation.id == regulation_id).first()
     if db_regulation:
         db.delete(db_regulation)
-        db.commit()
+        db.flush()
+        _tables_changed(db, "regulations")
     return db_regulation
 
 # Program-Branch Mappings
-def get_program_branch_mappings(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.ProgramBranchMapping).offset(skip).limit(limit).all()
+def get_program_branch_mappings(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    return _paginate(db.query(models.ProgramBranchMapping), models.ProgramBranchMapping.id, skip, limit, after_id)
 
 def create_program_branch_mapping(db: Session, mapping: schemas.ProgramBranchMappingCreate):
     db_mapping = models.ProgramBranchMapping(**mapping.dict())
     db.add(db_mapping)
-    db.commit()
-    db.refresh(db_mapping)
-    return db_mapping
-
-# Program-Branch Mappings
-def get_program_branch_mappings(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.ProgramBranchMapping).offset(skip).limit(limit).all()
-
-def create_program_branch_mapping(db: Session, mapping: schemas.ProgramBranchMappingCreate):
-    db_mapping = models.ProgramBranchMapping(**mapping.dict())
-    db.add(db_mapping)
-    db.commit()
-    db.refresh(db_mapping)
+    db.flush()
+    _tables_changed(db, "program_branch_mappings")
     return db_mapping
 
 # Courses
-def get_courses(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Course).offset(skip).limit(limit).all()
+def get_courses(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    query = _schema_query(db, models.Course, schemas.Course)
+    return _as_dicts(_paginate(query, models.Course.id, skip, limit, after_id))
 
 def get_course(db: Session, course_id: int):
     return db.query(models.Course).filter(models.Course.id == course_id).first()
@@ -172,8 +215,8 @@ def get_course(db: Session, course_id: int):
 def create_course(db: Session, course: schemas.CourseCreate):
     db_course = models.Course(**course.dict())
     db.add(db_course)
-    db.commit()
-    db.refresh(db_course)
+    db.flush()
+    _tables_changed(db, "courses")
     return db_course
 
 def update_course(db: Session, course_id: int, course: schemas.CourseCreate):
@@ -181,40 +224,49 @@ def update_course(db: Session, course_id: int, course: schemas.CourseCreate):
     if db_course:
         for key, value in course.dict().items():
             setattr(db_course, key, value)
-        db.commit()
-        db.refresh(db_course)
+        db.flush()
+        _tables_changed(db, "courses")
     return db_course
 
 def delete_course(db: Session, course_id: int):
     db_course = db.query(models.Course).filter(models.Course.id == course_id).first()
     if db_course:
         db.delete(db_course)
-        db.commit()
+        db.flush()
+        _tables_changed(db, "courses")
     return db_course
 
 # Branch-Course Mappings
-def get_branch_course_mappings(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.BranchCourseMapping).offset(skip).limit(limit).all()
+def get_branch_course_mappings(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    return _paginate(db.query(models.BranchCourseMapping), models.BranchCourseMapping.id, skip, limit, after_id)
 
 def create_branch_course_mapping(db: Session, mapping: schemas.BranchCourseMappingCreate):
     db_mapping = models.BranchCourseMapping(**mapping.dict())
     db.add(db_mapping)
-    db.commit()
-    db.refresh(db_mapping)
+    db.flush()
     return db_mapping
 
 # Faculties
-def get_faculties(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Faculty).offset(skip).limit(limit).all()
+def get_faculties(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    query = _schema_query(db, models.Faculty, schemas.Faculty)
+    return _as_dicts(_paginate(query, models.Faculty.id, skip, limit, after_id))
 
 def get_faculty(db: Session, faculty_id: int):
     return db.query(models.Faculty).filter(models.Faculty.id == faculty_id).first()
 
+def get_faculty_by_username(db: Session, username: str):
+    return db.query(models.Faculty).filter(models.Faculty.username == username).first()
+
+def set_password_hash(db: Session, faculty_id: int, password_hash: str):
+    db.query(models.Faculty).filter(models.Faculty.id == faculty_id).update(
+        {"password_hash": password_hash}, synchronize_session=False)
+    _tables_changed(db, "faculties")
+
 def create_faculty(db: Session, faculty: schemas.FacultyCreate):
     db_faculty = models.Faculty(**faculty.dict())
     db.add(db_faculty)
-    db.commit()
-    db.refresh(db_faculty)
+    db.flush()
+    _tables_changed(db, "faculties")
     return db_faculty
 
 def update_faculty(db: Session, faculty_id: int, faculty: schemas.FacultyCreate):
@@ -222,59 +274,62 @@ def update_faculty(db: Session, faculty_id: int, faculty: schemas.FacultyCreate)
     if db_faculty:
         for key, value in faculty.dict().items():
             setattr(db_faculty, key, value)
-        db.commit()
-        db.refresh(db_faculty)
+        db.flush()
+        _tables_changed(db, "faculties")
     return db_faculty
 
 def delete_faculty(db: Session, faculty_id: int):
     db_faculty = db.query(models.Faculty).filter(models.Faculty.id == faculty_id).first()
     if db_faculty:
         db.delete(db_faculty)
-        db.commit()
+        db.flush()
+        _tables_changed(db, "faculties")
     return db_faculty
 
 # Faculty-Course Mappings
-def get_faculty_course_mappings(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.FacultyCourseMapping).offset(skip).limit(limit).all()
+def get_faculty_course_mappings(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    return _paginate(db.query(models.FacultyCourseMapping), models.FacultyCourseMapping.id, skip, limit, after_id)
 
 def create_faculty_course_mapping(db: Session, mapping: schemas.FacultyCourseMappingCreate):
     db_mapping = models.FacultyCourseMapping(**mapping.dict())
     db.add(db_mapping)
-    db.commit()
-    db.refresh(db_mapping)
+    db.flush()
     return db_mapping
 
 # Blooms Levels
-def get_blooms_levels(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.BloomsLevel).offset(skip).limit(limit).all()
+@cache.cached(("blooms_levels",), schemas.BloomsLevel, many=True)
+def get_blooms_levels(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    return _paginate(db.query(models.BloomsLevel), models.BloomsLevel.id, skip, limit, after_id)
 
 def create_blooms_level(db: Session, level: schemas.BloomsLevelCreate):
     db_level = models.BloomsLevel(**level.dict())
     db.add(db_level)
-    db.commit()
-    db.refresh(db_level)
+    db.flush()
+    _tables_changed(db, "blooms_levels")
     return db_level
 
 # Difficulty Levels
-def get_difficulty_levels(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.DifficultyLevel).offset(skip).limit(limit).all()
+@cache.cached(("difficulty_levels",), schemas.DifficultyLevel, many=True)
+def get_difficulty_levels(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    return _paginate(db.query(models.DifficultyLevel), models.DifficultyLevel.id, skip, limit, after_id)
 
 def create_difficulty_level(db: Session, level: schemas.DifficultyLevelCreate):
     db_level = models.DifficultyLevel(**level.dict())
     db.add(db_level)
-    db.commit()
-    db.refresh(db_level)
+    db.flush()
+    _tables_changed(db, "difficulty_levels")
     return db_level
 
 # Units
-def get_units(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Unit).offset(skip).limit(limit).all()
+@cache.cached(("units",), schemas.Unit, many=True)
+def get_units(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    return _paginate(db.query(models.Unit), models.Unit.id, skip, limit, after_id)
 
 def create_unit(db: Session, unit: schemas.UnitCreate):
     db_unit = models.Unit(**unit.dict())
     db.add(db_unit)
-    db.commit()
-    db.refresh(db_unit)
+    db.flush()
+    _tables_changed(db, "units")
     return db_unit
 
 # Course Outcomes
@@ -284,24 +339,40 @@ def get_course_outcomes(db: Session, course_id: int):
 def create_course_outcome(db: Session, outcome: schemas.CourseOutcomeCreate):
     db_outcome = models.CourseOutcome(**outcome.dict())
     db.add(db_outcome)
-    db.commit()
-    db.refresh(db_outcome)
+    db.flush()
     return db_outcome
 
 # Questions
-def get_questions(db: Session, course_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.Question).filter(models.Question.course_id == course_id).offset(skip).limit(limit).all()
+def get_questions(db: Session, course_id: int, skip: int = 0, limit: int = 100, after_id: int = None):
+    query = _schema_query(db, models.Question, schemas.Question).filter(models.Question.course_id == course_id)
+    return _as_dicts(_paginate(query, models.Question.id, skip, limit, after_id))
+
+def get_question(db: Session, question_id: int):
+    return db.query(models.Question).filter(models.Question.id == question_id).first()
 
 def create_question(db: Session, question: schemas.QuestionCreate):
     db_question = models.Question(**question.dict())
     db.add(db_question)
-    db.commit()
-    db.refresh(db_question)
+    db.flush()
+    db_question.possible_duplicates = dedupe.check_new_question(db, db_question)
+    course_id = db_question.course_id
+    on_commit(db, lambda: qp_generator.invalidate_pool(course_id))
     return db_question
 
 # Generated QPs
-def get_generated_qps(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.GeneratedQP).offset(skip).limit(limit).all()
+def get_generated_qps(db: Session, skip: int = 0, limit: int = 100, course_id: int = None,
+                      academic_year: str = None, assessment_type: str = None, after_id: int = None):
+    query = _schema_query(db, models.GeneratedQP, schemas.GeneratedQP)
+    if course_id is not None:
+        query = query.filter(models.GeneratedQP.course_id == course_id)
+    if academic_year is not None:
+        query = query.filter(models.GeneratedQP.academic_year == academic_year)
+    if assessment_type is not None:
+        query = query.filter(models.GeneratedQP.assessment_type == assessment_type)
+    return _as_dicts(_paginate(query, models.GeneratedQP.id, skip, limit, after_id))
+
+def get_generated_qp(db: Session, qp_id: int):
+    return db.query(models.GeneratedQP).filter(models.GeneratedQP.id == qp_id).first()
 
 def create_generated_qp(db: Session, qp: schemas.GeneratedQPCreate):
     qp_data = qp.dict()
@@ -310,6 +381,274 @@ def create_generated_qp(db: Session, qp: schemas.GeneratedQPCreate):
         qp_data['created_at'] = datetime.utcnow().isoformat()
     db_qp = models.GeneratedQP(**qp_data)
     db.add(db_qp)
-    db.commit()
-    db.refresh(db_qp)
-    return db_qp
\ No newline at end of file
+    db.flush()
+    qp_items.save_items(db, [(db_qp.id, db_qp.course_id, db_qp.academic_year, db_qp.questions)])
+    return db_qp
+
+
+# Bulk operations
+# Rows are validated one by one so a bad row is reported instead of failing the
+# whole payload; the valid rows are then written with a single executemany.
+BULK_CHUNK_SIZE = 500
+
+def _chunks(values, size=BULK_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _value_owners(db: Session, model, column_name: str, values):
+    # value -> id of the row that already holds it
+    column = getattr(model, column_name)
+    owners = {}
+    for chunk in _chunks(set(values)):
+        owners.update(db.query(column, model.id).filter(column.in_(chunk)).all())
+    return owners
+
+def _existing_ids(db: Session, model, ids):
+    found = set()
+    for chunk in _chunks(set(ids)):
+        found.update(row_id for (row_id,) in db.query(model.id).filter(model.id.in_(chunk)))
+    return found
+
+def _bulk_result(size):
+    return {"created": 0, "updated": 0, "deleted": 0, "ids": [None] * size, "errors": []}
+
+def _validate_rows(schema, rows, result, exclude_unset=False):
+    valid = []
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, schema(**row).dict(exclude_unset=exclude_unset)))
+        except ValidationError as e:
+            message = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            result["errors"].append({"index": index, "error": message})
+        except TypeError as e:
+            result["errors"].append({"index": index, "error": str(e)})
+    return valid
+
+def _check_rows(db: Session, model, valid, result, unique, foreign_keys, updating=False):
+    errors = {}
+
+    if updating:
+        existing = _existing_ids(db, model, [data["id"] for _, data in valid])
+        for index, data in valid:
+            if data["id"] not in existing:
+                errors.setdefault(index, f"{model.__name__} {data['id']} not found")
+
+    for column_name in unique:
+        seen = {}
+        for index, data in valid:
+            value = data.get(column_name)
+            if value is None:
+                continue
+            if value in seen:
+                errors.setdefault(index, f"Duplicate {column_name} '{value}' in payload (row {seen[value]})")
+            else:
+                seen[value] = index
+        owners = _value_owners(db, model, column_name, seen)
+        for index, data in valid:
+            owner = owners.get(data.get(column_name))
+            if owner is not None and owner != data.get("id"):
+                errors.setdefault(index, f"{column_name} '{data[column_name]}' already exists")
+
+    for column_name, target in foreign_keys.items():
+        referenced = {data[column_name] for _, data in valid if data.get(column_name) is not None}
+        found = _existing_ids(db, target, referenced)
+        for index, data in valid:
+            value = data.get(column_name)
+            if value is not None and value not in found:
+                errors.setdefault(index, f"{target.__name__} {value} not found")
+
+    for index, error in errors.items():
+        result["errors"].append({"index": index, "error": error})
+    result["errors"].sort(key=lambda e: e["index"])
+    return [(index, data) for index, data in valid if index not in errors]
+
+def bulk_create(db: Session, model, schema, rows, unique=(), foreign_keys=None, exclude=(), atomic=False):
+    result = _bulk_result(len(rows))
+    valid = _validate_rows(schema, rows, result)
+    valid = _check_rows(db, model, valid, result, unique, foreign_keys or {})
+    if not valid or (atomic and result["errors"]):
+        return result, []
+
+    values = [{k: v for k, v in data.items() if k not in exclude} for _, data in valid]
+    db.execute(model.__table__.insert(), values)
+
+    # executemany does not hand back primary keys; read them back by the unique key
+    key = unique[0]
+    ids = _value_owners(db, model, key, [data[key] for _, data in valid])
+    for index, data in valid:
+        result["ids"][index] = ids.get(data[key])
+    result["created"] = len(valid)
+    return result, valid
+
+def bulk_update(db: Session, model, schema, rows, unique=(), foreign_keys=None, exclude=(), atomic=False):
+    result = _bulk_result(len(rows))
+    valid = _validate_rows(schema, rows, result, exclude_unset=True)
+    valid = _check_rows(db, model, valid, result, unique, foreign_keys or {}, updating=True)
+    if not valid or (atomic and result["errors"]):
+        return result, []
+
+    db.bulk_update_mappings(model, [{k: v for k, v in data.items() if k not in exclude} for _, data in valid])
+    for index, data in valid:
+        result["ids"][index] = data["id"]
+    result["updated"] = len(valid)
+    return result, valid
+
+def _referencing(model):
+    # (table, column) for every foreign key that points at the model's rows
+    return [
+        (table, foreign_key.parent)
+        for table in models.Base.metadata.sorted_tables
+        for foreign_key in table.foreign_keys
+        if foreign_key.column is model.__table__.c.id
+    ]
+
+def bulk_delete(db: Session, model, ids, atomic=False, cascade=()):
+    # Rows still referenced from another table are reported as in use rather
+    # than deleted: SQLite (no FK enforcement) would orphan the references and
+    # PostgreSQL would fail the whole batch. Tables in cascade (models) are
+    # owned by the row and deleted with it instead.
+    result = _bulk_result(len(ids))
+    existing = _existing_ids(db, model, ids)
+    owned = {dependent.__table__ for dependent in cascade}
+    in_use = {}
+    for table, column in _referencing(model):
+        if table in owned:
+            continue
+        for chunk in _chunks(existing - set(in_use)):
+            for (row_id,) in db.query(column).filter(column.in_(chunk)).distinct():
+                in_use.setdefault(row_id, table.name)
+    for index, row_id in enumerate(ids):
+        if row_id not in existing:
+            result["errors"].append({"index": index, "error": f"{model.__name__} {row_id} not found"})
+        elif row_id in in_use:
+            result["errors"].append({"index": index, "error": f"{model.__name__} {row_id} is in use by {in_use[row_id]}"})
+        else:
+            result["ids"][index] = row_id
+    deletable = existing - set(in_use)
+    if not deletable or (atomic and result["errors"]):
+        result["ids"] = [None] * len(ids)
+        return result
+    for chunk in _chunks(deletable):
+        for table, column in _referencing(model):
+            if table in owned:
+                db.execute(table.delete().where(column.in_(chunk)))
+        db.execute(model.__table__.delete().where(model.id.in_(chunk)))
+    result["deleted"] = len(deletable)
+    return result
+
+def bulk_create_programs(db: Session, rows, atomic=False):
+    result, valid = bulk_create(db, models.Program, schemas.ProgramCreate, rows, unique=("name",), atomic=atomic)
+    if valid:
+        _tables_changed(db, "programs")
+    return result
+
+def bulk_update_programs(db: Session, rows, atomic=False):
+    result, valid = bulk_update(db, models.Program, schemas.ProgramBulkUpdate, rows, unique=("name",), atomic=atomic)
+    if valid:
+        _tables_changed(db, "programs")
+    return result
+
+def bulk_delete_programs(db: Session, ids, atomic=False):
+    result = bulk_delete(db, models.Program, ids, atomic=atomic)
+    if result["deleted"]:
+        _tables_changed(db, "programs")
+    return result
+
+def bulk_create_regulations(db: Session, rows, atomic=False):
+    result, valid = bulk_create(db, models.Regulation, schemas.RegulationCreate, rows, unique=("name",), atomic=atomic)
+    if valid:
+        _tables_changed(db, "regulations")
+    return result
+
+def bulk_update_regulations(db: Session, rows, atomic=False):
+    result, valid = bulk_update(db, models.Regulation, schemas.RegulationBulkUpdate, rows, unique=("name",), atomic=atomic)
+    if valid:
+        _tables_changed(db, "regulations")
+    return result
+
+def bulk_delete_regulations(db: Session, ids, atomic=False):
+    result = bulk_delete(db, models.Regulation, ids, atomic=atomic)
+    if result["deleted"]:
+        _tables_changed(db, "regulations")
+    return result
+
+def bulk_create_branches(db: Session, rows, atomic=False):
+    result, valid = bulk_create(db, models.Branch, schemas.BranchCreate, rows, unique=("code",),
+                                foreign_keys={"program_id": models.Program}, exclude=("program_id",), atomic=atomic)
+    if valid:
+        mappings = [{"program_id": data["program_id"], "branch_id": result["ids"][index], "status": True}
+                    for index, data in valid]
+        db.execute(models.ProgramBranchMapping.__table__.insert(), mappings)
+        _tables_changed(db, "branches", "program_branch_mappings")
+    return result
+
+def bulk_update_branches(db: Session, rows, atomic=False):
+    result, valid = bulk_update(db, models.Branch, schemas.BranchBulkUpdate, rows, unique=("code",),
+                                foreign_keys={"program_id": models.Program}, exclude=("program_id",), atomic=atomic)
+    if valid:
+        mapped = {branch_id for (branch_id,) in db.query(models.ProgramBranchMapping.branch_id).filter(
+            models.ProgramBranchMapping.branch_id.in_([data["id"] for _, data in valid]))}
+        moved = [{"b_id": data["id"], "p_id": data["program_id"]} for _, data in valid if data["id"] in mapped]
+        if moved:
+            mapping_table = models.ProgramBranchMapping.__table__
+            db.execute(
+                mapping_table.update()
+                .where(mapping_table.c.branch_id == bindparam("b_id"))
+                .values(program_id=bindparam("p_id")),
+                moved,
+            )
+        new = [{"program_id": data["program_id"], "branch_id": data["id"], "status": True}
+               for _, data in valid if data["id"] not in mapped]
+        if new:
+            db.execute(models.ProgramBranchMapping.__table__.insert(), new)
+        _tables_changed(db, "branches", "program_branch_mappings")
+    return result
+
+def bulk_delete_branches(db: Session, ids, atomic=False):
+    result = bulk_delete(db, models.Branch, ids, atomic=atomic, cascade=(models.ProgramBranchMapping,))
+    if result["deleted"]:
+        _tables_changed(db, "branches", "program_branch_mappings")
+    return result
+
+def bulk_create_courses(db: Session, rows, atomic=False):
+    result, valid = bulk_create(db, models.Course, schemas.CourseCreate, rows, unique=("code",),
+                            foreign_keys={"branch_id": models.Branch, "regulation_id": models.Regulation}, atomic=atomic)
+    if valid:
+        _tables_changed(db, "courses")
+    return result
+
+def bulk_update_courses(db: Session, rows, atomic=False):
+    result, valid = bulk_update(db, models.Course, schemas.CourseBulkUpdate, rows, unique=("code",),
+                            foreign_keys={"branch_id": models.Branch, "regulation_id": models.Regulation}, atomic=atomic)
+    if valid:
+        _tables_changed(db, "courses")
+    return result
+
+def bulk_delete_courses(db: Session, ids, atomic=False):
+    result = bulk_delete(db, models.Course, ids, atomic=atomic)
+    if result["deleted"]:
+        _tables_changed(db, "courses")
+    return result
+
+FACULTY_UNIQUE_COLUMNS = ("empid", "username", "email")
+
+def bulk_create_faculties(db: Session, rows, atomic=False):
+    result, valid = bulk_create(db, models.Faculty, schemas.FacultyCreate, rows, unique=FACULTY_UNIQUE_COLUMNS,
+                            foreign_keys={"branch_id": models.Branch}, atomic=atomic)
+    if valid:
+        _tables_changed(db, "faculties")
+    return result
+
+def bulk_update_faculties(db: Session, rows, atomic=False):
+    result, valid = bulk_update(db, models.Faculty, schemas.FacultyBulkUpdate, rows, unique=FACULTY_UNIQUE_COLUMNS,
+                            foreign_keys={"branch_id": models.Branch}, atomic=atomic)
+    if valid:
+        _tables_changed(db, "faculties")
+    return result
+
+def bulk_delete_faculties(db: Session, ids, atomic=False):
+    result = bulk_delete(db, models.Faculty, ids, atomic=atomic)
+    if result["deleted"]:
+        _tables_changed(db, "faculties")
+    return result
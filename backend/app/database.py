@@ -1,19 +1,222 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./websaga.db"
+# Engine settings come from the environment so each deployment can tune them.
+# Both SQLite and PostgreSQL (postgresql+psycopg2://...) URLs are supported; the
+# read URL can point at a replica.
+SQLALCHEMY_DATABASE_URL = os.environ.get("WEBSAGA_DATABASE_URL", "sqlite:///./websaga.db")
+SQLALCHEMY_READ_DATABASE_URL = os.environ.get("WEBSAGA_READ_DATABASE_URL", SQLALCHEMY_DATABASE_URL)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# "development" keeps SQLAlchemy's defaults; "production" turns on WAL, the
+# pragmas below, an explicit connection pool and a separate read-only engine.
+DB_PROFILE = os.environ.get("WEBSAGA_DB_PROFILE", "development")
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("WEBSAGA_SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_SIZE = int(os.environ.get("WEBSAGA_SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE = int(os.environ.get("WEBSAGA_SQLITE_CACHE_SIZE", -64000))  # negative = KiB
+SQLITE_SYNCHRONOUS = os.environ.get("WEBSAGA_SQLITE_SYNCHRONOUS", "NORMAL")
+
+DB_POOL_SIZE = int(os.environ.get("WEBSAGA_DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("WEBSAGA_DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = int(os.environ.get("WEBSAGA_DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("WEBSAGA_DB_POOL_RECYCLE", 1800))
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("WEBSAGA_DB_STATEMENT_TIMEOUT_MS", 30000))
+
+
+def _is_sqlite(url):
+    return url.startswith("sqlite")
+
+
+def _is_postgres(url):
+    return url.startswith("postgresql")
+
+
+def _set_sqlite_pragmas(engine, read_only=False):
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def _engine_kwargs(url, profile, read_only, is_async):
+    kwargs = {}
+    if _is_sqlite(url):
+        kwargs["connect_args"] = {"check_same_thread": False}
+    elif _is_postgres(url):
+        if is_async:
+            kwargs["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            kwargs["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+        if read_only:
+            kwargs["execution_options"] = {"postgresql_readonly": True}
+    # Server databases are always pooled; SQLite only in the production profile
+    if profile == "production" or not _is_sqlite(url):
+        kwargs.update(
+            poolclass=AsyncAdaptedQueuePool if is_async else QueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+    return kwargs
+
+
+def build_engine(url=SQLALCHEMY_DATABASE_URL, profile=DB_PROFILE, read_only=False):
+    engine = create_engine(url, **_engine_kwargs(url, profile, read_only, is_async=False))
+    if profile == "production" and _is_sqlite(url):
+        _set_sqlite_pragmas(engine, read_only=read_only)
+    return engine
+
+
+def _async_url(url):
+    # sqlite:// -> sqlite+aiosqlite://, postgresql[+driver]:// -> postgresql+asyncpg://
+    rest = url.split("://", 1)[1]
+    if _is_sqlite(url):
+        return "sqlite+aiosqlite://" + rest
+    if _is_postgres(url):
+        return "postgresql+asyncpg://" + rest
+    return url
+
+
+def build_async_engine(url=SQLALCHEMY_DATABASE_URL, profile=DB_PROFILE, read_only=False):
+    url = _async_url(url)
+    engine = create_async_engine(url, **_engine_kwargs(url, profile, read_only, is_async=True))
+    if profile == "production" and _is_sqlite(url):
+        _set_sqlite_pragmas(engine.sync_engine, read_only=read_only)
+    return engine
+
+
+engine = build_engine()
+# Requests commit once, after the response body has been serialized, so there
+# is nothing to gain from expiring loaded objects on commit
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# GET routes read through their own pool so readers never queue behind writers.
+# Outside the production profile, and without a replica URL, this is the same engine.
+_separate_read_engine = DB_PROFILE == "production" or SQLALCHEMY_READ_DATABASE_URL != SQLALCHEMY_DATABASE_URL
+if _separate_read_engine:
+    read_engine = build_engine(SQLALCHEMY_READ_DATABASE_URL, read_only=True)
+else:
+    read_engine = engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=read_engine,
+                                info={"read_only": True})
+
+# With WEBSAGA_ASYNC_DB=1 request handlers talk to the database through
+# aiosqlite/asyncpg instead of holding a threadpool worker per request. The sync
+# engine above stays available for scripts and background jobs.
+USE_ASYNC_DB = os.environ.get("WEBSAGA_ASYNC_DB", "0").lower() in ("1", "true", "yes")
+
+if USE_ASYNC_DB:
+    async_engine = build_async_engine()
+    if _separate_read_engine:
+        async_read_engine = build_async_engine(SQLALCHEMY_READ_DATABASE_URL, read_only=True)
+    else:
+        async_read_engine = async_engine
+    AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    AsyncReadSessionLocal = sessionmaker(bind=async_read_engine, class_=AsyncSession, autoflush=False,
+                                         expire_on_commit=False, info={"read_only": True})
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+# Read-only sessions refuse to write, whatever engine they are bound to
+@event.listens_for(Session, "before_flush")
+def _reject_read_only_flush(session, flush_context, instances):
+    if session.info.get("read_only") and (session.new or session.dirty or session.deleted):
+        raise InvalidRequestError("Attempted to write through a read-only session")
+
+# crud only flushes; side effects that must not be seen before the data is
+# committed (cache invalidation and the like) are queued with on_commit
+def on_commit(db, callback):
+    db.info.setdefault("on_commit", []).append(callback)
+
+@event.listens_for(Session, "after_commit")
+def _run_on_commit(session):
+    for callback in session.info.pop("on_commit", []):
+        callback()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_commit(session):
+    session.info.pop("on_commit", None)
+
+
+# Request-scoped handle used by the routers. crud stays a single set of sync
+# functions; DBSession runs them on the threadpool against a sync Session, or
+# inside AsyncSession.run_sync on the event loop when the async engine is on.
+# run_sync keeps the whole call on the event loop, so CPU-heavy handlers
+# (duplicate report, paper generation, bulk validation) take get_sync_session
+# instead and stay on the threadpool either way.
+class DBSession:
+    def __init__(self, session):
+        self.session = session
+
+    @property
+    def is_async(self):
+        return isinstance(self.session, AsyncSession)
+
+    async def run(self, fn, *args, **kwargs):
+        if self.is_async:
+            return await self.session.run_sync(lambda sync_session: fn(sync_session, *args, **kwargs))
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+    async def _call(self, method):
+        if self.is_async:
+            await getattr(self.session, method)()
+        else:
+            await run_in_threadpool(getattr(self.session, method))
+
+    async def commit(self):
+        await self._call("commit")
+
+    async def rollback(self):
+        await self._call("rollback")
+
+    async def close(self):
+        await self._call("close")
+
+
+def _session_factory(read_only, sync=False):
+    if USE_ASYNC_DB and not sync:
+        return AsyncReadSessionLocal if read_only else AsyncSessionLocal
+    return ReadSessionLocal if read_only else SessionLocal
+
+# One transaction per request: the read-write session commits once when the
+# handler succeeds and rolls back otherwise. Routers depend on these with
+# scope="function" so the commit lands, and the connection goes back to the
+# pool, before the response is sent.
+def _write_session(sync):
+    async def session():
+        db = DBSession(_session_factory(read_only=False, sync=sync)())
+        try:
+            yield db
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+        finally:
+            await db.close()
+    return session
+
+get_session = _write_session(sync=False)
+get_sync_session = _write_session(sync=True)
+
+async def get_read_session():
+    db = DBSession(_session_factory(read_only=True)())
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        await db.close()
@@ -0,0 +1,337 @@
+import hashlib
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from collections import defaultdict
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from . import models
+from .workers import get_executor
+from .database import SessionLocal
+
+# MinHash signatures over word unigrams and bigrams of the question text, split
+# into LSH bands. Two questions become candidates when any band hashes to the
+# same bucket; candidates are then confirmed with the exact Jaccard similarity
+# of their shingles. With 20 bands of 3 rows a pair at similarity 0.55 is found
+# with ~97% probability and one at 0.1 only ~2% of the time, so lookups touch a
+# handful of rows instead of the whole course.
+#
+# The permutations are derived from a fixed seed and are part of the stored
+# index: changing NUM_PERM, BANDS or SEED requires rebuilding question_lsh_bands.
+NUM_PERM = 60
+BANDS = 20
+ROWS = NUM_PERM // BANDS
+SEED = 20240601
+_PRIME = (1 << 31) - 1
+
+# Rewording a short question ("with an example" -> "with a suitable
+# example") already drops the word-and-bigram Jaccard to about 0.6
+DUPLICATE_THRESHOLD = 0.55
+
+# Per lookup, only the candidates sharing the most bands are verified, and LSH
+# buckets with more members than this are not compared pairwise
+MAX_CANDIDATES = 50
+
+# Signing runs at roughly 1-2k questions per second per core. Larger batches
+# are spread over the batch worker pool, and a request that finds more than
+# INLINE_INDEX_MAX unindexed questions (a bank loaded before this index
+# existed) hands them to a background thread instead of waiting.
+PARALLEL_MIN_QUESTIONS = 2000
+INLINE_INDEX_MAX = 2000
+INDEX_CHUNK_SIZE = 500
+
+# How long a course stays trusted as fully indexed before the cheap "any
+# questions missing from the index?" check runs again. Writes through crud
+# and the importer index themselves; this only catches raw inserts.
+INDEX_CHECK_SECONDS = 300
+
+_rng = random.Random(SEED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_indexed_courses = {}
+_backfilling = set()
+_indexed_lock = threading.Lock()
+
+
+class IndexNotReady(Exception):
+    pass
+
+
+def shingles(text):
+    words = _WORD.findall((text or "").lower())
+    return set(words) | {f"{words[i]} {words[i + 1]}" for i in range(len(words) - 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def signature(text):
+    hashes = [zlib.crc32(shingle.encode()) for shingle in shingles(text)] or [0]
+    return [min([(a * h + b) % _PRIME for h in hashes]) for a, b in _PERMUTATIONS]
+
+
+def band_buckets(sig):
+    buckets = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(struct.pack(f"{ROWS}I", *rows), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
+
+
+def band_rows(questions):
+    # questions: (id, course_id, text) tuples. Pure, so it can run in a worker process.
+    rows = []
+    for question_id, course_id, text in questions:
+        for band, bucket in enumerate(band_buckets(signature(text))):
+            rows.append({"question_id": question_id, "band": band, "course_id": course_id, "bucket": bucket})
+    return rows
+
+
+def index_questions(db: Session, questions):
+    questions = list(questions)
+    if not questions:
+        return
+    chunks = [questions[i:i + INDEX_CHUNK_SIZE] for i in range(0, len(questions), INDEX_CHUNK_SIZE)]
+    if len(questions) >= PARALLEL_MIN_QUESTIONS and len(chunks) > 1:
+        results = get_executor().map(band_rows, chunks)
+    else:
+        results = map(band_rows, chunks)
+    for rows in results:
+        _insert_bands(db, rows)
+
+
+def _insert_bands(db: Session, rows):
+    # Idempotent, since a background backfill and request-time indexing may
+    # meet on the same question
+    table = models.QuestionLSHBand.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        db.execute(postgresql.insert(table).on_conflict_do_nothing(), rows)
+    elif dialect == "sqlite":
+        db.execute(sqlite.insert(table).on_conflict_do_nothing(), rows)
+    else:
+        db.execute(table.insert(), rows)
+
+
+def _unindexed(db: Session, course_id: int):
+    indexed = db.query(models.QuestionLSHBand.question_id).filter(
+        models.QuestionLSHBand.question_id == models.Question.id
+    ).exists()
+    return db.query(models.Question.id, models.Question.course_id, models.Question.question_text).filter(
+        models.Question.course_id == course_id, ~indexed
+    )
+
+
+def _backfill(course_id: int):
+    db = SessionLocal()
+    try:
+        missing = _unindexed(db, course_id).all()
+        for start in range(0, len(missing), PARALLEL_MIN_QUESTIONS * 5):
+            index_questions(db, missing[start:start + PARALLEL_MIN_QUESTIONS * 5])
+            db.commit()
+        with _indexed_lock:
+            _indexed_courses[course_id] = time.monotonic()
+    except Exception:
+        db.rollback()
+    finally:
+        db.close()
+        with _indexed_lock:
+            _backfilling.discard(course_id)
+
+
+def start_backfill(course_id: int):
+    with _indexed_lock:
+        if course_id in _backfilling:
+            return
+        _backfilling.add(course_id)
+    threading.Thread(target=_backfill, args=(course_id,), daemon=True).start()
+
+
+def ensure_course_indexed(db: Session, course_id: int, force: bool = False):
+    # Signs questions that reached the table without being indexed (imports,
+    # raw inserts) and returns their ids. Returns False when the gap was too
+    # large and is being indexed in the background instead; force always
+    # indexes inline (used from background jobs).
+    with _indexed_lock:
+        if course_id in _backfilling and not force:
+            return False
+        checked_at = _indexed_courses.get(course_id)
+    if not force and checked_at is not None and time.monotonic() - checked_at < INDEX_CHECK_SECONDS:
+        return []
+    query = _unindexed(db, course_id)
+    missing = query.all() if force else query.limit(INLINE_INDEX_MAX + 1).all()
+    if len(missing) > INLINE_INDEX_MAX and not force:
+        start_backfill(course_id)
+        return False
+    index_questions(db, missing)
+    with _indexed_lock:
+        _indexed_courses[course_id] = time.monotonic()
+    return [question_id for question_id, _, _ in missing]
+
+
+def _texts(db: Session, question_ids):
+    question_ids = list(question_ids)
+    texts = {}
+    for start in range(0, len(question_ids), INDEX_CHUNK_SIZE):
+        texts.update(db.query(models.Question.id, models.Question.question_text).filter(
+            models.Question.id.in_(question_ids[start:start + INDEX_CHUNK_SIZE])
+        ))
+    return texts
+
+
+def _bucket_members(db: Session, course_id: int, question_ids=None):
+    # (band, bucket) -> sorted member ids, for buckets shared by two or more
+    # questions; limited to the buckets of question_ids when given
+    band = models.QuestionLSHBand
+    if question_ids is None:
+        shared = db.query(band.band, band.bucket).filter(band.course_id == course_id).group_by(
+            band.band, band.bucket).having(func.count() > 1).subquery()
+        rows = db.query(band.band, band.bucket, band.question_id).join(
+            shared, (shared.c.band == band.band) & (shared.c.bucket == band.bucket)
+        ).filter(band.course_id == course_id)
+    else:
+        keys = set()
+        question_ids = list(question_ids)
+        for start in range(0, len(question_ids), INDEX_CHUNK_SIZE):
+            keys.update(db.query(band.band, band.bucket).filter(
+                band.question_id.in_(question_ids[start:start + INDEX_CHUNK_SIZE])))
+        buckets = list({bucket for _, bucket in keys})
+        rows = []
+        for start in range(0, len(buckets), INDEX_CHUNK_SIZE):
+            rows.extend(row for row in db.query(band.band, band.bucket, band.question_id).filter(
+                band.course_id == course_id,
+                band.bucket.in_(buckets[start:start + INDEX_CHUNK_SIZE]),
+            ) if (row[0], row[1]) in keys)
+    members = defaultdict(list)
+    for number, bucket, question_id in rows:
+        members[(number, bucket)].append(question_id)
+    return {key: sorted(ids) for key, ids in members.items() if len(ids) > 1}
+
+
+def _candidate_pairs(buckets):
+    # Every pair inside small buckets; crowded buckets (many copies of the same
+    # question) only pair each member with the first, which is enough to put
+    # them in one group and keeps the work linear in the bucket size
+    pairs = set()
+    for ids in buckets.values():
+        if len(ids) <= MAX_CANDIDATES:
+            pairs.update((ids[i], ids[j]) for i in range(len(ids)) for j in range(i + 1, len(ids)))
+        else:
+            pairs.update((ids[0], other) for other in ids[1:])
+    return pairs
+
+
+def _verified_pairs(db: Session, course_id: int, question_ids, threshold):
+    # (lower_id, higher_id, similarity) for candidate pairs at or above the threshold
+    pairs = _candidate_pairs(_bucket_members(db, course_id, question_ids))
+    texts = _texts(db, {question_id for pair in pairs for question_id in pair})
+    shingle_sets = {question_id: shingles(text) for question_id, text in texts.items()}
+    verified = []
+    for a, b in sorted(pairs):
+        if a not in shingle_sets or b not in shingle_sets:
+            continue
+        similarity = jaccard(shingle_sets[a], shingle_sets[b])
+        if similarity >= threshold:
+            verified.append((a, b, round(similarity, 4)))
+    return verified
+
+
+def find_similar(db: Session, course_id: int, text: str, exclude_id: int = None,
+                 threshold: float = DUPLICATE_THRESHOLD, limit: int = 5):
+    # Indexed questions of the course similar to text, best first
+    band = models.QuestionLSHBand
+    keys = set(enumerate(band_buckets(signature(text))))
+    # Buckets are 64-bit hashes, so seeking on bucket alone hits the index
+    # directly; the band is checked here
+    rows = db.query(band.question_id, band.band, band.bucket).filter(
+        band.course_id == course_id, band.bucket.in_([bucket for _, bucket in keys])
+    )
+    shared = defaultdict(int)
+    for question_id, number, bucket in rows:
+        if (number, bucket) in keys and question_id != exclude_id:
+            shared[question_id] += 1
+    ranked = sorted(shared.items(), key=lambda item: item[1], reverse=True)[:MAX_CANDIDATES]
+
+    mine = shingles(text)
+    matches = []
+    for question_id, candidate_text in _texts(db, [question_id for question_id, _ in ranked]).items():
+        similarity = jaccard(mine, shingles(candidate_text))
+        if similarity >= threshold:
+            matches.append({"question_id": question_id, "similarity": round(similarity, 4)})
+    matches.sort(key=lambda match: (-match["similarity"], match["question_id"]))
+    return matches[:limit]
+
+
+def check_new_question(db: Session, question):
+    # Called by crud once the question is flushed: flags likely duplicates
+    # among the course's existing questions, then adds it to the index
+    # While a backfill is running the check only sees the part already indexed
+    backfilled = ensure_course_indexed(db, question.course_id) or []
+    matches = find_similar(db, question.course_id, question.question_text, exclude_id=question.id)
+    if question.id not in backfilled:
+        index_questions(db, [(question.id, question.course_id, question.question_text)])
+    return matches
+
+
+def flag_imported(db: Session, course_id: int, threshold: float = DUPLICATE_THRESHOLD):
+    # Indexes the questions an import added to a course and pairs each one
+    # with its closest earlier question. Within the file, the later copy is
+    # the one flagged.
+    new = set(ensure_course_indexed(db, course_id, force=True))
+    if not new:
+        return []
+    best = {}
+    for a, b, similarity in _verified_pairs(db, course_id, new, threshold):
+        # a < b, so b is the later question; flag it if it is new, else flag a
+        flagged, original = (b, a) if b in new else (a, b)
+        if flagged not in new:
+            continue
+        if flagged not in best or similarity > best[flagged]["similarity"]:
+            best[flagged] = {"question_id": flagged, "duplicate_of": original, "similarity": similarity}
+    return [best[question_id] for question_id in sorted(best)]
+
+
+def _union_find_groups(pairs):
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b, _ in pairs:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+    groups = defaultdict(list)
+    for question_id in parent:
+        groups[find(question_id)].append(question_id)
+    return groups
+
+
+def duplicate_report(db: Session, course_id: int, threshold: float = DUPLICATE_THRESHOLD):
+    # Groups of likely duplicates within a course, largest first
+    if ensure_course_indexed(db, course_id) is False:
+        raise IndexNotReady(f"Duplicate index for course {course_id} is still being built")
+    pairs = _verified_pairs(db, course_id, None, threshold)
+    groups = _union_find_groups(pairs)
+    root_of = {member: root for root, members in groups.items() for member in members}
+    lowest = {}
+    for question_id, _, similarity in pairs:
+        root = root_of[question_id]
+        lowest[root] = min(lowest.get(root, 1.0), similarity)
+    report = [{"question_ids": sorted(members), "min_similarity": lowest[root]} for root, members in groups.items()]
+    report.sort(key=lambda group: (-len(group["question_ids"]), group["question_ids"][0]))
+    return report
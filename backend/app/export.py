@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from . import models
+from .database import read_engine
+
+# Streaming table exports. Rows come off a server-side cursor (a named cursor
+# on PostgreSQL; SQLite steps its statement as rows are fetched) in batches of
+# BATCH_SIZE and are encoded and sent batch by batch, so memory use is the
+# same for ten rows or ten million.
+BATCH_SIZE = 1000
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+}
+
+# Exported columns and the filters each export accepts. Password hashes never
+# leave the server.
+EXPORTS = {
+    "questions": (models.Question, ("course_id", "unit_id", "co_id", "status"), ()),
+    "generated_qps": (models.GeneratedQP, ("course_id", "academic_year", "assessment_type"), ()),
+    "faculties": (models.Faculty, ("branch_id", "user_type", "status"), ("password_hash",)),
+    "courses": (models.Course, ("regulation_id", "branch_id", "year", "semester", "status"), ()),
+}
+
+# Columns holding JSON text, written as nested JSON in NDJSON exports
+_JSON_COLUMNS = {("generated_qps", "questions")}
+
+
+class ExportError(Exception):
+    pass
+
+
+def _columns(name):
+    model, _, excluded = EXPORTS[name]
+    return [column for column in model.__table__.columns if column.name not in excluded]
+
+
+def export_query(name, filters):
+    if name not in EXPORTS:
+        raise ExportError(f"Unknown export {name}")
+    model, allowed, _ = EXPORTS[name]
+    query = select(*_columns(name))
+    for column_name, value in filters.items():
+        if value is None:
+            continue
+        if column_name not in allowed:
+            raise ExportError(f"{name} cannot be filtered by {column_name}")
+        query = query.where(getattr(model, column_name) == value)
+    return query.order_by(model.id)
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _ndjson_encoder(name, column_names):
+    json_columns = [(name, column) in _JSON_COLUMNS for column in column_names]
+
+    def encode(rows):
+        lines = []
+        for row in rows:
+            record = {}
+            for column, is_json, value in zip(column_names, json_columns, row):
+                if is_json and value:
+                    try:
+                        value = json.loads(value)
+                    except ValueError:
+                        pass
+                record[column] = _json_value(value)
+            lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        return ("\n".join(lines) + "\n").encode() if lines else b""
+    return None, encode
+
+
+def _csv_encoder(name, column_names):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def drain():
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(column_names)
+    header = drain()
+
+    def encode(rows):
+        writer.writerows(rows)
+        return drain()
+    return header, encode
+
+
+def stream_export(name, fmt="ndjson", gzip=False, filters=None):
+    # Validates up front so bad requests fail before the response starts; the
+    # returned iterator opens its own connection, since it outlives the request
+    # handler and its session
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format {fmt}; use one of {', '.join(FORMATS)}")
+    query = export_query(name, filters or {})
+    column_names = [column.name for column in _columns(name)]
+    encoder = _csv_encoder if fmt == "csv" else _ndjson_encoder
+
+    def chunks():
+        header, encode = encoder(name, column_names)
+        if header:
+            yield header
+        with read_engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(query)
+            while True:
+                rows = result.fetchmany(BATCH_SIZE)
+                if not rows:
+                    break
+                yield encode(rows)
+
+    if not gzip:
+        return chunks()
+    return _gzipped(chunks())
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(name, fmt="ndjson", gzip=False, filters=None):
+    try:
+        body = stream_export(name, fmt, gzip, filters)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    media_type, extension = FORMATS[fmt]
+    filename = f"{name}.{extension}"
+    if gzip:
+        media_type, filename = "application/gzip", filename + ".gz"
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
@@ -0,0 +1,55 @@
+import os
+import threading
+import time
+
+# Background jobs (batch generation, question imports) are tracked in the
+# memory of the worker process that started them, so polling one only works
+# against that worker: run the API with a single worker, or route a client's
+# requests to the same worker. Finished jobs are kept for
+# JOB_RETENTION_SECONDS so their results can still be collected, and only the
+# MAX_FINISHED_JOBS most recent ones at that; running jobs are never dropped.
+JOB_RETENTION_SECONDS = float(os.environ.get("WEBSAGA_JOB_RETENTION_SECONDS", 3600))
+MAX_FINISHED_JOBS = int(os.environ.get("WEBSAGA_MAX_FINISHED_JOBS", 200))
+
+
+class JobRegistry:
+    def __init__(self, retention_seconds=JOB_RETENTION_SECONDS, max_finished=MAX_FINISHED_JOBS):
+        self.retention_seconds = retention_seconds
+        self.max_finished = max_finished
+        self._jobs = {}  # job id -> job, in start order
+        self._finished = {}  # job id -> time.monotonic() at finish, in finish order
+        self._lock = threading.Lock()
+
+    def add(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+
+    def finish(self, job):
+        with self._lock:
+            self._finished[job.id] = time.monotonic()
+            self._prune()
+
+    def get(self, job_id):
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            self._prune()
+            return list(self._jobs.values())
+
+    def clear(self):
+        with self._lock:
+            self._jobs.clear()
+            self._finished.clear()
+
+    def _prune(self):
+        expired_before = time.monotonic() - self.retention_seconds
+        extra = len(self._finished) - self.max_finished
+        for job_id, finished_at in list(self._finished.items()):
+            if finished_at >= expired_before and extra <= 0:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+            extra -= 1
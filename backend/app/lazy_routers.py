@@ -0,0 +1,47 @@
+import importlib
+
+# Routers are imported and registered on the first request under their prefix
+# instead of at startup, so a worker is ready as soon as the app object exists
+# and only pays for the routers it actually serves. Registration happens on
+# the event loop thread before the request reaches the router, so the request
+# is routed normally (route templates for metrics included). Requests for the
+# API docs load every router first, so the schema is complete.
+
+
+class LazyRouters:
+    def __init__(self, app, routers, package):
+        # routers: prefix -> module name in package, each defining `router`
+        self.app = app
+        self.package = package
+        self.pending = dict(routers)
+        self.docs_paths = {path for path in (app.openapi_url, app.docs_url, app.redoc_url) if path}
+
+    def load(self, prefix):
+        module = self.pending.pop(prefix, None)
+        if module is not None:
+            self.app.include_router(importlib.import_module(f".{module}", self.package).router)
+
+    def load_all(self):
+        # For anything that needs the full route table up front (schema
+        # generation, preloading before fork)
+        for prefix in list(self.pending):
+            self.load(prefix)
+
+    def load_for(self, path):
+        if path in self.docs_paths:
+            self.load_all()
+            return
+        for prefix in list(self.pending):
+            if path == prefix or path.startswith(prefix + "/"):
+                self.load(prefix)
+
+
+class LazyRouterMiddleware:
+    def __init__(self, app, routers):
+        self.app = app
+        self.routers = routers
+
+    async def __call__(self, scope, receive, send):
+        if self.routers.pending and scope["type"] in ("http", "websocket"):
+            self.routers.load_for(scope["path"])
+        await self.app(scope, receive, send)
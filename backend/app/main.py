@@ -1,13 +1,39 @@
+import sys
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine
-from . import models
-from .routers import programs, branches, courses, faculties, auth, regulations, generated_qps
+from . import cache, metrics, migrations
+from .lazy_routers import LazyRouterMiddleware, LazyRouters
 
-models.Base.metadata.create_all(bind=engine)
+# Schema changes are applied by `python -m app.migrations`, not here; workers
+# only check the version at startup
+@asynccontextmanager
+async def lifespan(app):
+    migrations.check_schema()
+    yield
+    # Nothing to stop unless a module that starts a pool was loaded
+    for name in ("workers", "auth"):
+        module = sys.modules.get(f"{__package__}.{name}")
+        if module is not None:
+            module.shutdown_executor()
 
-app = FastAPI(title="WEBSAGA API", version="1.0.0")
+app = FastAPI(title="WEBSAGA API", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
 
+# Imported on the first request under each prefix
+routers = LazyRouters(app, {
+    "/programs": "programs",
+    "/branches": "branches",
+    "/courses": "courses",
+    "/faculties": "faculties",
+    "/regulations": "regulations",
+    "/auth": "auth",
+    "/generated_qps": "generated_qps",
+    "/questions": "questions",
+}, package=f"{__package__}.routers")
+
+# Innermost, so routes are registered before the router sees the request
+app.add_middleware(LazyRouterMiddleware, routers=routers)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # In production, specify allowed origins
@@ -15,14 +41,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last so it wraps everything else, CORS included
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return cache.lookup_cache.stats()
 
-app.include_router(programs.router)
-app.include_router(branches.router)
-app.include_router(courses.router)
-app.include_router(faculties.router)
-app.include_router(regulations.router)
-app.include_router(auth.router)
-app.include_router(generated_qps.router)
+# Prometheus scrape target; keep it on the internal network
+@app.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def read_root():
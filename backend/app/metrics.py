@@ -0,0 +1,220 @@
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from . import cache
+
+# Per-request performance instrumentation. MetricsMiddleware times every
+# request; cursor events on every engine (sync, async and read engines alike)
+# add each statement to the stats of the request that ran it. Totals are
+# exposed in Prometheus text format by GET /metrics.
+#
+# Requests that run more than MAX_REQUEST_QUERIES statements (an N+1 loop) or
+# take longer than SLOW_REQUEST_MS are logged on "websaga.perf" together with
+# the statements they ran.
+SLOW_REQUEST_MS = float(os.environ.get("WEBSAGA_SLOW_REQUEST_MS", 500))
+MAX_REQUEST_QUERIES = int(os.environ.get("WEBSAGA_MAX_REQUEST_QUERIES", 25))
+MAX_LOGGED_STATEMENTS = 50
+MAX_STATEMENT_CHARS = 500
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+logger = logging.getLogger("websaga.perf")
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "statements", "_lock")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = []  # (seconds, sql), first MAX_LOGGED_STATEMENTS only
+        self._lock = threading.Lock()
+
+    def add(self, statement, seconds):
+        # A request's queries can run on several threadpool workers
+        with self._lock:
+            self.queries += 1
+            self.db_seconds += seconds
+            if len(self.statements) < MAX_LOGGED_STATEMENTS:
+                self.statements.append((seconds, statement[:MAX_STATEMENT_CHARS]))
+
+
+_current = ContextVar("websaga_request_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    started = conn.info.get("query_started_at")
+    if started:
+        stats.add(statement, time.perf_counter() - started.pop())
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+
+_lock = threading.Lock()
+_latency = {}  # (method, route) -> Histogram of seconds
+_query_counts = {}  # (method, route) -> Histogram of statements per request
+_db_seconds = {}  # (method, route) -> total seconds spent in the database
+_responses = {}  # (method, route, status) -> count
+_flagged = {}  # (method, route, reason) -> count
+
+
+def _route_label(scope):
+    # The route template ("/courses/{course_id}"), never the raw path, so
+    # label cardinality stays bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _record(method, route, status, seconds, stats):
+    key = (method, route)
+    with _lock:
+        _latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+        _query_counts.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(stats.queries)
+        _db_seconds[key] = _db_seconds.get(key, 0.0) + stats.db_seconds
+        _responses[(method, route, status)] = _responses.get((method, route, status), 0) + 1
+        reasons = []
+        if stats.queries > MAX_REQUEST_QUERIES:
+            reasons.append("queries")
+        if seconds * 1000 > SLOW_REQUEST_MS:
+            reasons.append("latency")
+        for reason in reasons:
+            _flagged[(method, route, reason)] = _flagged.get((method, route, reason), 0) + 1
+    if reasons:
+        lines = "".join(f"\n  {statement_seconds * 1000:8.2f} ms  {sql}" for statement_seconds, sql in stats.statements)
+        if stats.queries > len(stats.statements):
+            lines += f"\n  ... {stats.queries - len(stats.statements)} more"
+        logger.warning(
+            "%s %s -> %s in %.1f ms, %d queries (%.1f ms in db) [%s]%s",
+            method, route, status, seconds * 1000, stats.queries, stats.db_seconds * 1000, ", ".join(reasons), lines,
+        )
+
+
+# Plain ASGI middleware rather than BaseHTTPMiddleware, so streaming responses
+# pass through untouched and the timing covers the whole body
+class MetricsMiddleware:
+    def __init__(self, app, exclude_paths=("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = [500]
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            _record(scope["method"], _route_label(scope), status[0], time.perf_counter() - started, stats)
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _histogram_lines(name, histograms):
+    lines = []
+    for (method, route), histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(method=method, route=route, le='+Inf')} {histogram.total}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {histogram.total}")
+    return lines
+
+
+def render():
+    # Prometheus text exposition format, version 0.0.4
+    with _lock:
+        lines = [
+            "# HELP websaga_http_request_duration_seconds Request latency, including the response body.",
+            "# TYPE websaga_http_request_duration_seconds histogram",
+        ]
+        lines += _histogram_lines("websaga_http_request_duration_seconds", _latency)
+        lines += [
+            "# HELP websaga_http_requests_total Requests by response status.",
+            "# TYPE websaga_http_requests_total counter",
+        ]
+        lines += [
+            f"websaga_http_requests_total{_labels(method=method, route=route, status=status)} {count}"
+            for (method, route, status), count in sorted(_responses.items())
+        ]
+        lines += [
+            "# HELP websaga_db_queries_per_request SQL statements executed per request.",
+            "# TYPE websaga_db_queries_per_request histogram",
+        ]
+        lines += _histogram_lines("websaga_db_queries_per_request", _query_counts)
+        lines += [
+            "# HELP websaga_db_seconds_total Time spent executing SQL statements.",
+            "# TYPE websaga_db_seconds_total counter",
+        ]
+        lines += [
+            f"websaga_db_seconds_total{_labels(method=method, route=route)} {seconds}"
+            for (method, route), seconds in sorted(_db_seconds.items())
+        ]
+        lines += [
+            "# HELP websaga_flagged_requests_total Requests over the query count or latency threshold.",
+            "# TYPE websaga_flagged_requests_total counter",
+        ]
+        lines += [
+            f"websaga_flagged_requests_total{_labels(method=method, route=route, reason=reason)} {count}"
+            for (method, route, reason), count in sorted(_flagged.items())
+        ]
+    cache_stats = cache.lookup_cache.stats()
+    for name in ("hits", "misses", "evictions", "expirations"):
+        lines += [
+            f"# TYPE websaga_lookup_cache_{name}_total counter",
+            f"websaga_lookup_cache_{name}_total {cache_stats[name]}",
+        ]
+    lines += ["# TYPE websaga_lookup_cache_entries gauge", f"websaga_lookup_cache_entries {cache_stats['size']}"]
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        for table in (_latency, _query_counts, _db_seconds, _responses, _flagged):
+            table.clear()
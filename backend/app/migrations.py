@@ -0,0 +1,122 @@
+import argparse
+import os
+from datetime import datetime
+from sqlalchemy import func, inspect, select
+from sqlalchemy.orm import Session
+from . import models
+from .database import engine
+
+# Versioned schema migrations, applied once per deployment:
+#
+#   python -m app.migrations            # apply pending migrations
+#   python -m app.migrations --status   # show the recorded version
+#
+# Workers only check the recorded version at startup (check_schema) and refuse
+# to serve a database older than the code. With WEBSAGA_AUTO_MIGRATE=1 they
+# apply pending migrations themselves instead, which is handy with a single
+# `uvicorn --reload` but races when several workers boot at once.
+#
+# Migration 1 creates every table and index declared in models.py, so on a
+# fresh database the schema changes of later migrations already exist. Every
+# migration must therefore be safe to run against a database that has it
+# (checkfirst, IF NOT EXISTS), which also makes a migration interrupted before
+# it was recorded safe to run again. Append new migrations; never renumber.
+AUTO_MIGRATE = os.environ.get("WEBSAGA_AUTO_MIGRATE", "0").lower() in ("1", "true", "yes")
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+def _create_tables(bind):
+    models.Base.metadata.create_all(bind=bind)
+
+
+def _search_index(bind):
+    from . import search
+    search.ensure_search_index(bind)
+
+
+def _backfill_paper_items(bind):
+    from . import qp_items
+    with Session(bind) as db:
+        qp_items.backfill_items(db)
+
+
+def _rebuild_question_usage(bind):
+    from . import qp_items
+    with Session(bind) as db:
+        qp_items.rebuild_usage(db)
+        db.commit()
+
+
+def _create_indexes(bind):
+    # Every index declared in models.py that the database does not have yet
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+
+MIGRATIONS = [
+    (1, "create tables", _create_tables),
+    (2, "full-text question search index", _search_index),
+    (3, "generated_qp_items for existing papers", _backfill_paper_items),
+    (4, "question usage counters", _rebuild_question_usage),
+    (5, "indexes on foreign keys and filter columns", _create_indexes),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(bind=engine):
+    # 0 for a database that has never been migrated
+    with bind.connect() as conn:
+        if not inspect(conn).has_table(models.SchemaMigration.__tablename__):
+            return 0
+        return conn.execute(select(func.max(models.SchemaMigration.version))).scalar() or 0
+
+
+def migrate(bind=engine):
+    # Applies pending migrations in order, each recorded once it has finished;
+    # returns the (version, name) pairs applied
+    models.SchemaMigration.__table__.create(bind=bind, checkfirst=True)
+    version = current_version(bind)
+    applied = []
+    for number, name, upgrade in MIGRATIONS:
+        if number <= version:
+            continue
+        upgrade(bind)
+        with bind.begin() as conn:
+            conn.execute(models.SchemaMigration.__table__.insert().values(
+                version=number, name=name, applied_at=datetime.utcnow().replace(microsecond=0),
+            ))
+        applied.append((number, name))
+    return applied
+
+
+def check_schema(bind=engine):
+    if AUTO_MIGRATE:
+        migrate(bind)
+        return
+    version = current_version(bind)
+    if version < LATEST_VERSION:
+        raise SchemaOutOfDate(
+            f"Database schema is at version {version}, this build needs {LATEST_VERSION}; "
+            f"run python -m app.migrations"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m app.migrations")
+    parser.add_argument("--status", action="store_true", help="show the schema version and exit")
+    args = parser.parse_args()
+    if args.status:
+        version = current_version()
+        pending = [f"{number} {name}" for number, name, _ in MIGRATIONS if number > version]
+        print(f"Schema version {version} of {LATEST_VERSION}")
+        for line in pending:
+            print(f"  pending: {line}")
+    else:
+        applied = migrate()
+        for number, name in applied:
+            print(f"Applied {number}: {name}")
+        print(f"Schema is at version {LATEST_VERSION}")
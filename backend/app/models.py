@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, Float
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, Text, Float, Index, DateTime
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -35,6 +35,11 @@ class ProgramBranchMapping(Base):
     program = relationship("Program")
     branch = relationship("Branch")
 
+    __table_args__ = (
+        Index('ix_program_branch_mappings_branch', 'branch_id'),
+        Index('ix_program_branch_mappings_program', 'program_id'),
+    )
+
 # Courses table
 class Course(Base):
     __tablename__ = 'courses'
@@ -53,6 +58,11 @@ class Course(Base):
     branch = relationship("Branch")
     regulation = relationship("Regulation")
 
+    __table_args__ = (
+        Index('ix_courses_branch', 'branch_id'),
+        Index('ix_courses_regulation_year_semester', 'regulation_id', 'year', 'semester'),
+    )
+
 # Branch-Course Mapping
 class BranchCourseMapping(Base):
     __tablename__ = 'branch_course_mappings'
@@ -68,6 +78,12 @@ class BranchCourseMapping(Base):
     program_branch_mapping = relationship("ProgramBranchMapping")
     regulation = relationship("Regulation")
 
+    __table_args__ = (
+        Index('ix_branch_course_mappings_branch_regulation', 'branch_id', 'regulation_id'),
+        Index('ix_branch_course_mappings_course', 'course_id'),
+        Index('ix_branch_course_mappings_program_branch', 'program_branch_mapping_id'),
+    )
+
 # Faculties table
 class Faculty(Base):
     __tablename__ = 'faculties'
@@ -85,6 +101,10 @@ class Faculty(Base):
 
     branch = relationship("Branch")
 
+    __table_args__ = (
+        Index('ix_faculties_branch', 'branch_id'),
+    )
+
 # Faculty-Course Mapping
 class FacultyCourseMapping(Base):
     __tablename__ = 'faculty_course_mappings'
@@ -101,6 +121,11 @@ class FacultyCourseMapping(Base):
     faculty = relationship("Faculty")
     course = relationship("Course")
 
+    __table_args__ = (
+        Index('ix_faculty_course_mappings_faculty_year', 'faculty_id', 'academic_year'),
+        Index('ix_faculty_course_mappings_course', 'course_id'),
+    )
+
 # Bloom’s Levels
 class BloomsLevel(Base):
     __tablename__ = 'blooms_levels'
@@ -132,6 +157,10 @@ class CourseOutcome(Base):
 
     course = relationship("Course")
 
+    __table_args__ = (
+        Index('ix_course_outcomes_course', 'course_id'),
+    )
+
 # Questions
 class Question(Base):
     __tablename__ = 'questions'
@@ -152,6 +181,12 @@ class Question(Base):
     difficulty_level = relationship("DifficultyLevel")
     unit = relationship("Unit")
 
+    __table_args__ = (
+        Index('ix_questions_course', 'course_id', 'id'),
+        Index('ix_questions_course_selection', 'course_id', 'unit_id', 'blooms_level_id', 'difficulty_level_id'),
+        Index('ix_questions_co', 'co_id'),
+    )
+
 # Optional: Generated Question Papers
 class GeneratedQP(Base):
     __tablename__ = 'generated_qps'
@@ -169,4 +204,71 @@ class GeneratedQP(Base):
 
     program = relationship("Program")
     course = relationship("Course")
-    regulation = relationship("Regulation")
\ No newline at end of file
+    regulation = relationship("Regulation")
+    items = relationship("GeneratedQPItem", back_populates="generated_qp", order_by="GeneratedQPItem.position",
+                         passive_deletes=True)
+
+    __table_args__ = (
+        Index('ix_generated_qps_course_year_type', 'course_id', 'academic_year', 'assessment_type'),
+        Index('ix_generated_qps_year_type', 'academic_year', 'assessment_type'),
+    )
+# One row per question placed on a generated paper, so reuse ("which papers
+# used this question", "how often in the last N years") is an indexed query
+# instead of a scan over every questions blob. question_id is empty for
+# free-text items that do not match a question in the bank.
+class GeneratedQPItem(Base):
+    __tablename__ = 'generated_qp_items'
+    id = Column(Integer, primary_key=True, index=True)
+    generated_qp_id = Column(Integer, ForeignKey('generated_qps.id', ondelete='CASCADE'), nullable=False)
+    question_id = Column(Integer, ForeignKey('questions.id', ondelete='SET NULL'), nullable=True)
+    section = Column(String(50), nullable=True)
+    position = Column(Integer, nullable=False)
+    marks = Column(Float, nullable=True)
+
+    generated_qp = relationship("GeneratedQP", back_populates="items")
+
+    __table_args__ = (
+        Index('ix_generated_qp_items_qp_position', 'generated_qp_id', 'position'),
+        Index('ix_generated_qp_items_question_qp', 'question_id', 'generated_qp_id'),
+    )
+
+# Running reuse counters per question, kept up to date as papers are saved so
+# the generator never has to scan generated_qp_items
+class QuestionUsage(Base):
+    __tablename__ = 'question_usage'
+    question_id = Column(Integer, ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True)
+    course_id = Column(Integer, ForeignKey('courses.id'), nullable=False)
+    times_used = Column(Integer, nullable=False, default=0)
+    last_academic_year = Column(String(20), nullable=True)
+
+    __table_args__ = (
+        Index('ix_question_usage_course', 'course_id'),
+    )
+
+# MinHash/LSH index for near-duplicate questions: one row per question and
+# band, holding the hash of that band of the question's signature
+class QuestionLSHBand(Base):
+    __tablename__ = 'question_lsh_bands'
+    question_id = Column(Integer, ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True)
+    band = Column(Integer, primary_key=True)
+    course_id = Column(Integer, ForeignKey('courses.id'), nullable=False)
+    bucket = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index('ix_question_lsh_bands_lookup', 'course_id', 'bucket', 'band'),
+    )
+
+# Per-table change counters shared by all worker processes; bumped in the same
+# transaction as the write so in-process caches and HTTP ETags know when to change
+class CacheVersion(Base):
+    __tablename__ = 'cache_versions'
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
+
+# Schema migrations applied to this database (see migrations.py)
+class SchemaMigration(Base):
+    __tablename__ = 'schema_migrations'
+    version = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    applied_at = Column(DateTime, nullable=False)
@@ -0,0 +1,19 @@
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+# Offset requests keep getting a bare list; requests that pass after_id get a
+# page whose next_cursor is the last id returned, or None on the final page
+def page(items, limit, after_id):
+    if after_id is None:
+        return items
+    next_cursor = None
+    if items and len(items) >= limit:
+        next_cursor = items[-1]["id"] if isinstance(items[-1], dict) else items[-1].id
+    return {"items": items, "next_cursor": next_cursor}
+
+
+# For list routes whose crud getter already returns plain dicts shaped like the
+# response schema: serialized by orjson as-is, skipping response_model
+# validation. Headers set by route dependencies (ETag and the like) are kept.
+def json_page(rows, limit, after_id, response: Response):
+    return ORJSONResponse(page(rows, limit, after_id), headers=dict(response.headers))
@@ -0,0 +1,527 @@
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import re
+import struct
+import tempfile
+import threading
+import zlib
+from sqlalchemy.orm import Session
+from . import models, qp_items
+from .workers import get_executor
+
+# Server-side PDF rendering of generated papers. The renderer is plain Python
+# writing PDF operators, so output is small (text, not canvas images) and
+# identical for every client. Rendered files are cached on disk under the hash
+# of everything that goes into them: a paper is rendered once, and edits to it
+# simply produce a new key.
+PDF_CACHE_DIR = os.environ.get("WEBSAGA_PDF_CACHE_DIR", "pdf_cache")
+
+# The standard Helvetica fonts only cover WinAnsi, which has no maths or Greek
+# (<=, pi, Omega, subscripts...). Point WEBSAGA_PDF_FONT and
+# WEBSAGA_PDF_BOLD_FONT at TrueType files that cover them (e.g. DejaVuSans.ttf
+# and DejaVuSans-Bold.ttf) and they are embedded in every PDF, with a ToUnicode
+# map so text can still be searched and copied. A paper with a character its
+# fonts cannot show is refused (UnrenderableText) rather than printed with "?".
+PDF_FONT = os.environ.get("WEBSAGA_PDF_FONT")
+PDF_BOLD_FONT = os.environ.get("WEBSAGA_PDF_BOLD_FONT") or PDF_FONT
+
+# Bump when the layout changes so cached files are not served for the old one
+RENDERER_VERSION = 2
+
+PAGE_WIDTH = 595.28  # A4 in points
+PAGE_HEIGHT = 841.89
+MARGIN = 56
+NUMBER_WIDTH = 26
+MARKS_WIDTH = 48
+BODY_SIZE = 11
+LEADING = 14.5
+
+# Advance widths (1/1000 em) of WinAnsi characters 32..126; anything else is
+# measured as DEFAULT_WIDTH
+_HELVETICA = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_HELVETICA_BOLD = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+DEFAULT_WIDTH = 556
+
+
+
+class UnrenderableText(ValueError):
+    def __init__(self, characters):
+        self.characters = characters
+        super().__init__(
+            f"The PDF fonts cannot render {' '.join(characters)}; "
+            f"set WEBSAGA_PDF_FONT to a TrueType font that covers them"
+        )
+
+
+def _literal(data):
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class _StandardFont:
+    # One of the 14 standard fonts, WinAnsi encoded; nothing is embedded
+    def __init__(self, base_font, widths):
+        self.base_font = base_font
+        self.widths = widths
+
+    def covers(self, char):
+        try:
+            char.encode("cp1252")
+        except UnicodeEncodeError:
+            return False
+        return True
+
+    def width(self, text):
+        # In 1/1000 em
+        return sum(self.widths[b - 32] if 32 <= b <= 126 else DEFAULT_WIDTH for b in text.encode("cp1252"))
+
+    def operand(self, text):
+        return _literal(text.encode("cp1252"))
+
+    def objects(self, chars, first_id):
+        return [b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % self.base_font.encode()]
+
+
+class _TrueTypeFont:
+    # A TrueType file embedded whole as a CID font: text is written as glyph
+    # ids (Identity-H), widths and the ToUnicode map cover the characters used
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = f.read()
+        tables = {}
+        for index in range(struct.unpack_from(">H", self.data, 4)[0]):
+            tag, _, offset, length = struct.unpack_from(">4sLLL", self.data, 12 + 16 * index)
+            tables[tag.decode("latin-1")] = (offset, length)
+        missing = {"cmap", "head", "hhea", "hmtx", "maxp"} - set(tables)
+        if missing:
+            raise ValueError(f"{path} is not a TrueType font (no {', '.join(sorted(missing))} table)")
+        head = tables["head"][0]
+        self.units_per_em = struct.unpack_from(">H", self.data, head + 18)[0]
+        self.bbox = struct.unpack_from(">4h", self.data, head + 36)
+        hhea = tables["hhea"][0]
+        self.ascent, self.descent = struct.unpack_from(">2h", self.data, hhea + 4)
+        metrics = struct.unpack_from(">H", self.data, hhea + 34)[0]
+        glyphs = struct.unpack_from(">H", self.data, tables["maxp"][0] + 4)[0]
+        hmtx = tables["hmtx"][0]
+        advances = [struct.unpack_from(">H", self.data, hmtx + 4 * index)[0] for index in range(metrics)]
+        self.advances = advances + advances[-1:] * max(0, glyphs - metrics)
+        self.cmap = self._read_cmap(tables["cmap"][0])
+        self.name = self._read_name(tables.get("name"), path)
+
+    def _read_cmap(self, cmap):
+        # Prefers a full-Unicode (format 12) subtable, else a BMP (format 4) one
+        subtables = {}
+        for index in range(struct.unpack_from(">H", self.data, cmap + 2)[0]):
+            platform, encoding, offset = struct.unpack_from(">HHL", self.data, cmap + 4 + 8 * index)
+            start = cmap + offset
+            if (platform, encoding) in ((3, 10), (0, 4), (0, 6), (3, 1), (0, 3), (0, 1), (0, 0)):
+                subtables.setdefault(struct.unpack_from(">H", self.data, start)[0], start)
+        if 12 in subtables:
+            start = subtables[12]
+            mapping = {}
+            for index in range(struct.unpack_from(">L", self.data, start + 12)[0]):
+                first, last, glyph = struct.unpack_from(">3L", self.data, start + 16 + 12 * index)
+                for code in range(first, last + 1):
+                    mapping[code] = glyph + code - first
+            return mapping
+        if 4 not in subtables:
+            raise ValueError("TrueType font has no Unicode cmap")
+        start = subtables[4]
+        segments = struct.unpack_from(">H", self.data, start + 6)[0] // 2
+        ends = struct.unpack_from(f">{segments}H", self.data, start + 14)
+        starts = struct.unpack_from(f">{segments}H", self.data, start + 16 + 2 * segments)
+        deltas = struct.unpack_from(f">{segments}h", self.data, start + 16 + 4 * segments)
+        range_at = start + 16 + 6 * segments
+        range_offsets = struct.unpack_from(f">{segments}H", self.data, range_at)
+        mapping = {}
+        for index, (first, last, delta, range_offset) in enumerate(zip(starts, ends, deltas, range_offsets)):
+            for code in range(first, last + 1):
+                if code == 0xFFFF:
+                    continue
+                if range_offset:
+                    at = range_at + 2 * index + range_offset + 2 * (code - first)
+                    glyph = struct.unpack_from(">H", self.data, at)[0]
+                    glyph = (glyph + delta) & 0xFFFF if glyph else 0
+                else:
+                    glyph = (code + delta) & 0xFFFF
+                if glyph:
+                    mapping[code] = glyph
+        return mapping
+
+    def _read_name(self, table, path):
+        # The PostScript name (name id 6), else the file name
+        if table is not None:
+            start = table[0]
+            count, strings = struct.unpack_from(">HH", self.data, start + 2)
+            for index in range(count):
+                platform, _, _, name_id, length, offset = struct.unpack_from(">6H", self.data, start + 6 + 12 * index)
+                if name_id == 6 and platform in (1, 3):
+                    raw = self.data[start + strings + offset:start + strings + offset + length]
+                    name = raw.decode("utf-16-be" if platform == 3 else "latin-1", "ignore")
+                    break
+            else:
+                name = ""
+        else:
+            name = ""
+        name = re.sub(r"[^A-Za-z0-9+_-]", "", name) or re.sub(r"[^A-Za-z0-9+_-]", "", os.path.splitext(os.path.basename(path))[0])
+        return name or "Embedded"
+
+    def _scaled(self, value):
+        return round(value * 1000 / self.units_per_em)
+
+    def covers(self, char):
+        return ord(char) in self.cmap
+
+    def width(self, text):
+        return sum(self._scaled(self.advances[self.cmap.get(ord(char), 0)]) for char in text)
+
+    def operand(self, text):
+        return b"<%s>" % "".join(f"{self.cmap.get(ord(char), 0):04X}" for char in text).encode()
+
+    def objects(self, chars, first_id):
+        # Objects first_id..first_id+4: font, CID font, descriptor, font file,
+        # ToUnicode map
+        glyphs = {}
+        for char in sorted(chars):
+            glyphs.setdefault(self.cmap.get(ord(char), 0), char)
+        widths = b" ".join(b"%d [%d]" % (glyph, self._scaled(self.advances[glyph])) for glyph in sorted(glyphs))
+        font_file = zlib.compress(self.data, 6)
+        name = self.name.encode()
+        return [
+            b"<< /Type /Font /Subtype /Type0 /BaseFont /%s /Encoding /Identity-H /DescendantFonts [%d 0 R] "
+            b"/ToUnicode %d 0 R >>" % (name, first_id + 1, first_id + 4),
+            b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /%s "
+            b"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            b"/FontDescriptor %d 0 R /CIDToGIDMap /Identity /DW %d /W [%s] >>"
+            % (name, first_id + 2, self._scaled(self.advances[0]), widths),
+            b"<< /Type /FontDescriptor /FontName /%s /Flags 32 /FontBBox [%d %d %d %d] /ItalicAngle 0 "
+            b"/Ascent %d /Descent %d /CapHeight %d /StemV 80 /FontFile2 %d 0 R >>"
+            % ((name,) + tuple(self._scaled(v) for v in self.bbox) + (
+                self._scaled(self.ascent), self._scaled(self.descent), self._scaled(self.ascent), first_id + 3)),
+            b"<< /Length %d /Length1 %d /Filter /FlateDecode >>\nstream\n%s\nendstream"
+            % (len(font_file), len(self.data), font_file),
+            _stream(_to_unicode(glyphs)),
+        ]
+
+
+def _to_unicode(glyphs):
+    # CMap from glyph ids back to the characters they were written for
+    lines = [
+        b"/CIDInit /ProcSet findresource begin 12 dict begin begincmap",
+        b"/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+        b"/CMapName /Adobe-Identity-UCS def /CMapType 2 def",
+        b"1 begincodespacerange <0000> <FFFF> endcodespacerange",
+    ]
+    entries = sorted(glyphs.items())
+    for start in range(0, len(entries), 100):
+        chunk = entries[start:start + 100]
+        lines.append(b"%d beginbfchar" % len(chunk))
+        lines += [b"<%04X> <%s>" % (glyph, char.encode("utf-16-be").hex().upper().encode()) for glyph, char in chunk]
+        lines.append(b"endbfchar")
+    lines.append(b"endcmap CMapName currentdict /CMap defineresource pop end end")
+    return b"\n".join(lines)
+
+
+def _stream(data):
+    data = zlib.compress(data, 6)
+    return b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(data), data)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_font(path):
+    return _TrueTypeFont(path)
+
+
+def _fonts():
+    # F1 regular, F2 bold; the bold face falls back to the regular file
+    if PDF_FONT:
+        return {"F1": _load_font(PDF_FONT), "F2": _load_font(PDF_BOLD_FONT)}
+    return {"F1": _StandardFont("Helvetica", _HELVETICA), "F2": _StandardFont("Helvetica-Bold", _HELVETICA_BOLD)}
+
+
+def _text_width(text, font, size):
+    return _fonts()[font].width(str(text)) * size / 1000
+
+
+def _pdf_string(text):
+    # Text strings outside the document content (the title): PDFDocEncoding
+    # when ASCII will do, UTF-16 otherwise
+    if str(text).isascii():
+        return _literal(str(text).encode("ascii"))
+    return b"<FEFF%s>" % str(text).encode("utf-16-be").hex().upper().encode()
+
+
+def _wrap(text, font, size, width):
+    lines = []
+    for paragraph in str(text).splitlines() or [""]:
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if _text_width(candidate, font, size) <= width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            # A word wider than the column is broken wherever it has to be
+            while _text_width(word, font, size) > width:
+                cut = len(word) - 1
+                while cut > 1 and _text_width(word[:cut], font, size) > width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+            line = word
+        lines.append(line)
+    return lines
+
+
+class _Layout:
+    def __init__(self):
+        self.pages = []
+        self.used = {}
+        self._new_page()
+
+    def _new_page(self):
+        self.ops = []
+        self.pages.append(self.ops)
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def ensure(self, height):
+        if self.y - height < MARGIN + 20:
+            self._new_page()
+
+    def text(self, x, text, font="F1", size=BODY_SIZE, align="left"):
+        if align == "right":
+            x -= _text_width(text, font, size)
+        elif align == "center":
+            x -= _text_width(text, font, size) / 2
+        self.used.setdefault(font, set()).update(str(text))
+        operand = _fonts()[font].operand(str(text))
+        self.ops.append(b"BT /%s %g Tf %.2f %.2f Td %s Tj ET" % (font.encode(), size, x, self.y, operand))
+
+    def rule(self):
+        self.ops.append(b"0.6 w %.2f %.2f m %.2f %.2f l S" % (MARGIN, self.y, PAGE_WIDTH - MARGIN, self.y))
+
+    def down(self, amount):
+        self.y -= amount
+
+
+def _format_marks(marks):
+    if marks is None:
+        return ""
+    return f"[{marks:g}]"
+
+
+def _printed_text(document):
+    for key, value in document.items():
+        if key not in ("id", "questions") and value is not None:
+            yield str(value)
+    for question in document["questions"]:
+        yield str(question["section"] or "")
+        yield str(question["text"])
+
+
+def unrenderable(document):
+    # Characters of the paper that the fonts cannot show, sorted; every font
+    # must cover every character, whichever one it ends up printed in
+    fonts = set(_fonts().values())
+    chars = {char for text in _printed_text(document) for char in text if not char.isspace()}
+    return sorted(char for char in chars if not all(font.covers(char) for font in fonts))
+
+
+def render_paper(document):
+    # document is what paper_document() returns; pure, so it can run in a
+    # worker process
+    missing = unrenderable(document)
+    if missing:
+        raise UnrenderableText(missing)
+    layout = _Layout()
+    center = PAGE_WIDTH / 2
+    right = PAGE_WIDTH - MARGIN
+
+    layout.text(center, document["title"], "F2", 14, "center")
+    layout.down(18)
+    layout.text(center, f"{document['assessment_type']} Examination - Academic Year {document['academic_year']}",
+                size=11, align="center")
+    layout.down(15)
+    layout.text(center, f"{document['year']} Year {document['semester']} Semester - Regulation {document['regulation']}",
+                size=10, align="center")
+    layout.down(20)
+    layout.text(MARGIN, f"Date: {document['date_of_exam']}", size=10)
+    layout.text(right, f"Max. Marks: {document['total_marks']:g}", size=10, align="right")
+    layout.down(8)
+    layout.rule()
+    layout.down(22)
+
+    text_x = MARGIN + NUMBER_WIDTH
+    text_width = right - MARKS_WIDTH - text_x
+    section = None
+    for number, question in enumerate(document["questions"], start=1):
+        lines = _wrap(question["text"], "F1", BODY_SIZE, text_width)
+        if question["section"] and question["section"] != section:
+            section = question["section"]
+            layout.ensure(LEADING * (2 + min(len(lines), 3)))
+            layout.down(4)
+            layout.text(MARGIN, section, "F2", 11)
+            layout.down(LEADING + 4)
+        # Keep short questions on one page; long ones split between lines
+        layout.ensure(LEADING * min(len(lines), 3))
+        layout.text(MARGIN, f"{number}.", "F2")
+        layout.text(right, _format_marks(question["marks"]), align="right")
+        for line in lines:
+            layout.ensure(LEADING)
+            layout.text(text_x, line)
+            layout.down(LEADING)
+        layout.down(6)
+
+    total = len(layout.pages)
+    for index, ops in enumerate(layout.pages, start=1):
+        layout.ops, layout.y = ops, MARGIN - 24
+        layout.text(center, f"Page {index} of {total}", size=8, align="center")
+    return _pdf(layout.pages, document["title"], layout.used)
+
+
+def _pdf(pages, title, used):
+    # Objects: 1 catalog, 2 page tree, 3 info, then the fonts (a font shared
+    # by F1 and F2 is written once), then a page and its content stream per
+    # page. No timestamps, so equal input gives equal bytes.
+    objects = [None] * 3
+    fonts = _fonts()
+    font_ids = {}
+    for name in sorted(fonts):
+        font = fonts[name]
+        if font not in font_ids:
+            chars = set().union(*(used.get(other, set()) for other in fonts if fonts[other] is font))
+            font_ids[font] = len(objects) + 1
+            objects += font.objects(chars, font_ids[font])
+    resources = b" ".join(b"/%s %d 0 R" % (name.encode(), font_ids[fonts[name]]) for name in sorted(fonts))
+    page_ids = []
+    for ops in pages:
+        objects.append(_stream(b"\n".join(ops)))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] /Contents %d 0 R "
+            b"/Resources << /Font << %s >> >> >>" % (PAGE_WIDTH, PAGE_HEIGHT, content_id, resources)
+        )
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % page_id for page_id in page_ids), len(page_ids)
+    )
+    objects[2] = b"<< /Title %s /Producer (WEBSAGA) >>" % _pdf_string(title)
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R /Info 3 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def paper_document(db: Session, qp_id: int):
+    # Everything printed on the paper, as plain data; None if it does not exist
+    row = db.query(models.GeneratedQP, models.Course.code, models.Course.name, models.Regulation.name).outerjoin(
+        models.Course, models.Course.id == models.GeneratedQP.course_id
+    ).outerjoin(
+        models.Regulation, models.Regulation.id == models.GeneratedQP.regulation_id
+    ).filter(models.GeneratedQP.id == qp_id).first()
+    if row is None:
+        return None
+    qp, course_code, course_name, regulation = row
+    questions = [
+        {"section": section, "marks": marks, "text": text}
+        for section, marks, text in qp_items.paper_questions(qp.questions)
+    ]
+    return {
+        "id": qp.id,
+        "title": f"{course_code} - {course_name}" if course_code else f"Course {qp.course_id}",
+        "assessment_type": qp.assessment_type,
+        "academic_year": qp.academic_year,
+        "year": qp.year,
+        "semester": qp.semester,
+        "regulation": regulation or str(qp.regulation_id),
+        "date_of_exam": qp.date_of_exam,
+        "total_marks": sum(question["marks"] or 0 for question in questions),
+        "questions": questions,
+    }
+
+
+def content_key(document):
+    # The paper id is left out so identical papers share one file
+    content = {key: value for key, value in document.items() if key != "id"}
+    payload = json.dumps({"renderer": RENDERER_VERSION, "fonts": [PDF_FONT, PDF_BOLD_FONT], "document": content},
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def cache_path(key):
+    return os.path.join(PDF_CACHE_DIR, key[:2], f"{key}.pdf")
+
+
+def render_to_cache(document, path):
+    # Runs in a worker process. Written to a temporary file and renamed, so a
+    # reader never sees a partial PDF.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = render_paper(document)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+# Renders in flight, by key: concurrent requests for a paper that is not
+# cached yet wait on the same render instead of starting their own
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _render_done(key):
+    with _inflight_lock:
+        _inflight.pop(key, None)
+
+
+async def get_pdf(document, key):
+    path = cache_path(key)
+    if os.path.exists(path):
+        return path
+    with _inflight_lock:
+        future = _inflight.get(key)
+        submitted = future is None
+        if submitted:
+            future = get_executor().submit(render_to_cache, document, path)
+            _inflight[key] = future
+    if submitted:
+        # Outside the lock: a render that has already finished runs the
+        # callback right here, and the callback takes the lock
+        future.add_done_callback(lambda _: _render_done(key))
+    await asyncio.wrap_future(future)
+    return path
+
+
+def download_name(document):
+    name = f"{document['title']}-{document['assessment_type']}-{document['academic_year']}"
+    return re.sub(r"[^A-Za-z0-9._-]+", "-", name).strip("-") + ".pdf"
@@ -1,57 +1,315 @@
+import argparse
+import json
+import os
+import random
+import time
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from .database import SessionLocal, engine
-from . import crud, schemas, models
+from . import cache, migrations, models, search
 from .auth import get_password_hash
 
-def populate_database():
-    models.Base.metadata.create_all(bind=engine)
+# Seeds reference data from a declarative fixture file, and optionally a
+# synthetic staging dataset, in a single transaction. Rows are matched on
+# their natural key (name, code, username) and written with
+# INSERT ... ON CONFLICT DO NOTHING, so re-running only adds what is missing.
+#
+#   python -m app.populate                      # fixtures/seed.json
+#   python -m app.populate --scale 20           # plus ~100k synthetic questions
+#   python -m app.populate --fixture other.json
+#
+# Fixture format: programs, regulations, blooms_levels, difficulty_levels and
+# units are lists of names. Branches name their program, courses their branch
+# (by code) and regulation, faculties their branch; faculty passwords are
+# given in plain text and hashed on load. A course may carry "outcomes" (a
+# list of texts) and "questions" whose "co" is the 1-based position of an
+# outcome and whose "unit", "blooms" and "difficulty" are names. Outcomes and
+# questions have no natural key, so they are only added along with a course
+# that does not exist yet.
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "seed.json")
+CHUNK_SIZE = 1000
+
+# One scale unit of synthetic staging data
+SCALE_BRANCHES = 10
+SCALE_COURSES = 100
+SCALE_FACULTIES = 100
+OUTCOMES_PER_COURSE = 5
+QUESTIONS_PER_COURSE = 50
+STAGING_PASSWORD = "staging"
+
+_NAMED = [
+    ("programs", models.Program),
+    ("regulations", models.Regulation),
+    ("blooms_levels", models.BloomsLevel),
+    ("difficulty_levels", models.DifficultyLevel),
+    ("units", models.Unit),
+]
+
+_QUESTION_REFERENCES = [
+    ("unit", "units", models.Unit),
+    ("blooms", "blooms_levels", models.BloomsLevel),
+    ("difficulty", "difficulty_levels", models.DifficultyLevel),
+]
+
+_WORDS = (
+    "explain describe compare analyse design implement derive evaluate discuss illustrate algorithm "
+    "stack queue tree graph heap hash table sorting searching recursion dynamic programming greedy "
+    "network protocol routing database index transaction normalization query optimizer compiler "
+    "parser grammar automaton memory cache process thread scheduling deadlock semaphore circuit "
+    "voltage transistor amplifier signal filter modulation entropy fluid beam stress strain torque "
+    "with suitable example in detail the following its advantages and limitations of for a given"
+).split()
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _resolve(mapping, value, label):
+    if value not in mapping:
+        raise ValueError(f"Unknown {label} '{value}'")
+    return mapping[value]
+
+
+def _ids(db: Session, model, key, values):
+    # natural key -> id for the rows that exist
+    column = getattr(model, key)
+    found = {}
+    for chunk in _chunks(list(set(values))):
+        found.update(db.execute(select(column, model.id).where(column.in_(chunk))).all())
+    return found
+
+
+def _insert_ignore(db: Session, model, rows):
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    for chunk in _chunks(rows):
+        if dialect == "postgresql":
+            db.execute(postgresql.insert(table).on_conflict_do_nothing(), chunk)
+        elif dialect == "sqlite":
+            db.execute(sqlite.insert(table).on_conflict_do_nothing(), chunk)
+        else:
+            db.execute(table.insert(), chunk)
+
+
+def _load(db: Session, model, key, rows):
+    # Returns (natural key -> id for every row, keys of the rows added now).
+    # Rows that already exist are filtered out first so the caller knows
+    # which are new; ON CONFLICT still covers a concurrent writer.
+    existing = _ids(db, model, key, [row[key] for row in rows])
+    new_rows = list({row[key]: row for row in rows if row[key] not in existing}.values())
+    _insert_ignore(db, model, new_rows)
+    ids = _ids(db, model, key, [row[key] for row in rows])
+    return ids, {row[key] for row in new_rows if row[key] in ids}
+
+
+def _load_program_mappings(db: Session, pairs):
+    # program_branch_mappings has no unique key; only missing pairs are added
+    mapping = models.ProgramBranchMapping
+    existing = set()
+    for chunk in _chunks(pairs):
+        existing.update(db.execute(
+            select(mapping.program_id, mapping.branch_id).where(tuple_(mapping.program_id, mapping.branch_id).in_(chunk))
+        ).all())
+    rows = [{"program_id": program_id, "branch_id": branch_id, "status": True}
+            for program_id, branch_id in dict.fromkeys(pairs) if (program_id, branch_id) not in existing]
+    for chunk in _chunks(rows):
+        db.execute(mapping.__table__.insert(), chunk)
+    return len(rows)
+
+
+def _load_course_contents(db: Session, courses, course_ids, lookups):
+    outcome_rows = [
+        {"course_id": course_ids[course["code"]], "outcome_text": text, "status": True}
+        for course in courses for text in course.get("outcomes", [])
+    ]
+    for chunk in _chunks(outcome_rows):
+        db.execute(models.CourseOutcome.__table__.insert(), chunk)
+
+    # The courses are new, so their outcomes are exactly the ones just added,
+    # in fixture order
+    outcome_ids = {}
+    ids = [course_ids[course["code"]] for course in courses]
+    for chunk in _chunks(ids):
+        rows = db.execute(
+            select(models.CourseOutcome.course_id, models.CourseOutcome.id)
+            .where(models.CourseOutcome.course_id.in_(chunk)).order_by(models.CourseOutcome.id)
+        )
+        for course_id, outcome_id in rows:
+            outcome_ids.setdefault(course_id, []).append(outcome_id)
+
+    question_rows = []
+    for course in courses:
+        course_id = course_ids[course["code"]]
+        outcomes = outcome_ids.get(course_id, [])
+        for question in course.get("questions", []):
+            position = question["co"]
+            if not 1 <= position <= len(outcomes):
+                raise ValueError(f"Course {course['code']} has no outcome CO{position}")
+            question_rows.append({
+                "course_id": course_id,
+                "co_id": outcomes[position - 1],
+                "unit_id": _resolve(lookups["units"], question["unit"], "unit"),
+                "blooms_level_id": _resolve(lookups["blooms_levels"], question["blooms"], "Bloom's level"),
+                "difficulty_level_id": _resolve(lookups["difficulty_levels"], question["difficulty"], "difficulty level"),
+                "question_text": question["text"],
+                "image": question.get("image"),
+                "marks": question["marks"],
+                "status": True,
+            })
+    with search.bulk_insert(db):
+        for chunk in _chunks(question_rows):
+            db.execute(models.Question.__table__.insert(), chunk)
+    return len(outcome_rows), len(question_rows)
+
+
+def load_fixture(db: Session, fixture):
+    # Flushes only; the caller commits. Returns rows added per table.
+    added = {}
+    lookups = {}
+    for name, model in _NAMED:
+        names = fixture.get(name, [])
+        lookups[name], created = _load(db, model, "name", [{"name": value, "status": True} for value in names])
+        added[name] = len(created)
+
+    branches = fixture.get("branches", [])
+    program_ids = _ids(db, models.Program, "name", [branch["program"] for branch in branches])
+    branch_ids, created = _load(db, models.Branch, "code", [
+        {"name": branch["name"], "code": branch["code"], "status": branch.get("status", True)} for branch in branches
+    ])
+    added["branches"] = len(created)
+    added["program_branch_mappings"] = _load_program_mappings(db, [
+        (_resolve(program_ids, branch["program"], "program"), branch_ids[branch["code"]])
+        for branch in branches if branch["code"] in branch_ids
+    ])
+
+    courses = fixture.get("courses", [])
+    faculties = fixture.get("faculties", [])
+    branch_ids.update(_ids(db, models.Branch, "code", [
+        row["branch"] for row in courses + faculties if row.get("branch") and row["branch"] not in branch_ids
+    ]))
+    regulation_ids = _ids(db, models.Regulation, "name", [course["regulation"] for course in courses])
+    course_ids, created = _load(db, models.Course, "code", [
+        {
+            "name": course["name"], "code": course["code"],
+            "branch_id": _resolve(branch_ids, course["branch"], "branch"),
+            "regulation_id": _resolve(regulation_ids, course["regulation"], "regulation"),
+            "year": course["year"], "semester": course["semester"], "course_type": course["course_type"],
+            "elective_type": course["elective_type"], "credits": course["credits"],
+            "status": course.get("status", True),
+        }
+        for course in courses
+    ])
+    added["courses"] = len(created)
+    new_courses = [course for course in courses if course["code"] in created]
+    # Questions may also name levels and units that are already in the database
+    for field, name, model in _QUESTION_REFERENCES:
+        names = [question[field] for course in new_courses for question in course.get("questions", [])]
+        lookups[name].update(_ids(db, model, "name", [value for value in names if value not in lookups[name]]))
+    added["course_outcomes"], added["questions"] = _load_course_contents(db, new_courses, course_ids, lookups)
+
+    hashes = {}
+    _, created = _load(db, models.Faculty, "username", [
+        {
+            "user_type": faculty["user_type"],
+            "branch_id": _resolve(branch_ids, faculty["branch"], "branch") if faculty.get("branch") else None,
+            "honorific": faculty["honorific"], "name": faculty["name"], "empid": faculty["empid"],
+            "phone": faculty["phone"], "username": faculty["username"], "email": faculty["email"],
+            "password_hash": _password_hash(hashes, faculty["password"]),
+            "status": faculty.get("status", True),
+        }
+        for faculty in faculties
+    ])
+    added["faculties"] = len(created)
+
+    changed = [name for name, count in added.items() if count and name not in ("course_outcomes", "questions")]
+    if changed:
+        cache.bump(db, *changed)
+    return added
+
+
+def _password_hash(hashes, password):
+    # Staging data shares one password; hash it once
+    if password not in hashes:
+        hashes[password] = get_password_hash(password)
+    return hashes[password]
+
+
+def _sentence(rng):
+    return " ".join(rng.choices(_WORDS, k=rng.randint(10, 24))).capitalize() + "."
+
+
+def synthetic_fixture(scale, base):
+    # Staging volume: per scale unit SCALE_BRANCHES branches, SCALE_COURSES
+    # courses with a full question bank and SCALE_FACULTIES faculty. Row i is
+    # the same at every scale, so raising the scale only adds rows.
+    programs = base.get("programs") or ["B.Tech"]
+    regulations = base.get("regulations") or ["AR23"]
+    units = base.get("units") or ["Unit 1"]
+    blooms = base.get("blooms_levels") or ["Remember"]
+    difficulty = base.get("difficulty_levels") or ["Easy"]
+    branches = [
+        {"name": f"Staging Branch {i}", "code": f"STG{i:05d}", "program": programs[i % len(programs)]}
+        for i in range(1, scale * SCALE_BRANCHES + 1)
+    ]
+    courses = []
+    for i in range(1, scale * SCALE_COURSES + 1):
+        rng = random.Random(f"course-{i}")
+        courses.append({
+            "name": f"Staging Course {i}", "code": f"STG{i:06d}",
+            "branch": branches[(i - 1) % len(branches)]["code"], "regulation": regulations[i % len(regulations)],
+            "year": rng.choice(["I", "II", "III", "IV"]), "semester": rng.choice(["I", "II"]),
+            "course_type": "Theory", "elective_type": "CORE", "credits": 3.0,
+            "outcomes": [_sentence(rng) for _ in range(OUTCOMES_PER_COURSE)],
+            "questions": [
+                {
+                    "co": rng.randint(1, OUTCOMES_PER_COURSE), "unit": units[q % len(units)],
+                    "blooms": rng.choice(blooms), "difficulty": rng.choice(difficulty),
+                    "text": _sentence(rng), "marks": rng.choice([2.0, 5.0, 10.0]),
+                }
+                for q in range(QUESTIONS_PER_COURSE)
+            ],
+        })
+    faculties = [
+        {
+            "user_type": "Faculty", "branch": branches[(i - 1) % len(branches)]["code"], "honorific": "Dr.",
+            "name": f"Staging Faculty {i}", "empid": f"STG{i:06d}", "phone": f"9{i:09d}",
+            "username": f"staging{i}", "email": f"staging{i}@example.edu", "password": STAGING_PASSWORD,
+        }
+        for i in range(1, scale * SCALE_FACULTIES + 1)
+    ]
+    return {"branches": branches, "courses": courses, "faculties": faculties}
+
+
+def read_fixture(path=FIXTURE):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def populate_database(fixture_path=FIXTURE, scale=0):
+    migrations.migrate(engine)
+    fixture = read_fixture(fixture_path)
     db = SessionLocal()
     try:
-        # Add Programs if not exist
-        programs = ["B.Tech", "M.Tech", "MBA", "MCA"]
-        for prog in programs:
-            if not db.query(models.Program).filter(models.Program.name == prog).first():
-                crud.create_program(db, schemas.ProgramCreate(name=prog))
-
-        # Add Branches if not exist
-        btech = db.query(models.Program).filter(models.Program.name == "B.Tech").first()
-        if btech:
-            branches = [
-                {"name": "Computer Science", "code": "CSE", "program_id": btech.id},
-                {"name": "Information Technology", "code": "IT", "program_id": btech.id},
-                {"name": "Electronics", "code": "ECE", "program_id": btech.id},
-                {"name": "Mechanical Engineering", "code": "ME", "program_id": btech.id},
-                {"name": "Civil Engineering", "code": "CE", "program_id": btech.id},
-                {"name": "Electrical Engineering", "code": "EE", "program_id": btech.id}
-            ]
-            for branch in branches:
-                if not db.query(models.Branch).filter(models.Branch.code == branch["code"]).first():
-                    crud.create_branch(db, schemas.BranchCreate(**branch))
-
-        # Add Regulations if not exist
-        regulations = ["AR23", "AR21", "AR20"]
-        for reg in regulations:
-            if not db.query(models.Regulation).filter(models.Regulation.name == reg).first():
-                crud.create_regulation(db, schemas.RegulationCreate(name=reg))
-
-        # Add Faculty if not exist
-        if not db.query(models.Faculty).filter(models.Faculty.username == "rakesh").first():
-            rakesh = schemas.FacultyCreate(
-                user_type="Faculty",
-                branch_id=1,
-                honorific="Mr.",
-                name="Rakesh",
-                empid="FAC002",
-                phone="1234567890",
-                username="rakesh",
-                email="rakesh@websaga.com",
-                password_hash=get_password_hash("1234")
-            )
-            crud.create_faculty(db, rakesh)
-
-        print("Database populated with sample data")
+        added = load_fixture(db, fixture)
+        if scale:
+            for name, count in load_fixture(db, synthetic_fixture(scale, fixture)).items():
+                added[name] += count
+        db.commit()
     finally:
         db.close()
+    return added
+
 
 if __name__ == "__main__":
-    populate_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(prog="python -m app.populate")
+    parser.add_argument("--fixture", default=FIXTURE, help="fixture file to load")
+    parser.add_argument("--scale", type=int, default=0,
+                        help=f"also add synthetic staging data, {SCALE_COURSES * QUESTIONS_PER_COURSE} questions per unit")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    added = populate_database(args.fixture, args.scale)
+    summary = ", ".join(f"{count} {name}" for name, count in added.items() if count) or "nothing new"
+    print(f"Database populated in {time.perf_counter() - started:.1f}s: {summary}")
@@ -0,0 +1,317 @@
+import os
+import random
+import re
+from collections import defaultdict
+from sqlalchemy.orm import Session
+from . import models
+from .cache import LRUCache
+
+# How long a cached candidate pool is trusted before it is reloaded. Writes made
+# through crud invalidate the pool immediately; the TTL only bounds staleness
+# for writes made by other worker processes.
+POOL_TTL_SECONDS = 300
+
+# Pools kept per process, least recently used dropped first, so generating
+# for every course of a large bank does not keep all of them in memory
+POOL_MAX_ENTRIES = int(os.environ.get("WEBSAGA_POOL_MAX_ENTRIES", 256))
+
+# Upper bound on candidates scored per question slot, so generation cost does
+# not grow with the size of the question bank.
+CANDIDATES_PER_SLOT = 64
+
+MAX_ATTEMPTS = 25
+
+# With avoid_reuse, a question used in the paper's own academic year loses
+# REUSE_PENALTY from its score (more than a blooms or difficulty match earns),
+# halving for every year since; each past use costs USE_COUNT_PENALTY more, up
+# to MAX_COUNTED_USES uses.
+REUSE_PENALTY = 4.0
+USE_COUNT_PENALTY = 0.1
+MAX_COUNTED_USES = 10
+
+_YEAR = re.compile(r"\d{4}")
+
+
+class GenerationError(Exception):
+    pass
+
+
+# Lean, picklable view of one course's active questions. Each candidate is a
+# tuple (id, unit_id, co_id, blooms_level_id, difficulty_level_id, marks),
+# bucketed by unit and then by marks so a slot only looks at questions that can
+# still satisfy the marks total.
+class CandidatePool:
+    __slots__ = ("course_id", "by_unit", "co_ids")
+
+    def __init__(self, course_id, rows):
+        self.course_id = course_id
+        by_unit = defaultdict(lambda: defaultdict(list))
+        co_ids = set()
+        for row in rows:
+            candidate = (row[0], row[1], row[2], row[3], row[4], float(row[5]))
+            by_unit[candidate[1]][candidate[5]].append(candidate)
+            co_ids.add(candidate[2])
+        self.by_unit = {unit_id: dict(buckets) for unit_id, buckets in by_unit.items()}
+        self.co_ids = sorted(co_ids)
+
+    def __getstate__(self):
+        return (self.course_id, self.by_unit, self.co_ids)
+
+    def __setstate__(self, state):
+        self.course_id, self.by_unit, self.co_ids = state
+
+    def __len__(self):
+        return sum(len(bucket) for buckets in self.by_unit.values() for bucket in buckets.values())
+
+
+_pools = LRUCache(POOL_MAX_ENTRIES, POOL_TTL_SECONDS)
+
+
+def load_pool(db: Session, course_id: int):
+    rows = db.query(
+        models.Question.id,
+        models.Question.unit_id,
+        models.Question.co_id,
+        models.Question.blooms_level_id,
+        models.Question.difficulty_level_id,
+        models.Question.marks,
+    ).filter(models.Question.course_id == course_id, models.Question.status == True).all()
+    return CandidatePool(course_id, rows)
+
+
+def load_pools(db: Session, course_ids):
+    # One query for many courses, used by batch generation
+    rows_by_course = {course_id: [] for course_id in course_ids}
+    if not rows_by_course:
+        return {}
+    rows = db.query(
+        models.Question.course_id,
+        models.Question.id,
+        models.Question.unit_id,
+        models.Question.co_id,
+        models.Question.blooms_level_id,
+        models.Question.difficulty_level_id,
+        models.Question.marks,
+    ).filter(models.Question.course_id.in_(list(rows_by_course)), models.Question.status == True)
+    for row in rows.yield_per(5000):
+        rows_by_course[row[0]].append(row[1:])
+    return {course_id: CandidatePool(course_id, rows) for course_id, rows in rows_by_course.items()}
+
+
+def get_pool(db: Session, course_id: int):
+    found, pool = _pools.get(course_id)
+    if found:
+        return pool
+    pool = load_pool(db, course_id)
+    _pools.set(course_id, pool)
+    return pool
+
+
+def invalidate_pool(course_id=None):
+    if course_id is None:
+        _pools.clear()
+    else:
+        _pools.pop(course_id)
+
+
+def _start_year(academic_year):
+    # "2025-2026" -> 2025
+    match = _YEAR.search(academic_year or "")
+    return int(match.group()) if match else None
+
+
+# Usage is read from the precomputed question_usage counters: one indexed
+# lookup per course, only for questions that have been used at all
+def load_usage(db: Session, course_id: int):
+    return load_usages(db, [course_id])[course_id]
+
+
+def load_usages(db: Session, course_ids):
+    # course_id -> {question_id: (times_used, start year of last use)}
+    usages = {course_id: {} for course_id in course_ids}
+    if not usages:
+        return {}
+    rows = db.query(
+        models.QuestionUsage.course_id,
+        models.QuestionUsage.question_id,
+        models.QuestionUsage.times_used,
+        models.QuestionUsage.last_academic_year,
+    ).filter(models.QuestionUsage.course_id.in_(list(usages)), models.QuestionUsage.times_used > 0)
+    for course_id, question_id, times_used, last_academic_year in rows:
+        usages[course_id][question_id] = (times_used, _start_year(last_academic_year))
+    return usages
+
+
+def reuse_penalties(usage, academic_year=None):
+    # question_id -> score penalty. Recency is measured from the paper's
+    # academic year, or from the course's most recent paper when not given.
+    reference = _start_year(academic_year)
+    if reference is None:
+        reference = max((year for _, year in usage.values() if year is not None), default=None)
+    penalties = {}
+    for question_id, (times_used, year) in usage.items():
+        years_ago = max(0, reference - year) if reference is not None and year is not None else 0
+        penalties[question_id] = REUSE_PENALTY * 0.5 ** years_ago + USE_COUNT_PENALTY * min(times_used, MAX_COUNTED_USES)
+    return penalties
+
+
+def _reachable_sums(pool, slots):
+    # reachable[i] holds every marks total that slots i..end can add up to.
+    # Marks take only a handful of distinct values, so these sets stay small.
+    reachable = [None] * (len(slots) + 1)
+    reachable[len(slots)] = {0.0}
+    for i in range(len(slots) - 1, -1, -1):
+        marks = pool.by_unit[slots[i]].keys()
+        reachable[i] = {round(s + m, 2) for s in reachable[i + 1] for m in marks}
+    return reachable
+
+
+def _attempt(pool, slots, total_marks, blooms_need, difficulty_need, co_uncovered, penalties, rng):
+    slots = slots[:]
+    rng.shuffle(slots)
+    blooms_need = dict(blooms_need)
+    difficulty_need = dict(difficulty_need)
+    co_uncovered = set(co_uncovered)
+    reachable = _reachable_sums(pool, slots)
+
+    chosen = []
+    chosen_ids = set()
+    remaining = total_marks
+    for i, unit_id in enumerate(slots):
+        buckets = pool.by_unit[unit_id]
+        feasible = [m for m in buckets if round(remaining - m, 2) in reachable[i + 1]]
+        if not feasible:
+            return None
+
+        per_bucket = max(1, CANDIDATES_PER_SLOT // len(feasible))
+        best, best_score = None, None
+        for m in feasible:
+            bucket = buckets[m]
+            size = len(bucket)
+            start = rng.randrange(size)
+            for k in range(min(per_bucket, size)):
+                candidate = bucket[(start + k) % size]
+                if candidate[0] in chosen_ids:
+                    continue
+                score = rng.random() * 0.5
+                if blooms_need.get(candidate[3], 0) > 0:
+                    score += 2
+                if difficulty_need.get(candidate[4], 0) > 0:
+                    score += 2
+                if candidate[2] in co_uncovered:
+                    score += 3
+                score -= penalties.get(candidate[0], 0.0)
+                if best is None or score > best_score:
+                    best, best_score = candidate, score
+        if best is None:
+            return None
+
+        chosen.append(best)
+        chosen_ids.add(best[0])
+        remaining -= best[5]
+        if blooms_need.get(best[3], 0) > 0:
+            blooms_need[best[3]] -= 1
+        if difficulty_need.get(best[4], 0) > 0:
+            difficulty_need[best[4]] -= 1
+        co_uncovered.discard(best[2])
+
+    unmet = {}
+    blooms_short = {k: v for k, v in blooms_need.items() if v > 0}
+    difficulty_short = {k: v for k, v in difficulty_need.items() if v > 0}
+    if blooms_short:
+        unmet["blooms_mix"] = blooms_short
+    if difficulty_short:
+        unmet["difficulty_mix"] = difficulty_short
+    if co_uncovered:
+        unmet["co_ids"] = sorted(co_uncovered)
+    return chosen, unmet
+
+
+# Pure selection step: needs only the pool, the blueprint and (for avoid_reuse)
+# the course's usage, so it can run in a worker process without a database
+# session.
+def select_questions(pool, blueprint, rng=None, usage=None):
+    if rng is None:
+        rng = random.Random(blueprint.seed)
+    penalties = reuse_penalties(usage, blueprint.academic_year) if blueprint.avoid_reuse and usage else {}
+
+    slots = []
+    for unit_id, count in blueprint.unit_counts.items():
+        if count <= 0:
+            continue
+        buckets = pool.by_unit.get(unit_id)
+        available = sum(len(b) for b in buckets.values()) if buckets else 0
+        if available < count:
+            raise GenerationError(f"Unit {unit_id} has {available} questions, blueprint needs {count}")
+        slots.extend([unit_id] * count)
+    if not slots:
+        raise GenerationError("Blueprint does not ask for any questions")
+
+    if round(blueprint.total_marks, 2) not in _reachable_sums(pool, slots)[0]:
+        raise GenerationError(f"Total marks {blueprint.total_marks} cannot be reached with the questions available")
+
+    co_targets = set(pool.co_ids) if blueprint.cover_all_cos else set(blueprint.co_ids)
+
+    best = None
+    for _ in range(MAX_ATTEMPTS):
+        result = _attempt(
+            pool, slots, blueprint.total_marks,
+            blueprint.blooms_mix, blueprint.difficulty_mix, co_targets, penalties, rng,
+        )
+        if result is None:
+            continue
+        if best is None or _unmet_size(result[1]) < _unmet_size(best[1]):
+            best = result
+        if not best[1]:
+            break
+    if best is None:
+        raise GenerationError("Could not satisfy the unit counts and total marks of the blueprint")
+    return best
+
+
+def _unmet_size(unmet):
+    size = sum(unmet.get("blooms_mix", {}).values())
+    size += sum(unmet.get("difficulty_mix", {}).values())
+    size += len(unmet.get("co_ids", []))
+    return size
+
+
+def fetch_question_texts(db: Session, question_ids, chunk_size=500):
+    # Chunked to stay under SQLite's bound-parameter limit on large batches
+    question_ids = list(question_ids)
+    texts = {}
+    for start in range(0, len(question_ids), chunk_size):
+        rows = db.query(models.Question.id, models.Question.question_text).filter(
+            models.Question.id.in_(question_ids[start:start + chunk_size])
+        ).all()
+        texts.update(rows)
+    return texts
+
+
+def build_paper(course_id, chosen, unmet, texts):
+    questions = [
+        {
+            "id": c[0],
+            "unit_id": c[1],
+            "co_id": c[2],
+            "blooms_level_id": c[3],
+            "difficulty_level_id": c[4],
+            "marks": c[5],
+            "question_text": texts.get(c[0], ""),
+        }
+        for c in sorted(chosen, key=lambda c: (c[1], c[0]))
+    ]
+    return {
+        "course_id": course_id,
+        "total_marks": sum(c[5] for c in chosen),
+        "questions": questions,
+        "unmet": unmet,
+    }
+
+
+def generate_paper(db: Session, blueprint):
+    pool = get_pool(db, blueprint.course_id)
+    usage = load_usage(db, blueprint.course_id) if blueprint.avoid_reuse else None
+    chosen, unmet = select_questions(pool, blueprint, usage=usage)
+    texts = fetch_question_texts(db, [c[0] for c in chosen])
+    return build_paper(blueprint.course_id, chosen, unmet, texts)
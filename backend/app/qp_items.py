@@ -0,0 +1,246 @@
+import json
+import re
+from sqlalchemy import bindparam, case, distinct, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from . import models
+from .database import SessionLocal
+
+# Builds and queries generated_qp_items, the relational view of the questions
+# blob stored on each GeneratedQP, and the per-question usage counters derived
+# from them. The blob is still written as before (the paper page renders from
+# it); the items and counters are what reuse queries read.
+#
+# Two blob shapes exist:
+#   generator papers:  {"id": 12, "unit_id": 1, "marks": 5.0, "question_text": ...}
+#   faculty-qp-generation.html: {"meta": "Unit 1 - CO2 (Apply, Medium, 5 Marks)", "content": ...}
+# Items from the page have no question id; they are linked to the bank when
+# their text matches a question of the same course exactly.
+
+CHUNK_SIZE = 500
+
+_META = re.compile(r"^\s*(?P<section>.+?)\s+-\s+.*?(?P<marks>\d+(?:\.\d+)?)\s*Marks?\)\s*$", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def _entries(questions):
+    try:
+        entries = json.loads(questions or "[]")
+    except ValueError:
+        return []
+    return [entry for entry in entries if isinstance(entry, dict)] if isinstance(entries, list) else []
+
+
+def _page_text(entry):
+    # The page saves the text of the whole card: meta line, question, "Remove" button
+    text = _SPACE.sub(" ", str(entry.get("content") or "")).strip()
+    meta = _SPACE.sub(" ", str(entry.get("meta") or "")).strip()
+    if meta and text.startswith(meta):
+        text = text[len(meta):].strip()
+    if text.endswith("Remove"):
+        text = text[:-len("Remove")].strip()
+    return text
+
+
+def build_items(questions, text_ids=None):
+    # Item dicts (without generated_qp_id) for one questions blob. text_ids maps
+    # question text -> id for linking page items to the bank.
+    items = []
+    for position, entry in enumerate(_entries(questions), start=1):
+        item = {"question_id": None, "section": entry.get("section"), "position": position, "marks": None}
+        if entry.get("id") is not None:
+            item["question_id"] = int(entry["id"])
+            item["marks"] = entry.get("marks")
+        else:
+            match = _META.match(str(entry.get("meta") or ""))
+            if match:
+                item["section"] = item["section"] or match.group("section")
+                item["marks"] = float(match.group("marks"))
+            if text_ids:
+                item["question_id"] = text_ids.get(_page_text(entry))
+        items.append(item)
+    return items
+
+
+def paper_questions(questions):
+    # (section, marks, question text) per question of a blob, in paper order
+    entries = _entries(questions)
+    return [
+        (item["section"], item["marks"], str(entry.get("question_text") or _page_text(entry)))
+        for entry, item in zip(entries, build_items(questions))
+    ]
+
+
+def _text_ids(db: Session, papers):
+    # (course_id, question text) -> id for the page items of the given papers
+    wanted = {}
+    for _, course_id, _, questions in papers:
+        for entry in _entries(questions):
+            if entry.get("id") is None and entry.get("content"):
+                wanted.setdefault(course_id, set()).add(_page_text(entry))
+    found = {}
+    for course_id, texts in wanted.items():
+        texts = list(texts)
+        for start in range(0, len(texts), CHUNK_SIZE):
+            rows = db.query(models.Question.question_text, models.Question.id).filter(
+                models.Question.course_id == course_id,
+                models.Question.question_text.in_(texts[start:start + CHUNK_SIZE]),
+            )
+            for text, question_id in rows:
+                found.setdefault((course_id, text), question_id)
+    return found
+
+
+def save_items(db: Session, papers):
+    # papers: (generated_qp_id, course_id, academic_year, questions blob) tuples.
+    # Writes the items and advances the usage counters of their questions.
+    papers = list(papers)
+    found = _text_ids(db, papers)
+    rows = []
+    uses = {}  # question_id -> [course_id, papers, latest academic year]
+    for qp_id, course_id, academic_year, questions in papers:
+        text_ids = {text: question_id for (course, text), question_id in found.items() if course == course_id}
+        used = set()
+        for item in build_items(questions, text_ids):
+            item["generated_qp_id"] = qp_id
+            rows.append(item)
+            if item["question_id"] is not None and item["question_id"] not in used:
+                used.add(item["question_id"])
+                use = uses.setdefault(item["question_id"], [course_id, 0, academic_year])
+                use[1] += 1
+                use[2] = max(use[2] or "", academic_year or "") or None
+    if rows:
+        db.execute(models.GeneratedQPItem.__table__.insert(), rows)
+    if uses:
+        record_usage(db, uses)
+    return len(rows)
+
+
+def record_usage(db: Session, uses):
+    # uses: question_id -> (course_id, papers, latest academic year). Counters
+    # only ever move forward, so concurrent savers just add to each other.
+    table = models.QuestionUsage.__table__
+    dialect = db.get_bind().dialect.name
+    ids = list(uses)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[start:start + CHUNK_SIZE]
+        rows = [{"question_id": question_id, "course_id": uses[question_id][0], "times_used": 0} for question_id in chunk]
+        if dialect == "postgresql":
+            db.execute(postgresql.insert(table).on_conflict_do_nothing(), rows)
+        elif dialect == "sqlite":
+            db.execute(sqlite.insert(table).on_conflict_do_nothing(), rows)
+        else:
+            existing = {question_id for (question_id,) in db.query(table.c.question_id).filter(table.c.question_id.in_(chunk))}
+            rows = [row for row in rows if row["question_id"] not in existing]
+            if rows:
+                db.execute(table.insert(), rows)
+    year = bindparam("year")
+    db.execute(
+        table.update().where(table.c.question_id == bindparam("qid")).values(
+            times_used=table.c.times_used + bindparam("papers"),
+            last_academic_year=case(
+                (table.c.last_academic_year.is_(None), year),
+                (table.c.last_academic_year < year, year),
+                else_=table.c.last_academic_year,
+            ),
+        ),
+        [{"qid": question_id, "papers": papers, "year": academic_year} for question_id, (_, papers, academic_year) in uses.items()],
+    )
+
+
+def rebuild_usage(db: Session):
+    # Recomputes every counter from generated_qp_items; the caller commits
+    item = models.GeneratedQPItem
+    qp = models.GeneratedQP
+    db.query(models.QuestionUsage).delete(synchronize_session=False)
+    totals = select(
+        item.question_id, models.Question.course_id,
+        func.count(distinct(item.generated_qp_id)), func.max(qp.academic_year),
+    ).join(qp, qp.id == item.generated_qp_id).join(
+        models.Question, models.Question.id == item.question_id
+    ).group_by(item.question_id, models.Question.course_id)
+    table = models.QuestionUsage.__table__
+    db.execute(table.insert().from_select(
+        ["question_id", "course_id", "times_used", "last_academic_year"], totals
+    ))
+
+
+def backfill_items(db: Session):
+    # Migration for papers saved before generated_qp_items existed; safe to re-run
+    has_items = db.query(models.GeneratedQPItem.id).filter(
+        models.GeneratedQPItem.generated_qp_id == models.GeneratedQP.id
+    ).exists()
+    papers_done = items_done = 0
+    last_id = 0
+    while True:
+        papers = db.query(
+            models.GeneratedQP.id, models.GeneratedQP.course_id, models.GeneratedQP.academic_year,
+            models.GeneratedQP.questions,
+        ).filter(models.GeneratedQP.id > last_id, ~has_items).order_by(models.GeneratedQP.id).limit(CHUNK_SIZE).all()
+        if not papers:
+            break
+        items_done += save_items(db, papers)
+        db.commit()
+        papers_done += len(papers)
+        last_id = papers[-1][0]
+    return papers_done, items_done
+
+
+# Reuse queries
+
+def question_usage(db: Session, course_id: int = None, question_ids=None, since_academic_year: str = None):
+    # question_id -> (papers using it, latest academic year it was used in).
+    # All-time figures come straight from the counters; a window needs the items.
+    item = models.GeneratedQPItem
+    qp = models.GeneratedQP
+    if since_academic_year is None:
+        usage = models.QuestionUsage
+        query = db.query(usage.question_id, usage.times_used, usage.last_academic_year).filter(usage.times_used > 0)
+        if course_id is not None:
+            query = query.filter(usage.course_id == course_id)
+        id_column = usage.question_id
+    else:
+        query = db.query(item.question_id, func.count(distinct(item.generated_qp_id)), func.max(qp.academic_year)).join(
+            qp, qp.id == item.generated_qp_id
+        ).filter(item.question_id.isnot(None), qp.academic_year >= since_academic_year)
+        if course_id is not None:
+            query = query.filter(qp.course_id == course_id)
+        query = query.group_by(item.question_id)
+        id_column = item.question_id
+    if question_ids is None:
+        return {question_id: (count, year) for question_id, count, year in query}
+    question_ids = list(question_ids)
+    usage = {}
+    for start in range(0, len(question_ids), CHUNK_SIZE):
+        chunk = query.filter(id_column.in_(question_ids[start:start + CHUNK_SIZE]))
+        usage.update({question_id: (count, year) for question_id, count, year in chunk})
+    return usage
+
+
+def papers_using(db: Session, question_id: int, skip: int = 0, limit: int = 100):
+    item = models.GeneratedQPItem
+    qp = models.GeneratedQP
+    return db.query(
+        qp.id.label("generated_qp_id"), qp.course_id, qp.academic_year, qp.assessment_type, qp.date_of_exam,
+        item.section, item.position, item.marks,
+    ).join(item, item.generated_qp_id == qp.id).filter(item.question_id == question_id).order_by(
+        qp.academic_year.desc(), qp.id.desc()
+    ).offset(skip).limit(limit).all()
+
+
+def get_items(db: Session, qp_id: int):
+    return db.query(models.GeneratedQPItem).filter(
+        models.GeneratedQPItem.generated_qp_id == qp_id
+    ).order_by(models.GeneratedQPItem.position).all()
+
+
+if __name__ == "__main__":
+    session = SessionLocal()
+    try:
+        papers_done, items_done = backfill_items(session)
+        print(f"Backfilled {items_done} items for {papers_done} generated papers")
+        rebuild_usage(session)
+        session.commit()
+        print("Rebuilt question usage counters")
+    finally:
+        session.close()
@@ -0,0 +1,114 @@
+import re
+import sys
+from types import SimpleNamespace
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from . import crud, models, qp_generator, qp_items
+from .batch_jobs import _matching_courses
+from .database import engine
+
+# Guards the indexes behind the hot read paths. Each check runs the real crud
+# or generator call, captures the SELECTs it sends, and asks SQLite for their
+# EXPLAIN QUERY PLAN: the table must be reached through the expected index,
+# never a full SCAN. Run it after schema or query changes (and in CI):
+#
+#   python -m app.query_plans      # exit status 1 if any check fails
+#
+# Plans do not depend on the data, so an empty migrated database will do.
+# Only SQLite plans are checked; PostgreSQL picks sequential scans for small
+# tables whatever indexes exist.
+
+# (name, call(db), table, indexes any one of which the plan must use)
+HOT_QUERIES = [
+    ("questions of a course", lambda db: crud.get_questions(db, 1, limit=100, after_id=0),
+     "questions", {"ix_questions_course"}),
+    ("question pool for generation", lambda db: qp_generator.load_pool(db, 1),
+     "questions", {"ix_questions_course", "ix_questions_course_selection"}),
+    ("filtered question selection", lambda db: db.query(models.Question.id).filter(
+        models.Question.course_id == 1, models.Question.unit_id == 1,
+        models.Question.blooms_level_id == 1, models.Question.difficulty_level_id == 1,
+    ).all(), "questions", {"ix_questions_course_selection"}),
+    ("course outcomes of a course", lambda db: crud.get_course_outcomes(db, 1),
+     "course_outcomes", {"ix_course_outcomes_course"}),
+    ("program name of a branch", lambda db: crud.get_branch.uncached(db, 1),
+     "program_branch_mappings", {"ix_program_branch_mappings_branch"}),
+    ("courses for batch generation", lambda db: _matching_courses(
+        db, SimpleNamespace(regulation_id=1, year="III", semester="I", program_id=None)),
+     "courses", {"ix_courses_regulation_year_semester"}),
+    ("generated papers of a course", lambda db: crud.get_generated_qps(db, course_id=1),
+     "generated_qps", {"ix_generated_qps_course_year_type"}),
+    ("papers using a question", lambda db: qp_items.papers_using(db, 1),
+     "generated_qp_items", {"ix_generated_qp_items_question_qp"}),
+    ("question usage of a course", lambda db: qp_items.question_usage(db, 1),
+     "question_usage", {"ix_question_usage_course"}),
+    ("near-duplicate candidates", lambda db: db.query(models.QuestionLSHBand.question_id).filter(
+        models.QuestionLSHBand.course_id == 1, models.QuestionLSHBand.bucket == 1,
+    ).all(), "question_lsh_bands", {"ix_question_lsh_bands_lookup"}),
+]
+
+_USES_INDEX = re.compile(r"\bUSING (?:COVERING )?INDEX (\w+)")
+
+
+def capture_selects(bind, call):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(bind, "before_cursor_execute", capture)
+    try:
+        with Session(bind) as db:
+            call(db)
+    finally:
+        event.remove(bind, "before_cursor_execute", capture)
+    return statements
+
+
+def query_plan(bind, statement, parameters):
+    with bind.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+
+def _table_steps(plan, table):
+    # Plan lines that read the table itself ("SCAN questions", "SEARCH questions
+    # USING INDEX ..."), with or without an alias
+    pattern = re.compile(rf"^(?:SCAN|SEARCH) {re.escape(table)}\b")
+    return [line for line in plan if pattern.match(line)]
+
+
+def check_query(bind, call, table, indexes):
+    # Problems with one hot query; empty when every read of the table goes
+    # through one of the indexes
+    steps = []
+    for statement, parameters in capture_selects(bind, call):
+        steps += _table_steps(query_plan(bind, statement, parameters), table)
+    if not steps:
+        return [f"no query read {table}"]
+    problems = []
+    for step in steps:
+        used = _USES_INDEX.search(step)
+        if not used or used.group(1) not in indexes:
+            problems.append(f"{step!r}, expected one of {', '.join(sorted(indexes))}")
+    return problems
+
+
+def check(bind=engine):
+    # Returns (name, problem) for every failing check
+    if bind.dialect.name != "sqlite":
+        return []
+    failures = []
+    for name, call, table, indexes in HOT_QUERIES:
+        failures += [(name, problem) for problem in check_query(bind, call, table, indexes)]
+    return failures
+
+
+if __name__ == "__main__":
+    if engine.dialect.name != "sqlite":
+        print("Query plans are only checked on SQLite")
+        sys.exit(0)
+    failures = check()
+    for name, problem in failures:
+        print(f"FAIL {name}: {problem}")
+    print(f"{len(HOT_QUERIES) - len({name for name, _ in failures})} of {len(HOT_QUERIES)} hot queries use their index")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,297 @@
+import csv
+import io
+import os
+import tempfile
+import threading
+import uuid
+from datetime import datetime
+from . import models, qp_generator, dedupe
+from .database import SessionLocal
+from .jobs import JobRegistry
+
+IMPORT_BATCH_SIZE = 1000
+
+# Only the first errors (and duplicate flags) are kept so a broken 20k-row file
+# cannot grow the job
+MAX_REPORTED_ERRORS = 500
+
+# Spreadsheet header -> Question column
+COLUMN_ALIASES = {
+    "course": "course_code",
+    "course_code": "course_code",
+    "course_id": "course_id",
+    "co": "co",
+    "co_id": "co",
+    "course_outcome": "co",
+    "blooms": "blooms_level",
+    "bloom": "blooms_level",
+    "blooms_level": "blooms_level",
+    "bloom's_level": "blooms_level",
+    "difficulty": "difficulty_level",
+    "difficulty_level": "difficulty_level",
+    "unit": "unit",
+    "question": "question_text",
+    "question_text": "question_text",
+    "marks": "marks",
+    "image": "image",
+}
+
+REQUIRED_COLUMNS = ("co", "blooms_level", "difficulty_level", "unit", "question_text", "marks")
+
+_jobs = JobRegistry()
+
+
+class QuestionImportError(Exception):
+    pass
+
+
+class ImportJob:
+    def __init__(self, filename, course_id, total_bytes):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.course_id = course_id
+        self.status = "pending"  # pending, running, completed, failed
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.rows_read = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []  # {"row": n, "error": "..."}
+        self.duplicates = []  # {"question_id", "duplicate_of", "similarity"}
+        self.created_at = datetime.utcnow().isoformat()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def add_error(self, row, error):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": error})
+
+    def to_dict(self):
+        with self._lock:
+            progress = self.bytes_read / self.total_bytes if self.total_bytes else 0.0
+            if self.status == "completed":
+                progress = 1.0
+            return {
+                "id": self.id,
+                "filename": self.filename,
+                "course_id": self.course_id,
+                "status": self.status,
+                "progress": round(progress, 4),
+                "rows_read": self.rows_read,
+                "inserted": self.inserted,
+                "failed": self.failed,
+                "errors": list(self.errors),
+                "duplicates": list(self.duplicates),
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+
+def get_job(job_id: str):
+    return _jobs.get(job_id)
+
+
+def _normalize_header(header):
+    key = str(header or "").strip().lower().replace(" ", "_")
+    return COLUMN_ALIASES.get(key, key)
+
+
+class LookupMaps:
+    # Name -> id maps for the small reference tables, loaded once per import.
+    # Course outcomes are loaded per course on first use.
+    def __init__(self, db):
+        self.db = db
+        self.blooms = self._name_map(models.BloomsLevel)
+        self.difficulty = self._name_map(models.DifficultyLevel)
+        self.units = self._name_map(models.Unit)
+        self.courses = {code.lower(): course_id for course_id, code in db.query(models.Course.id, models.Course.code)}
+        self.course_ids = set(self.courses.values())
+        self._outcomes = {}
+
+    def _name_map(self, model):
+        mapping = {}
+        for row_id, name in self.db.query(model.id, model.name):
+            mapping[name.strip().lower()] = row_id
+            mapping[str(row_id)] = row_id
+        return mapping
+
+    def outcomes(self, course_id):
+        # "CO3" is the course's third outcome; outcome text and raw ids also resolve
+        if course_id not in self._outcomes:
+            mapping = {}
+            rows = self.db.query(models.CourseOutcome.id, models.CourseOutcome.outcome_text).filter(
+                models.CourseOutcome.course_id == course_id
+            ).order_by(models.CourseOutcome.id)
+            for position, (row_id, text) in enumerate(rows, start=1):
+                mapping[f"co{position}"] = row_id
+                mapping[text.strip().lower()] = row_id
+                mapping[str(row_id)] = row_id
+            self._outcomes[course_id] = mapping
+        return self._outcomes[course_id]
+
+
+def _resolve(mapping, value, label):
+    key = str(value).strip().lower()
+    if key.endswith(".0"):  # spreadsheets hand back whole numbers as floats
+        key = key[:-2]
+    if key not in mapping:
+        raise ValueError(f"Unknown {label} '{value}'")
+    return mapping[key]
+
+
+def _row_to_question(record, lookups, default_course_id):
+    missing = [column for column in REQUIRED_COLUMNS if record.get(column) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+
+    if record.get("course_id") not in (None, ""):
+        course_id = int(float(record["course_id"]))
+        if course_id not in lookups.course_ids:
+            raise ValueError(f"Unknown course id '{record['course_id']}'")
+    elif record.get("course_code") not in (None, ""):
+        course_id = _resolve(lookups.courses, record["course_code"], "course")
+    elif default_course_id is not None:
+        course_id = default_course_id
+    else:
+        raise ValueError("No course given for row")
+
+    try:
+        marks = float(record["marks"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid marks '{record['marks']}'")
+
+    image = record.get("image")
+    return {
+        "course_id": course_id,
+        "co_id": _resolve(lookups.outcomes(course_id), record["co"], "course outcome"),
+        "blooms_level_id": _resolve(lookups.blooms, record["blooms_level"], "Bloom's level"),
+        "difficulty_level_id": _resolve(lookups.difficulty, record["difficulty_level"], "difficulty level"),
+        "unit_id": _resolve(lookups.units, record["unit"], "unit"),
+        "question_text": str(record["question_text"]).strip(),
+        "image": str(image).strip() if image not in (None, "") else None,
+        "marks": marks,
+        "status": True,
+    }
+
+
+def _csv_records(path, job):
+    with open(path, "rb") as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        reader = csv.reader(text)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [_normalize_header(h) for h in header]
+        for values in reader:
+            job.bytes_read = raw.tell()
+            if not any(values):
+                continue
+            yield reader.line_num, dict(zip(columns, values))
+
+
+def _xlsx_records(path, job):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise QuestionImportError("openpyxl is required to import .xlsx files")
+    # read_only mode streams rows instead of loading the whole sheet
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        total_rows = sheet.max_row or 0
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [_normalize_header(h) for h in header]
+        for position, values in enumerate(rows, start=2):
+            if total_rows:
+                job.bytes_read = int(job.total_bytes * position / total_rows)
+            if not any(v not in (None, "") for v in values):
+                continue
+            yield position, dict(zip(columns, values))
+    finally:
+        workbook.close()
+
+
+def _records(path, filename, job):
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        return _xlsx_records(path, job)
+    return _csv_records(path, job)
+
+
+def _flush_batch(db, batch, job, courses_touched):
+    if not batch:
+        return
+    db.execute(models.Question.__table__.insert(), batch)
+    db.commit()
+    courses_touched.update(row["course_id"] for row in batch)
+    with job._lock:
+        job.inserted += len(batch)
+    batch.clear()
+
+
+def _run_import(job, path):
+    with job._lock:
+        job.status = "running"
+    db = SessionLocal()
+    courses_touched = set()
+    try:
+        lookups = LookupMaps(db)
+        if job.course_id is not None and job.course_id not in lookups.course_ids:
+            raise QuestionImportError(f"Course {job.course_id} not found")
+        batch = []
+        for row_number, record in _records(path, job.filename, job):
+            with job._lock:
+                job.rows_read += 1
+            try:
+                batch.append(_row_to_question(record, lookups, job.course_id))
+            except ValueError as e:
+                with job._lock:
+                    job.add_error(row_number, str(e))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                _flush_batch(db, batch, job, courses_touched)
+        _flush_batch(db, batch, job, courses_touched)
+        for course_id in sorted(courses_touched):
+            duplicates = dedupe.flag_imported(db, course_id)
+            db.commit()
+            with job._lock:
+                job.duplicates.extend(duplicates[:MAX_REPORTED_ERRORS - len(job.duplicates)])
+        with job._lock:
+            job.status = "completed"
+    except Exception as e:
+        db.rollback()
+        with job._lock:
+            job.status = "failed"
+            job.add_error(0, str(e))
+    finally:
+        db.close()
+        os.unlink(path)
+        for course_id in courses_touched:
+            qp_generator.invalidate_pool(course_id)
+        with job._lock:
+            job.finished_at = datetime.utcnow().isoformat()
+        _jobs.finish(job)
+
+
+def spool_upload(source, suffix, chunk_size=1024 * 1024):
+    # Copy the upload to disk in fixed-size chunks; returns (path, size)
+    handle, path = tempfile.mkstemp(suffix=suffix)
+    size = 0
+    with os.fdopen(handle, "wb") as target:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            target.write(chunk)
+            size += len(chunk)
+    return path, size
+
+
+def start_import(path, size, filename, course_id=None):
+    job = ImportJob(filename, course_id, size)
+    _jobs.add(job)
+    thread = threading.Thread(target=_run_import, args=(job, path), daemon=True)
+    thread.start()
+    return job
@@ -1,29 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from .. import crud, models, schemas
-from ..database import SessionLocal
-from ..auth import verify_password
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from .. import auth, crud, models, schemas
+from ..database import DBSession, get_session, get_read_session
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Claims of the bearer token on the request; checked against the signature
+# only, no database lookup
+def current_user(authorization: Optional[str] = Header(None)):
+    scheme, _, token = (authorization or "").partition(" ")
+    claims = auth.verify_token(token) if scheme.lower() == "bearer" else None
+    if claims is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return claims
 
 @router.post("/login")
-def login(credentials: schemas.LoginRequest, db: Session = Depends(get_db)):
+async def login(credentials: schemas.LoginRequest, db: DBSession = Depends(get_session, scope="function")):
     username = credentials.username
     password = credentials.password
 
-    faculty = db.query(models.Faculty).filter(models.Faculty.username == username).first()
+    faculty = await db.run(crud.get_faculty_by_username, username)
 
-    if not faculty or not verify_password(password, faculty.password_hash):
+    # Hashing runs on the auth pool, never on the event loop
+    stored = faculty.password_hash if faculty else None
+    if not await auth.verify_password_async(password, stored) or not faculty:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    return {"message": "Login successful", "user": {"id": faculty.id, "name": faculty.name, "role": faculty.user_type}}
-def get_all_users(db: Session = Depends(get_db)):
-    faculties = db.query(models.Faculty).all()
+    # Plaintext and outdated hashes are replaced while the password is at hand
+    if auth.needs_rehash(faculty.password_hash):
+        password_hash = await auth.hash_password_async(password)
+        await db.run(crud.set_password_hash, faculty.id, password_hash)
+
+    return {
+        "message": "Login successful",
+        "user": {"id": faculty.id, "name": faculty.name, "role": faculty.user_type},
+        "access_token": auth.issue_token(faculty),
+        "token_type": "bearer",
+        "expires_in": auth.TOKEN_TTL_SECONDS,
+    }
+
+@router.get("/me")
+async def read_current_user(user: dict = Depends(current_user)):
+    return {"id": user["sub"], "name": user["name"], "role": user["role"], "expires_at": user["exp"]}
+
+async def get_all_users(db: DBSession = Depends(get_read_session, scope="function")):
+    faculties = await db.run(lambda session: session.query(models.Faculty).all())
     return [{"id": f.id, "name": f.name, "email": f.email, "user_type": f.user_type, "empid": f.empid} for f in faculties]
\ No newline at end of file
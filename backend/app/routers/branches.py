@@ -1,43 +1,50 @@
+from typing import Optional, Union
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
 from .. import crud, models, schemas
-from ..database import SessionLocal
+from ..conditional import conditional_get
+from ..pagination import page
+from ..database import DBSession, get_session, get_read_session, get_sync_session
 
 router = APIRouter(prefix="/branches", tags=["branches"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-@router.get("/", response_model=list[schemas.Branch])
-def read_branches(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    branches = crud.get_branches(db, skip=skip, limit=limit)
-    return branches
-
-@router.get("/{branch_id}", response_model=schemas.Branch)
-def read_branch(branch_id: int, db: Session = Depends(get_db)):
-    db_branch = crud.get_branch(db, branch_id=branch_id)
+@router.get("/", response_model=Union[list[schemas.Branch], schemas.Page[schemas.Branch]], dependencies=[Depends(conditional_get(*crud.BRANCH_TABLES))])
+async def read_branches(skip: int = 0, limit: int = 100, after_id: Optional[int] = None, db: DBSession = Depends(get_read_session, scope="function")):
+    branches = await db.run(crud.get_branches, skip=skip, limit=limit, after_id=after_id)
+    return page(branches, limit, after_id)
+
+@router.get("/{branch_id}", response_model=schemas.Branch, dependencies=[Depends(conditional_get(*crud.BRANCH_TABLES))])
+async def read_branch(branch_id: int, db: DBSession = Depends(get_read_session, scope="function")):
+    db_branch = await db.run(crud.get_branch, branch_id=branch_id)
     if db_branch is None:
         raise HTTPException(status_code=404, detail="Branch not found")
     return db_branch
 
 @router.post("/", response_model=schemas.Branch)
-def create_branch(branch: schemas.BranchCreate, db: Session = Depends(get_db)):
-    return crud.create_branch(db=db, branch=branch)
+async def create_branch(branch: schemas.BranchCreate, db: DBSession = Depends(get_session, scope="function")):
+    return await db.run(crud.create_branch, branch=branch)
+
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def bulk_create_branches(rows: list[dict], atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_create_branches, rows, atomic=atomic)
+
+@router.put("/bulk", response_model=schemas.BulkResult)
+async def bulk_update_branches(rows: list[dict], atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_update_branches, rows, atomic=atomic)
+
+@router.post("/bulk/delete", response_model=schemas.BulkResult)
+async def bulk_delete_branches(payload: schemas.BulkDelete, atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_delete_branches, payload.ids, atomic=atomic)
 
 @router.put("/{branch_id}", response_model=schemas.Branch)
-def update_branch(branch_id: int, branch: schemas.BranchCreate, db: Session = Depends(get_db)):
-    db_branch = crud.update_branch(db, branch_id=branch_id, branch=branch)
+async def update_branch(branch_id: int, branch: schemas.BranchCreate, db: DBSession = Depends(get_session, scope="function")):
+    db_branch = await db.run(crud.update_branch, branch_id=branch_id, branch=branch)
     if db_branch is None:
         raise HTTPException(status_code=404, detail="Branch not found")
     return db_branch
 
 @router.delete("/{branch_id}")
-def delete_branch(branch_id: int, db: Session = Depends(get_db)):
-    db_branch = crud.delete_branch(db, branch_id=branch_id)
+async def delete_branch(branch_id: int, db: DBSession = Depends(get_session, scope="function")):
+    db_branch = await db.run(crud.delete_branch, branch_id=branch_id)
     if db_branch is None:
         raise HTTPException(status_code=404, detail="Branch not found")
     return {"message": "Branch deleted"}
\ No newline at end of file
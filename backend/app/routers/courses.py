@@ -1,43 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Response
 from .. import crud, models, schemas
-from ..database import SessionLocal
+from ..conditional import conditional_get
+from ..pagination import json_page
+from ..export import export_response
+from ..database import DBSession, get_session, get_read_session, get_sync_session
 
 router = APIRouter(prefix="/courses", tags=["courses"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-@router.get("/", response_model=list[schemas.Course])
-def read_courses(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    courses = crud.get_courses(db, skip=skip, limit=limit)
-    return courses
-
-@router.get("/{course_id}", response_model=schemas.Course)
-def read_course(course_id: int, db: Session = Depends(get_db)):
-    db_course = crud.get_course(db, course_id=course_id)
+@router.get("/", response_model=Union[list[schemas.Course], schemas.Page[schemas.Course]], dependencies=[Depends(conditional_get("courses"))])
+async def read_courses(response: Response, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, db: DBSession = Depends(get_read_session, scope="function")):
+    courses = await db.run(crud.get_courses, skip=skip, limit=limit, after_id=after_id)
+    return json_page(courses, limit, after_id, response)
+
+@router.get("/export")
+async def export_courses(format: str = "ndjson", gzip: bool = False, regulation_id: Optional[int] = None,
+                         branch_id: Optional[int] = None, year: Optional[str] = None, semester: Optional[str] = None,
+                         status: Optional[bool] = None):
+    return export_response("courses", format, gzip, {"regulation_id": regulation_id, "branch_id": branch_id,
+                                                     "year": year, "semester": semester, "status": status})
+
+@router.get("/{course_id}", response_model=schemas.Course, dependencies=[Depends(conditional_get("courses"))])
+async def read_course(course_id: int, db: DBSession = Depends(get_read_session, scope="function")):
+    db_course = await db.run(crud.get_course, course_id=course_id)
     if db_course is None:
         raise HTTPException(status_code=404, detail="Course not found")
     return db_course
 
 @router.post("/", response_model=schemas.Course)
-def create_course(course: schemas.CourseCreate, db: Session = Depends(get_db)):
-    return crud.create_course(db=db, course=course)
+async def create_course(course: schemas.CourseCreate, db: DBSession = Depends(get_session, scope="function")):
+    return await db.run(crud.create_course, course=course)
+
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def bulk_create_courses(rows: list[dict], atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_create_courses, rows, atomic=atomic)
+
+@router.put("/bulk", response_model=schemas.BulkResult)
+async def bulk_update_courses(rows: list[dict], atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_update_courses, rows, atomic=atomic)
+
+@router.post("/bulk/delete", response_model=schemas.BulkResult)
+async def bulk_delete_courses(payload: schemas.BulkDelete, atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_delete_courses, payload.ids, atomic=atomic)
 
 @router.put("/{course_id}", response_model=schemas.Course)
-def update_course(course_id: int, course: schemas.CourseCreate, db: Session = Depends(get_db)):
-    db_course = crud.update_course(db, course_id=course_id, course=course)
+async def update_course(course_id: int, course: schemas.CourseCreate, db: DBSession = Depends(get_session, scope="function")):
+    db_course = await db.run(crud.update_course, course_id=course_id, course=course)
     if db_course is None:
         raise HTTPException(status_code=404, detail="Course not found")
     return db_course
 
 @router.delete("/{course_id}")
-def delete_course(course_id: int, db: Session = Depends(get_db)):
-    db_course = crud.delete_course(db, course_id=course_id)
+async def delete_course(course_id: int, db: DBSession = Depends(get_session, scope="function")):
+    db_course = await db.run(crud.delete_course, course_id=course_id)
     if db_course is None:
         raise HTTPException(status_code=404, detail="Course not found")
     return {"message": "Course deleted"}
\ No newline at end of file
@@ -1,43 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Response
 from .. import crud, models, schemas
-from ..database import SessionLocal
+from ..conditional import conditional_get
+from ..pagination import json_page
+from ..export import export_response
+from ..database import DBSession, get_session, get_read_session, get_sync_session
 
 router = APIRouter(prefix="/faculties", tags=["faculties"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-@router.get("/", response_model=list[schemas.Faculty])
-def read_faculties(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    faculties = crud.get_faculties(db, skip=skip, limit=limit)
-    return faculties
-
-@router.get("/{faculty_id}", response_model=schemas.Faculty)
-def read_faculty(faculty_id: int, db: Session = Depends(get_db)):
-    db_faculty = crud.get_faculty(db, faculty_id=faculty_id)
+@router.get("/", response_model=Union[list[schemas.Faculty], schemas.Page[schemas.Faculty]], dependencies=[Depends(conditional_get("faculties"))])
+async def read_faculties(response: Response, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, db: DBSession = Depends(get_read_session, scope="function")):
+    faculties = await db.run(crud.get_faculties, skip=skip, limit=limit, after_id=after_id)
+    return json_page(faculties, limit, after_id, response)
+
+@router.get("/export")
+async def export_faculties(format: str = "ndjson", gzip: bool = False, branch_id: Optional[int] = None,
+                           user_type: Optional[str] = None, status: Optional[bool] = None):
+    return export_response("faculties", format, gzip, {"branch_id": branch_id, "user_type": user_type, "status": status})
+
+@router.get("/{faculty_id}", response_model=schemas.Faculty, dependencies=[Depends(conditional_get("faculties"))])
+async def read_faculty(faculty_id: int, db: DBSession = Depends(get_read_session, scope="function")):
+    db_faculty = await db.run(crud.get_faculty, faculty_id=faculty_id)
     if db_faculty is None:
         raise HTTPException(status_code=404, detail="Faculty not found")
     return db_faculty
 
 @router.post("/", response_model=schemas.Faculty)
-def create_faculty(faculty: schemas.FacultyCreate, db: Session = Depends(get_db)):
-    return crud.create_faculty(db=db, faculty=faculty)
+async def create_faculty(faculty: schemas.FacultyCreate, db: DBSession = Depends(get_session, scope="function")):
+    return await db.run(crud.create_faculty, faculty=faculty)
+
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def bulk_create_faculties(rows: list[dict], atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_create_faculties, rows, atomic=atomic)
+
+@router.put("/bulk", response_model=schemas.BulkResult)
+async def bulk_update_faculties(rows: list[dict], atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_update_faculties, rows, atomic=atomic)
+
+@router.post("/bulk/delete", response_model=schemas.BulkResult)
+async def bulk_delete_faculties(payload: schemas.BulkDelete, atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_delete_faculties, payload.ids, atomic=atomic)
 
 @router.put("/{faculty_id}", response_model=schemas.Faculty)
-def update_faculty(faculty_id: int, faculty: schemas.FacultyCreate, db: Session = Depends(get_db)):
-    db_faculty = crud.update_faculty(db, faculty_id=faculty_id, faculty=faculty)
+async def update_faculty(faculty_id: int, faculty: schemas.FacultyCreate, db: DBSession = Depends(get_session, scope="function")):
+    db_faculty = await db.run(crud.update_faculty, faculty_id=faculty_id, faculty=faculty)
     if db_faculty is None:
         raise HTTPException(status_code=404, detail="Faculty not found")
     return db_faculty
 
 @router.delete("/{faculty_id}")
-def delete_faculty(faculty_id: int, db: Session = Depends(get_db)):
-    db_faculty = crud.delete_faculty(db, faculty_id=faculty_id)
+async def delete_faculty(faculty_id: int, db: DBSession = Depends(get_session, scope="function")):
+    db_faculty = await db.run(crud.delete_faculty, faculty_id=faculty_id)
     if db_faculty is None:
         raise HTTPException(status_code=404, detail="Faculty not found")
     return {"message": "Faculty deleted"}
\ No newline at end of file
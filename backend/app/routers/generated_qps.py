@@ -1,44 +1,123 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from .. import crud, schemas
-from ..database import SessionLocal
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from .. import crud, schemas, qp_generator, batch_jobs, qp_items, paper_pdf
+from ..conditional import etag_matches
+from ..pagination import json_page
+from ..export import export_response
+from ..database import DBSession, get_session, get_read_session, get_sync_session
 
 router = APIRouter(prefix="/generated_qps", tags=["generated_qps"])
 
-def get_db():
-    db = SessionLocal()
+
+@router.post("/", response_model=schemas.GeneratedQP)
+async def create_generated_qp(qp: schemas.GeneratedQPCreate, db: DBSession = Depends(get_session, scope="function")):
     try:
-        yield db
-    finally:
-        db.close()
+        return await db.run(crud.create_generated_qp, qp=qp)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/", response_model=schemas.GeneratedQP)
-def create_generated_qp(qp: schemas.GeneratedQPCreate, db: Session = Depends(get_db)):
+@router.post("/generate", response_model=schemas.GeneratedPaper)
+async def generate_qp(blueprint: schemas.QPBlueprint, db: DBSession = Depends(get_sync_session, scope="function")):
+    try:
+        return await db.run(qp_generator.generate_paper, blueprint)
+    except qp_generator.GenerationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.post("/batch", response_model=schemas.BatchJobStatus, status_code=202)
+async def start_batch_generation(request: schemas.BatchGenerationRequest, db: DBSession = Depends(get_sync_session, scope="function")):
+    job = await db.run(batch_jobs.start_batch_job, request)
+    return job.to_dict()
+
+
+@router.get("/batch", response_model=list[schemas.BatchJobStatus])
+async def list_batch_jobs():
+    return [job.to_dict() for job in batch_jobs.list_jobs()]
+
+
+@router.get("/batch/{job_id}", response_model=schemas.BatchJobStatus)
+async def get_batch_job(job_id: str):
+    job = batch_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job.to_dict()
+
+
+@router.get("/", response_model=Union[list[schemas.GeneratedQP], schemas.Page[schemas.GeneratedQP]])
+async def list_generated_qps(response: Response, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, course_id: Optional[int] = None,
+                             academic_year: Optional[str] = None, assessment_type: Optional[str] = None,
+                             db: DBSession = Depends(get_read_session, scope="function")):
     try:
-        return crud.create_generated_qp(db=db, qp=qp)
+        qps = await db.run(crud.get_generated_qps, skip=skip, limit=limit, course_id=course_id,
+                           academic_year=academic_year, assessment_type=assessment_type, after_id=after_id)
+        return json_page(qps, limit, after_id, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/", response_model=list[schemas.GeneratedQP])
-def list_generated_qps(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@router.get("/course/{course_id}", response_model=Union[list[schemas.GeneratedQP], schemas.Page[schemas.GeneratedQP]])
+async def list_course_generated_qps(response: Response, course_id: int, academic_year: Optional[str] = None,
+                                    assessment_type: Optional[str] = None, skip: int = 0, limit: int = 100,
+                                    after_id: Optional[int] = None,
+                                    db: DBSession = Depends(get_read_session, scope="function")):
     try:
-        return crud.get_generated_qps(db=db, skip=skip, limit=limit)
+        qps = await db.run(crud.get_generated_qps, skip=skip, limit=limit, course_id=course_id,
+                           academic_year=academic_year, assessment_type=assessment_type, after_id=after_id)
+        return json_page(qps, limit, after_id, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/export")
+async def export_generated_qps(format: str = "ndjson", gzip: bool = False, course_id: Optional[int] = None,
+                               academic_year: Optional[str] = None, assessment_type: Optional[str] = None):
+    return export_response("generated_qps", format, gzip, {"course_id": course_id, "academic_year": academic_year,
+                                                           "assessment_type": assessment_type})
+
+
+@router.get("/usage", response_model=list[schemas.QuestionUsage])
+async def question_usage(course_id: Optional[int] = None, since_academic_year: Optional[str] = None,
+                         db: DBSession = Depends(get_read_session, scope="function")):
+    usage = await db.run(qp_items.question_usage, course_id=course_id, since_academic_year=since_academic_year)
+    return [
+        {"question_id": question_id, "times_used": times_used, "last_academic_year": last_academic_year}
+        for question_id, (times_used, last_academic_year) in sorted(usage.items())
+    ]
+
+
 @router.get("/{qp_id}", response_model=schemas.GeneratedQP)
-def get_generated_qp(qp_id: int, db: Session = Depends(get_db)):
+async def get_generated_qp(qp_id: int, db: DBSession = Depends(get_read_session, scope="function")):
     try:
-        qp = crud.get_generated_qps(db=db, skip=0, limit=100)
-        # crud doesn't have a single-get helper; use query via crud.get_generated_qps and filter
-        for item in qp:
-            if item.id == qp_id:
-                return item
-        raise HTTPException(status_code=404, detail="Generated QP not found")
+        qp = await db.run(crud.get_generated_qp, qp_id=qp_id)
+        if qp is None:
+            raise HTTPException(status_code=404, detail="Generated QP not found")
+        return qp
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{qp_id}/items", response_model=list[schemas.GeneratedQPItem])
+async def get_generated_qp_items(qp_id: int, db: DBSession = Depends(get_read_session, scope="function")):
+    return await db.run(qp_items.get_items, qp_id=qp_id)
+
+
+@router.get("/{qp_id}/pdf", response_class=FileResponse)
+async def get_generated_qp_pdf(qp_id: int, request: Request, db: DBSession = Depends(get_read_session, scope="function")):
+    document = await db.run(paper_pdf.paper_document, qp_id=qp_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Generated QP not found")
+    missing = paper_pdf.unrenderable(document)
+    if missing:
+        raise HTTPException(status_code=422, detail=str(paper_pdf.UnrenderableText(missing)))
+    key = paper_pdf.content_key(document)
+    headers = {"ETag": f'"{key[:32]}"', "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, headers["ETag"]):
+        raise HTTPException(status_code=304, headers=headers)
+    path = await paper_pdf.get_pdf(document, key)
+    return FileResponse(path, media_type="application/pdf", filename=paper_pdf.download_name(document),
+                        content_disposition_type="inline", headers=headers)
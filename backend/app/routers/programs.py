@@ -1,43 +1,50 @@
+from typing import Optional, Union
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
 from .. import crud, models, schemas
-from ..database import SessionLocal
+from ..conditional import conditional_get
+from ..pagination import page
+from ..database import DBSession, get_session, get_read_session, get_sync_session
 
 router = APIRouter(prefix="/programs", tags=["programs"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-@router.get("/", response_model=list[schemas.Program])
-def read_programs(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    programs = crud.get_programs(db, skip=skip, limit=limit)
-    return programs
-
-@router.get("/{program_id}", response_model=schemas.Program)
-def read_program(program_id: int, db: Session = Depends(get_db)):
-    db_program = crud.get_program(db, program_id=program_id)
+@router.get("/", response_model=Union[list[schemas.Program], schemas.Page[schemas.Program]], dependencies=[Depends(conditional_get("programs"))])
+async def read_programs(skip: int = 0, limit: int = 100, after_id: Optional[int] = None, db: DBSession = Depends(get_read_session, scope="function")):
+    programs = await db.run(crud.get_programs, skip=skip, limit=limit, after_id=after_id)
+    return page(programs, limit, after_id)
+
+@router.get("/{program_id}", response_model=schemas.Program, dependencies=[Depends(conditional_get("programs"))])
+async def read_program(program_id: int, db: DBSession = Depends(get_read_session, scope="function")):
+    db_program = await db.run(crud.get_program, program_id=program_id)
     if db_program is None:
         raise HTTPException(status_code=404, detail="Program not found")
     return db_program
 
 @router.post("/", response_model=schemas.Program)
-def create_program(program: schemas.ProgramCreate, db: Session = Depends(get_db)):
-    return crud.create_program(db=db, program=program)
+async def create_program(program: schemas.ProgramCreate, db: DBSession = Depends(get_session, scope="function")):
+    return await db.run(crud.create_program, program=program)
+
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def bulk_create_programs(rows: list[dict], atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_create_programs, rows, atomic=atomic)
+
+@router.put("/bulk", response_model=schemas.BulkResult)
+async def bulk_update_programs(rows: list[dict], atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_update_programs, rows, atomic=atomic)
+
+@router.post("/bulk/delete", response_model=schemas.BulkResult)
+async def bulk_delete_programs(payload: schemas.BulkDelete, atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_delete_programs, payload.ids, atomic=atomic)
 
 @router.put("/{program_id}", response_model=schemas.Program)
-def update_program(program_id: int, program: schemas.ProgramUpdate, db: Session = Depends(get_db)):
-    db_program = crud.update_program(db, program_id=program_id, program=program)
+async def update_program(program_id: int, program: schemas.ProgramUpdate, db: DBSession = Depends(get_session, scope="function")):
+    db_program = await db.run(crud.update_program, program_id=program_id, program=program)
     if db_program is None:
         raise HTTPException(status_code=404, detail="Program not found")
     return db_program
 
 @router.delete("/{program_id}")
-def delete_program(program_id: int, db: Session = Depends(get_db)):
-    db_program = crud.delete_program(db, program_id=program_id)
+async def delete_program(program_id: int, db: DBSession = Depends(get_session, scope="function")):
+    db_program = await db.run(crud.delete_program, program_id=program_id)
     if db_program is None:
         raise HTTPException(status_code=404, detail="Program not found")
     return {"message": "Program deleted"}
\ No newline at end of file
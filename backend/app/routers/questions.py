@@ -0,0 +1,72 @@
+import os
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Response, UploadFile
+from starlette.concurrency import run_in_threadpool
+from .. import crud, schemas, question_import, search, dedupe, qp_items
+from ..pagination import json_page
+from ..export import export_response
+from ..database import DBSession, get_read_session, get_sync_session
+
+router = APIRouter(prefix="/questions", tags=["questions"])
+
+@router.get("/", response_model=Union[list[schemas.Question], schemas.Page[schemas.Question]])
+async def read_questions(response: Response, course_id: int, skip: int = 0, limit: int = 100, after_id: Optional[int] = None,
+                         db: DBSession = Depends(get_read_session, scope="function")):
+    questions = await db.run(crud.get_questions, course_id=course_id, skip=skip, limit=limit, after_id=after_id)
+    return json_page(questions, limit, after_id, response)
+
+@router.post("/", response_model=schemas.QuestionCreated)
+async def create_question(question: schemas.QuestionCreate, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.create_question, question=question)
+
+@router.post("/import", response_model=schemas.QuestionImportStatus, status_code=202)
+async def import_questions(file: UploadFile = File(...), course_id: Optional[int] = Form(None)):
+    filename = file.filename or "upload.csv"
+    suffix = os.path.splitext(filename)[1].lower()
+    if suffix not in (".csv", ".xlsx", ".xlsm"):
+        raise HTTPException(status_code=400, detail="Upload a .csv or .xlsx file")
+    path, size = await run_in_threadpool(question_import.spool_upload, file.file, suffix)
+    job = question_import.start_import(path, size, filename, course_id=course_id)
+    return job.to_dict()
+
+@router.get("/search", response_model=list[schemas.QuestionSearchHit])
+async def search_questions(q: str, course_id: Optional[int] = None, unit_id: Optional[int] = None,
+                           blooms_level_id: Optional[int] = None, difficulty_level_id: Optional[int] = None,
+                           skip: int = 0, limit: int = 20, db: DBSession = Depends(get_read_session, scope="function")):
+    return await db.run(search.search_questions, q, course_id=course_id, unit_id=unit_id,
+                        blooms_level_id=blooms_level_id, difficulty_level_id=difficulty_level_id,
+                        skip=skip, limit=limit)
+
+# Uses a read-write session: questions added outside crud are indexed first
+@router.get("/duplicates", response_model=list[schemas.DuplicateGroup])
+async def duplicate_report(course_id: int, threshold: float = dedupe.DUPLICATE_THRESHOLD,
+                           db: DBSession = Depends(get_sync_session, scope="function")):
+    try:
+        return await db.run(dedupe.duplicate_report, course_id, threshold=threshold)
+    except dedupe.IndexNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+@router.get("/export")
+async def export_questions(format: str = "ndjson", gzip: bool = False, course_id: Optional[int] = None,
+                           unit_id: Optional[int] = None, co_id: Optional[int] = None, status: Optional[bool] = None):
+    return export_response("questions", format, gzip, {"course_id": course_id, "unit_id": unit_id, "co_id": co_id,
+                                                       "status": status})
+
+@router.get("/import/{job_id}", response_model=schemas.QuestionImportStatus)
+async def get_import_job(job_id: str):
+    job = question_import.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job.to_dict()
+
+@router.get("/{question_id}", response_model=schemas.Question)
+async def read_question(question_id: int, db: DBSession = Depends(get_read_session, scope="function")):
+    db_question = await db.run(crud.get_question, question_id=question_id)
+    if db_question is None:
+        raise HTTPException(status_code=404, detail="Question not found")
+    return db_question
+
+@router.get("/{question_id}/papers", response_model=list[schemas.QuestionPaperUse])
+async def read_question_papers(question_id: int, skip: int = 0, limit: int = 100,
+                               db: DBSession = Depends(get_read_session, scope="function")):
+    return await db.run(qp_items.papers_using, question_id=question_id, skip=skip, limit=limit)
@@ -1,39 +1,53 @@
+from typing import Optional, Union
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
 from .. import crud, models, schemas
-from ..database import get_db
+from ..conditional import conditional_get
+from ..pagination import page
+from ..database import DBSession, get_session, get_read_session, get_sync_session
 
 router = APIRouter(
     prefix="/regulations",
     tags=["regulations"]
 )
 
-@router.get("/", response_model=list[schemas.Regulation])
-def read_regulations(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    regulations = crud.get_regulations(db, skip=skip, limit=limit)
-    return regulations
+@router.get("/", response_model=Union[list[schemas.Regulation], schemas.Page[schemas.Regulation]], dependencies=[Depends(conditional_get("regulations"))])
+async def read_regulations(skip: int = 0, limit: int = 100, after_id: Optional[int] = None, db: DBSession = Depends(get_read_session, scope="function")):
+    regulations = await db.run(crud.get_regulations, skip=skip, limit=limit, after_id=after_id)
+    return page(regulations, limit, after_id)
 
-@router.get("/{regulation_id}", response_model=schemas.Regulation)
-def read_regulation(regulation_id: int, db: Session = Depends(get_db)):
-    db_regulation = crud.get_regulation(db, regulation_id=regulation_id)
+@router.get("/{regulation_id}", response_model=schemas.Regulation, dependencies=[Depends(conditional_get("regulations"))])
+async def read_regulation(regulation_id: int, db: DBSession = Depends(get_read_session, scope="function")):
+    db_regulation = await db.run(crud.get_regulation, regulation_id=regulation_id)
     if db_regulation is None:
         raise HTTPException(status_code=404, detail="Regulation not found")
     return db_regulation
 
 @router.post("/", response_model=schemas.Regulation)
-def create_regulation(regulation: schemas.RegulationCreate, db: Session = Depends(get_db)):
-    return crud.create_regulation(db=db, regulation=regulation)
+async def create_regulation(regulation: schemas.RegulationCreate, db: DBSession = Depends(get_session, scope="function")):
+    return await db.run(crud.create_regulation, regulation=regulation)
+
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def bulk_create_regulations(rows: list[dict], atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_create_regulations, rows, atomic=atomic)
+
+@router.put("/bulk", response_model=schemas.BulkResult)
+async def bulk_update_regulations(rows: list[dict], atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_update_regulations, rows, atomic=atomic)
+
+@router.post("/bulk/delete", response_model=schemas.BulkResult)
+async def bulk_delete_regulations(payload: schemas.BulkDelete, atomic: bool = False, db: DBSession = Depends(get_sync_session, scope="function")):
+    return await db.run(crud.bulk_delete_regulations, payload.ids, atomic=atomic)
 
 @router.put("/{regulation_id}", response_model=schemas.Regulation)
-def update_regulation(regulation_id: int, regulation: schemas.RegulationCreate, db: Session = Depends(get_db)):
-    db_regulation = crud.update_regulation(db, regulation_id=regulation_id, regulation=regulation)
+async def update_regulation(regulation_id: int, regulation: schemas.RegulationCreate, db: DBSession = Depends(get_session, scope="function")):
+    db_regulation = await db.run(crud.update_regulation, regulation_id=regulation_id, regulation=regulation)
     if db_regulation is None:
         raise HTTPException(status_code=404, detail="Regulation not found")
     return db_regulation
 
 @router.delete("/{regulation_id}")
-def delete_regulation(regulation_id: int, db: Session = Depends(get_db)):
-    db_regulation = crud.delete_regulation(db, regulation_id=regulation_id)
+async def delete_regulation(regulation_id: int, db: DBSession = Depends(get_session, scope="function")):
+    db_regulation = await db.run(crud.delete_regulation, regulation_id=regulation_id)
     if db_regulation is None:
         raise HTTPException(status_code=404, detail="Regulation not found")
     return {"message": "Regulation deleted successfully"}
\ No newline at end of file
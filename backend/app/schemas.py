@@ -1,11 +1,26 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Any, Generic, TypeVar
 
 # Login schema
 class LoginRequest(BaseModel):
     username: str
     password: str
 
+# Bulk operations
+class BulkRowError(BaseModel):
+    index: int
+    error: str
+
+class BulkResult(BaseModel):
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    ids: list[Optional[int]] = []  # id per payload row, None where the row failed
+    errors: list[BulkRowError] = []
+
+class BulkDelete(BaseModel):
+    ids: list[int]
+
 # Program schemas
 class ProgramBase(BaseModel):
     name: str
@@ -16,6 +31,10 @@ class ProgramCreate(ProgramBase):
 class ProgramUpdate(ProgramBase):
     status: Optional[bool] = None
 
+class ProgramBulkUpdate(ProgramBase):
+    id: int
+    status: Optional[bool] = None
+
 class Program(ProgramBase):
     id: int
     status: bool
@@ -31,6 +50,9 @@ class BranchBase(BaseModel):
 class BranchCreate(BranchBase):
     program_id: int
 
+class BranchBulkUpdate(BranchCreate):
+    id: int
+
 class Branch(BranchBase):
     id: int
     status: bool
@@ -46,6 +68,9 @@ class RegulationBase(BaseModel):
 class RegulationCreate(RegulationBase):
     pass
 
+class RegulationBulkUpdate(RegulationBase):
+    id: int
+
 class Regulation(RegulationBase):
     id: int
     status: bool
@@ -83,6 +108,9 @@ class CourseBase(BaseModel):
 class CourseCreate(CourseBase):
     pass
 
+class CourseBulkUpdate(CourseBase):
+    id: int
+
 class Course(CourseBase):
     id: int
     status: bool
@@ -122,6 +150,9 @@ class FacultyBase(BaseModel):
 class FacultyCreate(FacultyBase):
     pass
 
+class FacultyBulkUpdate(FacultyBase):
+    id: int
+
 class Faculty(FacultyBase):
     id: int
     status: bool
@@ -227,6 +258,44 @@ class Question(QuestionBase):
     class Config:
         from_attributes = True
 
+class DuplicateMatch(BaseModel):
+    question_id: int
+    similarity: float
+
+class QuestionCreated(Question):
+    possible_duplicates: list[DuplicateMatch] = []
+
+class ImportedDuplicate(BaseModel):
+    question_id: int
+    duplicate_of: int
+    similarity: float
+
+class DuplicateGroup(BaseModel):
+    question_ids: list[int]
+    min_similarity: float
+
+class QuestionSearchHit(Question):
+    rank: float
+    snippet: Optional[str] = None
+
+class QuestionImportError(BaseModel):
+    row: int
+    error: str
+
+class QuestionImportStatus(BaseModel):
+    id: str
+    filename: str
+    course_id: Optional[int] = None
+    status: str
+    progress: float
+    rows_read: int
+    inserted: int
+    failed: int
+    errors: list[QuestionImportError] = []
+    duplicates: list[ImportedDuplicate] = []
+    created_at: str
+    finished_at: Optional[str] = None
+
 # Generated QP
 class GeneratedQPBase(BaseModel):
     program_id: int
@@ -246,4 +315,96 @@ class GeneratedQP(GeneratedQPBase):
     id: int
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class GeneratedQPItem(BaseModel):
+    id: int
+    generated_qp_id: int
+    question_id: Optional[int] = None  # None when a hand-built paper's text matches no bank question
+    section: Optional[str] = None
+    position: int
+    marks: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+class QuestionUsage(BaseModel):
+    question_id: int
+    times_used: int
+    last_academic_year: Optional[str] = None
+
+class QuestionPaperUse(BaseModel):
+    generated_qp_id: int
+    course_id: int
+    academic_year: str
+    assessment_type: str
+    date_of_exam: str
+    section: Optional[str] = None
+    position: int
+    marks: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+# QP generation
+class QPBlueprintBase(BaseModel):
+    total_marks: float
+    unit_counts: dict[int, int]  # unit_id -> number of questions
+    blooms_mix: dict[int, int] = {}  # blooms_level_id -> number of questions
+    difficulty_mix: dict[int, int] = {}  # difficulty_level_id -> number of questions
+    co_ids: list[int] = []  # course outcomes that must each be covered
+    cover_all_cos: bool = False
+    seed: Optional[int] = None
+    avoid_reuse: bool = False  # prefer questions not used in recent papers
+    academic_year: Optional[str] = None  # year the paper is for; reuse recency is measured from it
+
+class QPBlueprint(QPBlueprintBase):
+    course_id: int
+
+class GeneratedPaperQuestion(BaseModel):
+    id: int
+    unit_id: int
+    co_id: int
+    blooms_level_id: int
+    difficulty_level_id: int
+    marks: float
+    question_text: str
+
+class GeneratedPaper(BaseModel):
+    course_id: int
+    total_marks: float
+    questions: list[GeneratedPaperQuestion]
+    unmet: dict[str, Any] = {}
+
+class BatchGenerationRequest(BaseModel):
+    regulation_id: int
+    year: str
+    semester: str
+    assessment_type: str  # MID-1, MID-2, Regular, Supply
+    academic_year: str
+    date_of_exam: str
+    program_id: Optional[int] = None  # defaults to each course's program
+    blueprint: QPBlueprintBase
+
+class BatchJobStatus(BaseModel):
+    id: str
+    status: str
+    regulation_id: int
+    year: str
+    semester: str
+    assessment_type: str
+    total: int
+    completed: int
+    failed: int
+    errors: dict[int, str] = {}
+    generated_qp_ids: list[int] = []
+    created_at: str
+    finished_at: Optional[str] = None
+
+# Keyset pagination: list endpoints called with ?after_id= return a page; pass
+# next_cursor back as after_id to continue (None means there is no next page)
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: Optional[int] = None
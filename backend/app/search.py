@@ -0,0 +1,174 @@
+import re
+from contextlib import contextmanager
+from sqlalchemy import column, literal_column, table, text
+from sqlalchemy.orm import Session
+from . import models
+
+# Full-text index over question text and the text of the question's course
+# outcome. On SQLite this is an FTS5 table whose rowid is the question id, kept
+# in sync by triggers so every writer (crud, bulk import, raw inserts) is
+# covered. On PostgreSQL a GIN expression index over the question text serves
+# the same queries.
+FTS_TABLE = "questions_fts"
+
+_SQLITE_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        question_text, outcome_text, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, question_text, outcome_text)
+        VALUES (new.id, new.question_text,
+                coalesce((SELECT outcome_text FROM course_outcomes WHERE id = new.co_id), ''));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS questions_fts_update AFTER UPDATE OF question_text, co_id ON questions BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, question_text, outcome_text)
+        VALUES (new.id, new.question_text,
+                coalesce((SELECT outcome_text FROM course_outcomes WHERE id = new.co_id), ''));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS course_outcomes_fts_update AFTER UPDATE OF outcome_text ON course_outcomes BEGIN
+        UPDATE {FTS_TABLE} SET outcome_text = new.outcome_text
+        WHERE rowid IN (SELECT id FROM questions WHERE co_id = new.id);
+    END""",
+]
+
+_SQLITE_BACKFILL = f"""INSERT INTO {FTS_TABLE}(rowid, question_text, outcome_text)
+    SELECT q.id, q.question_text, coalesce(co.outcome_text, '')
+    FROM questions q LEFT JOIN course_outcomes co ON co.id = q.co_id"""
+
+_POSTGRES_SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS ix_questions_fts ON questions USING gin (to_tsvector('english', question_text))",
+]
+
+# Match weight of question text vs outcome text in bm25 ranking
+QUESTION_WEIGHT = 1.0
+OUTCOME_WEIGHT = 0.4
+
+# bm25 has to score every match before it can return the top rows. A query
+# matching more questions than this (a word found in most of the bank) gains
+# little from ranking, so its hits come back newest first, which FTS5 can
+# stream without scoring.
+RANK_MAX_MATCHES = 20000
+
+_TERM = re.compile(r"\w+\*?", re.UNICODE)
+
+
+def ensure_search_index(engine):
+    # Idempotent; builds the index for questions that predate it
+    with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+            ).first()
+            for statement in _SQLITE_SCHEMA:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text(_SQLITE_BACKFILL))
+        elif conn.dialect.name == "postgresql":
+            for statement in _POSTGRES_SCHEMA:
+                conn.execute(text(statement))
+
+
+@contextmanager
+def bulk_insert(db: Session):
+    # For large loads on SQLite: questions inserted inside the block are
+    # indexed by one INSERT ... SELECT at the end instead of a trigger call per
+    # row, several times faster. The trigger is dropped and recreated inside
+    # the caller's transaction, which holds the write lock throughout, so no
+    # other writer can slip in unindexed rows and a rollback restores it.
+    if db.get_bind().dialect.name != "sqlite":
+        yield
+        return
+    last_id = db.execute(text("SELECT coalesce(max(id), 0) FROM questions")).scalar()
+    db.execute(text("DROP TRIGGER IF EXISTS questions_fts_insert"))
+    yield
+    db.execute(text(_SQLITE_BACKFILL + " WHERE q.id > :last_id"), {"last_id": last_id})
+    db.execute(text(_SQLITE_SCHEMA[1]))
+
+
+def rebuild_search_index(engine):
+    with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+            conn.execute(text(_SQLITE_BACKFILL))
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+
+def _terms(q):
+    # Words are ANDed; a trailing * makes a word a prefix query ("algo*").
+    # Everything else the user types is dropped, so input can never be parsed
+    # as FTS syntax.
+    return [(term.rstrip("*"), term.endswith("*")) for term in _TERM.findall(q)]
+
+
+def _fts5_query(terms):
+    return " ".join(f'"{word}"' + ("*" if prefix else "") for word, prefix in terms)
+
+
+def _tsquery(terms):
+    return " & ".join(word + (":*" if prefix else "") for word, prefix in terms)
+
+
+def _filters(query, course_id, unit_id, blooms_level_id, difficulty_level_id):
+    if course_id is not None:
+        query = query.filter(models.Question.course_id == course_id)
+    if unit_id is not None:
+        query = query.filter(models.Question.unit_id == unit_id)
+    if blooms_level_id is not None:
+        query = query.filter(models.Question.blooms_level_id == blooms_level_id)
+    if difficulty_level_id is not None:
+        query = query.filter(models.Question.difficulty_level_id == difficulty_level_id)
+    return query
+
+
+def search_questions(db: Session, q: str, course_id: int = None, unit_id: int = None, blooms_level_id: int = None,
+                     difficulty_level_id: int = None, skip: int = 0, limit: int = 20):
+    # Best matches first; each hit carries its rank (lower is better on
+    # SQLite, higher on PostgreSQL) and a highlighted snippet of the question
+    terms = [(word, prefix) for word, prefix in _terms(q) if word]
+    if not terms:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        match = _fts5_query(terms)
+        fts = table(FTS_TABLE, column("rowid"))
+        rank = literal_column(f"bm25({FTS_TABLE}, {QUESTION_WEIGHT}, {OUTCOME_WEIGHT})")
+        snippet = literal_column(f"snippet({FTS_TABLE}, 0, '[', ']', '...', 12)")
+        query = db.query(models.Question, rank.label("rank"), snippet.label("snippet")).join(
+            fts, fts.c.rowid == models.Question.id
+        ).filter(text(f"{FTS_TABLE} MATCH :match")).params(match=match)
+        matches = db.execute(
+            text(f"SELECT count(*) FROM (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match LIMIT :cap)"),
+            {"match": match, "cap": RANK_MAX_MATCHES + 1},
+        ).scalar()
+        order = (rank, models.Question.id) if matches <= RANK_MAX_MATCHES else (fts.c.rowid.desc(),)
+    elif dialect == "postgresql":
+        vector = "to_tsvector('english', questions.question_text)"
+        tsquery = "to_tsquery('english', :match)"
+        rank = literal_column(f"ts_rank({vector}, {tsquery})")
+        snippet = literal_column(
+            f"ts_headline('english', questions.question_text, {tsquery}, 'StartSel=[, StopSel=], MaxWords=24')"
+        )
+        query = db.query(models.Question, rank.label("rank"), snippet.label("snippet")).filter(
+            text(f"{vector} @@ {tsquery}")
+        ).params(match=_tsquery(terms))
+        order = (rank.desc(), models.Question.id)
+    else:
+        # No full-text support; plain substring match on every word
+        rank = literal_column("0.0")
+        query = db.query(models.Question, rank.label("rank"), models.Question.question_text.label("snippet"))
+        for word, _ in terms:
+            query = query.filter(models.Question.question_text.ilike(f"%{word}%"))
+        order = (models.Question.id,)
+
+    query = _filters(query, course_id, unit_id, blooms_level_id, difficulty_level_id)
+    hits = []
+    for question, rank_value, snippet_value in query.order_by(*order).offset(skip).limit(limit):
+        question.rank = rank_value
+        question.snippet = snippet_value
+        hits.append(question)
+    return hits
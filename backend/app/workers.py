@@ -0,0 +1,27 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# One process pool per worker for CPU-bound work that must not hold the GIL of
+# the serving process: batch paper generation, duplicate index signing and PDF
+# rendering. Started on first use, so a worker that never needs it never forks.
+WORKER_PROCESSES = int(os.environ.get("WEBSAGA_BATCH_WORKERS", os.cpu_count() or 2))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=WORKER_PROCESSES)
+        return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
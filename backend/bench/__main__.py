@@ -0,0 +1,221 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# Load test and benchmark for the API. Seeds a synthetic dataset into its own
+# database, drives the routers in-process through an ASGI client and reports
+# latency percentiles and throughput per endpoint. Run from backend/:
+#
+#   python -m bench                          # seed a fresh bench.db and run
+#   python -m bench --reuse --concurrency 32 # keep the seeded database
+#   python -m bench --compare bench-old.json # print the change against a run
+#
+# The database URL must be set before the app is imported, so imports of app
+# modules happen inside main().
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    parser.add_argument("--database", default="bench.db", help="SQLite file to seed and run against")
+    parser.add_argument("--reuse", action="store_true",
+                        help="run against an already seeded database (pass the sizes it was seeded with)")
+    parser.add_argument("--branches", type=int, default=2000)
+    parser.add_argument("--courses", type=int, default=5000)
+    parser.add_argument("--faculties", type=int, default=5000)
+    parser.add_argument("--questions", type=int, default=100000)
+    parser.add_argument("--papers", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=1, help="seed for the dataset and the request mix")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight per endpoint")
+    parser.add_argument("--requests", type=int, default=300, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per endpoint")
+    parser.add_argument("--only", action="append", default=[], help="run only these scenarios (repeatable)")
+    parser.add_argument("--output", default=None, help="results file (default bench-<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    return parser.parse_args(argv)
+
+
+def scenarios(dataset):
+    # name -> (method, function(rng) returning (path, json body or None))
+    courses, papers = dataset["courses"], dataset["papers"]
+    words = ["algorithm", "stack", "database", "network", "thread", "circuit", "explain", "dynamic programming"]
+    return {
+        "programs_list": ("GET", lambda rng: ("/programs/", None)),
+        "branches_list": ("GET", lambda rng: ("/branches/?limit=100", None)),
+        "courses_list": ("GET", lambda rng: ("/courses/?limit=500", None)),
+        "courses_keyset": ("GET", lambda rng: (f"/courses/?limit=100&after_id={rng.randint(0, max(0, courses - 100))}", None)),
+        "course_detail": ("GET", lambda rng: (f"/courses/{rng.randint(1, courses)}", None)),
+        "faculties_list": ("GET", lambda rng: ("/faculties/?limit=500", None)),
+        "questions_by_course": ("GET", lambda rng: (f"/questions/?course_id={rng.randint(1, courses)}", None)),
+        "questions_search": ("GET", lambda rng: (f"/questions/search?q={rng.choice(words)}&limit=20", None)),
+        "generated_qps_list": ("GET", lambda rng: ("/generated_qps/?limit=100", None)),
+        "generated_qps_by_course": ("GET", lambda rng: (f"/generated_qps/course/{rng.randint(1, courses)}", None)),
+        "question_usage": ("GET", lambda rng: (f"/generated_qps/usage?course_id={rng.randint(1, courses)}", None)),
+        "paper_pdf": ("GET", lambda rng: (f"/generated_qps/{rng.randint(1, min(papers, 200))}/pdf", None)),
+        "generate_paper": ("POST", lambda rng: ("/generated_qps/generate", {
+            "course_id": rng.randint(1, courses), "total_marks": 15, "unit_counts": {"1": 1, "2": 1, "3": 1},
+            "avoid_reuse": rng.random() < 0.5,
+        })),
+    }
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, method, make_request, rng, total, concurrency):
+    requests = [make_request(rng) for _ in range(total)]
+    latencies = []
+    statuses = {}
+    queue = iter(requests)
+
+    async def worker():
+        for path, body in queue:
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    return time.perf_counter() - started, latencies, statuses
+
+
+def summarize(wall, latencies, statuses):
+    ordered = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+    return {
+        "requests": len(ordered),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(ordered) / wall, 1) if wall else None,
+        "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else None,
+        "p50_ms": ms(percentile(ordered, 0.50)),
+        "p95_ms": ms(percentile(ordered, 0.95)),
+        "p99_ms": ms(percentile(ordered, 0.99)),
+        "max_ms": ms(ordered[-1]) if ordered else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results, baseline=None):
+    header = f"{'scenario':<26}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+    if baseline:
+        header += f"{'p95 vs base':>14}"
+    print(header)
+    for name, result in results.items():
+        line = (f"{name:<26}{result['throughput_rps']:>9}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+                f"{result['p99_ms']:>10}{result['errors']:>8}")
+        before = (baseline or {}).get(name)
+        if before and before.get("p95_ms"):
+            line += f"{(result['p95_ms'] / before['p95_ms'] - 1) * 100:>+13.1f}%"
+        print(line)
+
+
+async def drive(app, dataset, args):
+    import httpx
+
+    rng = random.Random(args.seed)
+    selected = scenarios(dataset)
+    if args.only:
+        unknown = set(args.only) - set(selected)
+        if unknown:
+            raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        selected = {name: spec for name, spec in selected.items() if name in args.only}
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, (method, make_request) in selected.items():
+            if args.warmup:
+                await run_scenario(client, method, make_request, rng, args.warmup, args.concurrency)
+            results[name] = summarize(*await run_scenario(
+                client, method, make_request, rng, args.requests, args.concurrency
+            ))
+            print(f"  {name}: p95 {results[name]['p95_ms']} ms", file=sys.stderr)
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.reuse and os.path.exists(args.database):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.database + suffix):
+                os.remove(args.database + suffix)
+    os.environ["WEBSAGA_DATABASE_URL"] = f"sqlite:///{args.database}"
+    os.environ.setdefault("WEBSAGA_PDF_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(args.database)),
+                                                                "bench_pdf_cache"))
+    # Slow and N+1 requests are expected under load; keep the log readable
+    logging.getLogger("websaga.perf").setLevel(logging.ERROR)
+
+    from app.main import app
+    from app import migrations, workers
+    from bench import dataset
+
+    # The ASGI client does not run the lifespan
+    migrations.migrate()
+
+    sizes = {
+        "branches": args.branches, "courses": args.courses, "faculties": args.faculties,
+        "questions": args.questions, "papers": args.papers, "seed": args.seed,
+    }
+    if not args.reuse:
+        started = time.perf_counter()
+        print(f"Seeding {args.database} ...", file=sys.stderr)
+        dataset.seed(**sizes)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    try:
+        results = asyncio.run(drive(app, sizes, args))
+    finally:
+        workers.shutdown_executor()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "env": {key: value for key, value in os.environ.items() if key.startswith("WEBSAGA_")},
+            "dataset": sizes,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+        },
+        "results": results,
+    }
+    output = args.output or f"bench-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_table(results, baseline)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
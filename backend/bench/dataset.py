@@ -0,0 +1,141 @@
+import json
+import random
+from datetime import datetime
+from app import models, qp_items
+from app.database import SessionLocal, engine
+
+# Synthetic, reproducible dataset for the benchmarks. Everything is written
+# with executemany inserts in chunks, not through crud, so a 100k question
+# bank loads in seconds. Ids are dense from 1 because the database is fresh,
+# which lets the scenarios pick random ids without querying.
+CHUNK_SIZE = 5000
+
+PROGRAMS = ["B.Tech", "M.Tech", "MBA", "MCA", "B.Sc"]
+REGULATIONS = ["AR23", "AR21", "AR20"]
+BLOOMS = ["Remember", "Understand", "Apply", "Analyze", "Evaluate", "Create"]
+DIFFICULTY = ["Easy", "Medium", "Hard"]
+UNITS = 5
+COS_PER_COURSE = 5
+ASSESSMENTS = ["MID-1", "MID-2", "Regular", "Supply"]
+ACADEMIC_YEARS = ["2021-2022", "2022-2023", "2023-2024", "2024-2025", "2025-2026"]
+QUESTIONS_PER_PAPER = 6
+
+# Every synthetic question carries QUESTION_MARKS so any blueprint asking for
+# n questions totals n * QUESTION_MARKS and generation never fails on marks
+QUESTION_MARKS = 5.0
+
+_WORDS = (
+    "explain describe compare analyse design implement derive evaluate discuss illustrate algorithm "
+    "stack queue tree graph heap hash table sorting searching recursion dynamic programming greedy "
+    "network protocol routing database index transaction normalization query optimizer compiler "
+    "parser lexer grammar automaton memory cache process thread scheduling deadlock semaphore "
+    "circuit voltage current resistance transistor amplifier signal filter modulation antenna "
+    "thermodynamics entropy fluid beam stress strain torque gear bearing concrete steel survey "
+    "with suitable example in detail the following its advantages and limitations of for a given"
+).split()
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _insert(conn, model, rows):
+    for chunk in _chunks(rows):
+        conn.execute(model.__table__.insert(), chunk)
+
+
+def _sentence(rng):
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(10, 24))).capitalize() + "."
+
+
+def seed(branches=2000, courses=5000, faculties=5000, questions=100000, papers=50000, seed=1):
+    rng = random.Random(seed)
+    with engine.begin() as conn:
+        _insert(conn, models.Program, [{"name": name, "status": True} for name in PROGRAMS])
+        _insert(conn, models.Regulation, [{"name": name, "status": True} for name in REGULATIONS])
+        _insert(conn, models.BloomsLevel, [{"name": name, "status": True} for name in BLOOMS])
+        _insert(conn, models.DifficultyLevel, [{"name": name, "status": True} for name in DIFFICULTY])
+        _insert(conn, models.Unit, [{"name": f"Unit {i}", "status": True} for i in range(1, UNITS + 1)])
+
+        _insert(conn, models.Branch, [
+            {"name": f"Branch {i}", "code": f"B{i:05d}", "status": True} for i in range(1, branches + 1)
+        ])
+        branch_programs = [rng.randint(1, len(PROGRAMS)) for _ in range(branches)]
+        _insert(conn, models.ProgramBranchMapping, [
+            {"program_id": program_id, "branch_id": i, "status": True}
+            for i, program_id in enumerate(branch_programs, start=1)
+        ])
+
+        course_rows = [
+            {
+                "name": f"Course {i}", "code": f"C{i:06d}", "branch_id": rng.randint(1, branches),
+                "regulation_id": rng.randint(1, len(REGULATIONS)), "year": rng.choice(["I", "II", "III", "IV"]),
+                "semester": rng.choice(["I", "II"]), "course_type": "Theory", "elective_type": "CORE",
+                "credits": 3.0, "status": True,
+            }
+            for i in range(1, courses + 1)
+        ]
+        _insert(conn, models.Course, course_rows)
+        _insert(conn, models.CourseOutcome, [
+            {"course_id": course_id, "outcome_text": _sentence(rng), "status": True}
+            for course_id in range(1, courses + 1) for _ in range(COS_PER_COURSE)
+        ])
+
+        _insert(conn, models.Faculty, [
+            {
+                "user_type": "Faculty", "branch_id": rng.randint(1, branches), "honorific": "Dr.",
+                "name": f"Faculty {i}", "empid": f"E{i:06d}", "phone": f"9{i:09d}", "username": f"faculty{i}",
+                "email": f"faculty{i}@example.edu", "password_hash": "benchmark", "status": True,
+            }
+            for i in range(1, faculties + 1)
+        ])
+
+        # Questions are spread round-robin so every course gets a full bank
+        question_rows = []
+        course_questions = {}
+        for i in range(1, questions + 1):
+            course_id = (i - 1) % courses + 1
+            unit_id = (i - 1) // courses % UNITS + 1
+            course_questions.setdefault(course_id, []).append((i, unit_id))
+            question_rows.append({
+                "course_id": course_id, "co_id": (course_id - 1) * COS_PER_COURSE + rng.randint(1, COS_PER_COURSE),
+                "blooms_level_id": rng.randint(1, len(BLOOMS)), "difficulty_level_id": rng.randint(1, len(DIFFICULTY)),
+                "unit_id": unit_id, "question_text": _sentence(rng),
+                "marks": QUESTION_MARKS, "status": True,
+            })
+        _insert(conn, models.Question, question_rows)
+
+        created_at = datetime(2025, 1, 1).isoformat()
+        paper_rows = []
+        for _ in range(papers):
+            course_id = rng.randint(1, courses)
+            course = course_rows[course_id - 1]
+            bank = course_questions.get(course_id, [])
+            chosen = rng.sample(bank, min(QUESTIONS_PER_PAPER, len(bank)))
+            paper_rows.append({
+                "program_id": branch_programs[course["branch_id"] - 1], "course_id": course_id,
+                "assessment_type": rng.choice(ASSESSMENTS), "date_of_exam": "2025-03-01",
+                "regulation_id": course["regulation_id"], "year": course["year"], "semester": course["semester"],
+                "academic_year": rng.choice(ACADEMIC_YEARS),
+                "questions": json.dumps([
+                    {"id": question_id, "unit_id": unit_id, "marks": QUESTION_MARKS,
+                     "question_text": question_rows[question_id - 1]["question_text"]}
+                    for question_id, unit_id in chosen
+                ]),
+                "created_at": created_at,
+            })
+        _insert(conn, models.GeneratedQP, paper_rows)
+
+    # Papers were written as bare blobs, like rows that predate
+    # generated_qp_items; the migration fills in items and usage counters
+    db = SessionLocal()
+    try:
+        qp_items.backfill_items(db)
+    finally:
+        db.close()
+
+    return {
+        "branches": branches, "courses": courses, "faculties": faculties,
+        "questions": questions, "papers": papers, "seed": seed,
+    }
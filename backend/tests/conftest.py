@@ -0,0 +1,125 @@
+import os
+import tempfile
+import uuid
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+# The app's own engines are built at import time; point them at a scratch file
+# so importing app modules never touches a developer's websaga.db
+os.environ.setdefault("WEBSAGA_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/websaga-test.db")
+
+from app import cache, database, dedupe, migrations, models, qp_generator  # noqa: E402
+from app.database import build_engine  # noqa: E402
+
+# Tests taking the `engine` or `db` fixture run once per database. PostgreSQL
+# runs need WEBSAGA_TEST_POSTGRES_URL, a server URL whose user may create
+# databases (e.g. postgresql+psycopg2://postgres@localhost/postgres); a
+# throwaway database is created for the session and dropped afterwards.
+# Without it, or without a reachable server, those runs are skipped.
+POSTGRES_URL = os.environ.get("WEBSAGA_TEST_POSTGRES_URL")
+
+
+@pytest.fixture(scope="session")
+def postgres_engine():
+    if not POSTGRES_URL:
+        pytest.skip("WEBSAGA_TEST_POSTGRES_URL is not set")
+    try:
+        admin = create_engine(POSTGRES_URL, isolation_level="AUTOCOMMIT")
+        with admin.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:  # driver missing, server down, bad credentials
+        pytest.skip(f"PostgreSQL is not available: {e}")
+    name = f"websaga_test_{uuid.uuid4().hex[:12]}"
+    with admin.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE "{name}"'))
+    engine = build_engine(admin.url.set(database=name).render_as_string(hide_password=False))
+    try:
+        migrations.migrate(engine)
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{name}"'))
+        admin.dispose()
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def engine(request, tmp_path):
+    if request.param == "sqlite":
+        engine = build_engine(f"sqlite:///{tmp_path}/test.db")
+        migrations.migrate(engine)
+        yield engine
+        engine.dispose()
+        return
+    engine = request.getfixturevalue("postgres_engine")
+    yield engine
+    tables = [table.name for table in models.Base.metadata.sorted_tables
+              if table.name != models.SchemaMigration.__tablename__]
+    with engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE"))
+
+
+@pytest.fixture
+def db(engine):
+    session = Session(engine, autoflush=False, expire_on_commit=False)
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    # The API against the app's own engine (the scratch file above)
+    from fastapi.testclient import TestClient
+    from app.main import app
+    migrations.migrate(database.engine)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def reset_process_caches():
+    # Version snapshots and cached rows would otherwise leak between databases
+    cache.lookup_cache.clear()
+    cache._expire_versions()
+    qp_generator._pools.clear()
+    dedupe._indexed_courses.clear()
+    yield
+
+
+SAMPLE = {
+    "programs": ["B.Tech"],
+    "regulations": ["AR23"],
+    "blooms_levels": ["Remember", "Apply"],
+    "difficulty_levels": ["Easy", "Hard"],
+    "units": ["Unit 1", "Unit 2"],
+    "branches": [{"name": "Computer Science", "code": "CSE", "program": "B.Tech"}],
+    "courses": [{
+        "name": "Data Structures", "code": "CS201", "branch": "CSE", "regulation": "AR23", "year": "II",
+        "semester": "I", "course_type": "Theory", "elective_type": "CORE", "credits": 3.0,
+        "outcomes": ["Use linear data structures", "Analyse graph algorithms"],
+        "questions": [
+            {"co": 1, "unit": "Unit 1", "blooms": "Remember", "difficulty": "Easy", "marks": 2.0,
+             "text": "Define a stack and list its operations."},
+            {"co": 1, "unit": "Unit 1", "blooms": "Apply", "difficulty": "Hard", "marks": 5.0,
+             "text": "Implement a queue using two stacks and analyse the cost of each operation."},
+            {"co": 2, "unit": "Unit 2", "blooms": "Apply", "difficulty": "Hard", "marks": 10.0,
+             "text": "Explain Dijkstra's shortest path algorithm with a suitable example."},
+        ],
+    }],
+    "faculties": [{
+        "user_type": "Faculty", "branch": "CSE", "honorific": "Dr.", "name": "Test Faculty", "empid": "T001",
+        "phone": "9000000000", "username": "tester", "email": "tester@example.edu", "password": "secret",
+    }],
+}
+
+
+@pytest.fixture
+def sample(db):
+    # SAMPLE loaded through populate; returns the course
+    from app import populate
+    populate.load_fixture(db, SAMPLE)
+    db.commit()
+    return db.query(models.Course).filter(models.Course.code == "CS201").one()
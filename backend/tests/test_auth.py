@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy.orm import Session
+from app import auth, database, models
+
+
+def test_hash_round_trip():
+    stored = auth.get_password_hash("s3cret")
+    assert stored.startswith("scrypt$") and "s3cret" not in stored
+    assert auth.verify_password("s3cret", stored)
+    assert not auth.verify_password("wrong", stored)
+    assert not auth.needs_rehash(stored)
+
+
+def test_plaintext_rows_still_verify_and_need_rehash():
+    assert auth.verify_password("1234", "1234")
+    assert not auth.verify_password("12345", "1234")
+    assert auth.needs_rehash("1234")
+
+
+def test_tokens_are_signed_and_expire():
+    faculty = models.Faculty(id=7, name="Test Faculty", user_type="Faculty")
+    token = auth.issue_token(faculty, now=1000)
+    claims = auth.verify_token(token, now=1001)
+    assert (claims["sub"], claims["role"], claims["exp"]) == (7, "Faculty", 1000 + auth.TOKEN_TTL_SECONDS)
+    assert auth.verify_token(token, now=1000 + auth.TOKEN_TTL_SECONDS) is None
+    payload, signature = token.split(".")
+    forged = auth._b64encode(auth._b64decode(payload).replace(b'"Faculty"', b'"Admin"'))
+    assert auth.verify_token(f"{forged}.{signature}", now=1001) is None
+    assert auth.verify_token("garbage", now=1001) is None
+
+
+@pytest.fixture
+def plaintext_user(client):
+    with Session(database.engine) as db:
+        db.query(models.Faculty).filter(models.Faculty.username == "login-test").delete()
+        db.add(models.Faculty(user_type="Faculty", honorific="Dr.", name="Login Test", empid="L001", phone="1",
+                              username="login-test", email="login-test@example.edu", password_hash="1234", status=True))
+        db.commit()
+
+
+def test_login_issues_token_and_rehashes_plaintext(client, plaintext_user):
+    assert client.post("/auth/login", json={"username": "login-test", "password": "wrong"}).status_code == 401
+    assert client.post("/auth/login", json={"username": "nobody", "password": "1234"}).status_code == 401
+    response = client.post("/auth/login", json={"username": "login-test", "password": "1234"})
+    assert response.status_code == 200
+    token = response.json()["access_token"]
+    with Session(database.engine) as db:
+        stored = db.query(models.Faculty.password_hash).filter(models.Faculty.username == "login-test").scalar()
+    assert stored.startswith("scrypt$") and auth.verify_password("1234", stored)
+    # The upgraded row still logs in
+    assert client.post("/auth/login", json={"username": "login-test", "password": "1234"}).status_code == 200
+
+    me = client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert me.status_code == 200 and me.json()["name"] == "Login Test"
+    assert client.get("/auth/me").status_code == 401
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {token}x"}).status_code == 401
@@ -0,0 +1,32 @@
+from sqlalchemy.orm import Session
+from app import crud, database, schemas
+
+
+def _write_elsewhere(name):
+    # A write committed by another worker process: this process hears about
+    # it only through the cache_versions table, not through on_commit
+    with Session(database.engine) as db:
+        crud.create_program(db, schemas.ProgramCreate(name=name))
+        db.info.pop("on_commit", None)
+        db.commit()
+
+
+def test_etag_and_body_change_together(client):
+    _write_elsewhere("ETag A")
+    first = client.get("/programs/?limit=1000")
+    assert "ETag A" in [program["name"] for program in first.json()]
+    _write_elsewhere("ETag B")
+    second = client.get("/programs/?limit=1000")
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert "ETag B" in [program["name"] for program in second.json()]
+    # The body that goes with an ETag is the one a revalidation vouches for
+    assert client.get("/programs/?limit=1000", headers={"If-None-Match": second.headers["ETag"]}).status_code == 304
+
+
+def test_same_second_if_modified_since_is_not_304(client):
+    _write_elsewhere("Same second")
+    response = client.get("/programs/?limit=1000")
+    last_modified = response.headers["Last-Modified"]
+    # Another write may land later in the second Last-Modified names
+    again = client.get("/programs/?limit=1000", headers={"If-Modified-Since": last_modified})
+    assert again.status_code == 200 and again.headers["ETag"] == response.headers["ETag"]
@@ -0,0 +1,22 @@
+import asyncio
+from sqlalchemy.orm import Session
+from app import database
+
+
+def _first(dependency):
+    async def session():
+        generator = dependency()
+        db = await generator.__anext__()
+        await generator.aclose()
+        return db
+    return asyncio.run(session())
+
+
+def test_sync_session_stays_on_the_threadpool_in_async_mode(monkeypatch):
+    monkeypatch.setattr(database, "USE_ASYNC_DB", True)
+    async_factory = object()
+    monkeypatch.setattr(database, "AsyncSessionLocal", async_factory, raising=False)
+    assert database._session_factory(read_only=False) is async_factory
+    assert database._session_factory(read_only=False, sync=True) is database.SessionLocal
+    db = _first(database.get_sync_session)
+    assert isinstance(db.session, Session) and not db.is_async
@@ -0,0 +1,113 @@
+from app import cache, crud, dedupe, models, populate, qp_items, schemas, search
+from conftest import SAMPLE
+
+
+def test_populate_is_idempotent(db, sample):
+    assert populate.load_fixture(db, SAMPLE) == {
+        "programs": 0, "regulations": 0, "blooms_levels": 0, "difficulty_levels": 0, "units": 0,
+        "branches": 0, "program_branch_mappings": 0, "courses": 0, "course_outcomes": 0, "questions": 0,
+        "faculties": 0,
+    }
+    db.commit()
+    assert db.query(models.Question).count() == 3
+    assert db.query(models.ProgramBranchMapping).count() == 1
+
+
+def test_branch_carries_program_name(db):
+    program = crud.create_program(db, schemas.ProgramCreate(name="M.Tech"))
+    branch = crud.create_branch(db, schemas.BranchCreate(name="VLSI", code="VLSI", program_id=program.id))
+    db.commit()
+    assert branch.program_name == "M.Tech"
+    assert crud.get_branch.uncached(db, branch.id).program_name == "M.Tech"
+    assert crud.get_branch(db, branch.id).program_name == "M.Tech"
+
+
+def test_branch_program_name_sees_other_writers(db):
+    program = crud.create_program(db, schemas.ProgramCreate(name="M.Tech"))
+    crud.create_branch(db, schemas.BranchCreate(name="VLSI", code="VLSI", program_id=program.id))
+    db.commit()
+    # Renamed behind crud's back, as another worker process would
+    db.execute(models.Program.__table__.update().values(name="M.E."))
+    db.commit()
+    branch = crud.create_branch(db, schemas.BranchCreate(name="Embedded", code="EMB", program_id=program.id))
+    assert branch.program_name == "M.E."
+
+
+def test_bump_counts_versions(db):
+    cache.bump(db, "programs")
+    cache.bump(db, "programs", "branches")
+    db.commit()
+    versions = cache.table_versions(db, ("programs", "branches", "courses"))
+    assert {table: version for table, (version, _) in versions.items()} == {"programs": 2, "branches": 1, "courses": 0}
+
+
+def test_keyset_pages_cover_the_bank(db, sample):
+    first = crud.get_questions(db, sample.id, limit=2)
+    rest = crud.get_questions(db, sample.id, limit=2, after_id=first[-1]["id"])
+    assert [q["id"] for q in first + rest] == sorted(q.id for q in db.query(models.Question))
+
+
+def test_record_usage_accumulates(db, sample):
+    questions = db.query(models.Question).order_by(models.Question.id).all()
+    first, second = questions[0].id, questions[1].id
+    qp_items.record_usage(db, {first: (sample.id, 1, "2023-2024"), second: (sample.id, 1, "2024-2025")})
+    qp_items.record_usage(db, {first: (sample.id, 2, "2024-2025")})
+    db.commit()
+    usage = qp_items.question_usage(db, sample.id)
+    assert usage[first] == (3, "2024-2025")
+    assert usage[second] == (1, "2024-2025")
+
+
+def test_duplicate_index_flags_rewording(db, sample):
+    original = db.query(models.Question).filter(models.Question.question_text.like("Explain Dijkstra%")).one()
+    created = crud.create_question(db, schemas.QuestionCreate(
+        course_id=sample.id, co_id=original.co_id, blooms_level_id=original.blooms_level_id,
+        difficulty_level_id=original.difficulty_level_id, unit_id=original.unit_id, marks=10.0,
+        question_text="Explain Dijkstra's shortest path algorithm with an example.",
+    ))
+    db.commit()
+    assert [match["question_id"] for match in created.possible_duplicates] == [original.id]
+    # Indexing is idempotent on every dialect
+    dedupe._insert_bands(db, dedupe.band_rows([(created.id, sample.id, created.question_text)]))
+    db.commit()
+    assert db.query(models.QuestionLSHBand).filter(models.QuestionLSHBand.question_id == created.id).count() == dedupe.BANDS
+
+
+def test_search_finds_question(db, sample):
+    hits = search.search_questions(db, "dijkstra", course_id=sample.id)
+    assert [hit.question_text for hit in hits] == ["Explain Dijkstra's shortest path algorithm with a suitable example."]
+    assert search.search_questions(db, "dijkstra", course_id=sample.id + 1) == []
+
+
+def test_bulk_delete_reports_rows_in_use(db, sample):
+    program = db.query(models.Program).one()
+    spare = crud.create_branch(db, schemas.BranchCreate(name="Robotics", code="ROB", program_id=program.id))
+    db.commit()
+    result = crud.bulk_delete_branches(db, [sample.branch_id, spare.id, 999])
+    db.commit()
+    assert result["deleted"] == 1 and result["ids"] == [None, spare.id, None]
+    assert [error["index"] for error in result["errors"]] == [0, 2]
+    assert "in use by courses" in result["errors"][0]["error"]
+    # The deleted branch takes its program mapping with it; the used one keeps its own
+    mapped = {branch_id for (branch_id,) in db.query(models.ProgramBranchMapping.branch_id)}
+    assert mapped == {sample.branch_id}
+
+
+def test_atomic_bulk_delete_keeps_everything(db, sample):
+    program = db.query(models.Program).one()
+    spare = crud.create_program(db, schemas.ProgramCreate(name="MBA"))
+    db.commit()
+    result = crud.bulk_delete_programs(db, [spare.id, program.id], atomic=True)
+    db.commit()
+    assert result["deleted"] == 0 and result["errors"][0]["index"] == 1
+    assert db.query(models.Program).count() == 2
+
+
+def test_rebuild_usage_leaves_the_commit_to_the_caller(db, sample):
+    question = db.query(models.Question).first()
+    qp_items.record_usage(db, {question.id: (sample.id, 2, "2024-2025")})
+    db.commit()
+    qp_items.rebuild_usage(db)
+    db.rollback()
+    # No papers exist, so a committed rebuild would have cleared the counter
+    assert qp_items.question_usage(db, sample.id) == {question.id: (2, "2024-2025")}
@@ -0,0 +1,18 @@
+from types import SimpleNamespace
+from app import jobs
+
+
+def test_finished_jobs_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(jobs.time, "monotonic", lambda: now[0])
+    registry = jobs.JobRegistry(retention_seconds=60, max_finished=2)
+    running, first, second, third = (SimpleNamespace(id=name) for name in ("running", "first", "second", "third"))
+    for job in (running, first, second, third):
+        registry.add(job)
+    for job in (first, second, third):
+        registry.finish(job)
+    # Only the two most recently finished are kept
+    assert [job.id for job in registry.list()] == ["running", "second", "third"]
+    now[0] += 61
+    assert registry.get("third") is None
+    assert registry.list() == [running]
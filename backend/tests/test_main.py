@@ -0,0 +1,12 @@
+from fastapi.testclient import TestClient
+from app import main, migrations, workers
+
+
+def test_lifespan_checks_schema_and_stops_the_pool(monkeypatch):
+    calls = []
+    monkeypatch.setattr(migrations, "check_schema", lambda: calls.append("check_schema"))
+    monkeypatch.setattr(workers, "shutdown_executor", lambda: calls.append("shutdown_executor"))
+    with TestClient(main.app) as client:
+        assert calls == ["check_schema"]
+        assert client.get("/").status_code == 200
+    assert calls == ["check_schema", "shutdown_executor"]
@@ -0,0 +1,54 @@
+import glob
+import os
+import pytest
+from app import paper_pdf
+
+# A Unicode TrueType font for the embedded-font tests; DejaVu is on most Linux
+# systems, otherwise set WEBSAGA_TEST_PDF_FONT
+FONT = os.environ.get("WEBSAGA_TEST_PDF_FONT") or next(iter(sorted(
+    glob.glob("/usr/share/fonts/**/DejaVuSans.ttf", recursive=True)
+)), None)
+
+
+def _document(*texts):
+    return {
+        "id": 1, "title": "CS201 - Data Structures", "assessment_type": "Mid-1", "academic_year": "2024-2025",
+        "year": "II", "semester": "I", "regulation": "AR23", "date_of_exam": "2024-10-01", "total_marks": 10.0,
+        "questions": [{"section": "Part A", "marks": 2.0, "text": text} for text in texts],
+    }
+
+
+@pytest.fixture
+def embedded_font(monkeypatch):
+    if FONT is None:
+        pytest.skip("no Unicode TrueType font found; set WEBSAGA_TEST_PDF_FONT")
+    monkeypatch.setattr(paper_pdf, "PDF_FONT", FONT)
+    monkeypatch.setattr(paper_pdf, "PDF_BOLD_FONT", FONT)
+
+
+def test_standard_fonts_render_winansi():
+    document = _document("Define a stack (LIFO) \\ queue – “quoted”.")
+    data = paper_pdf.render_paper(document)
+    assert data.startswith(b"%PDF-1.4") and b"/BaseFont /Helvetica " in data
+    assert paper_pdf.render_paper(document) == data
+
+
+def test_standard_fonts_refuse_maths_and_greek():
+    document = _document("Show that n ≤ 2π for Ω(n) with α, β and x₁.")
+    assert paper_pdf.unrenderable(document) == ["Ω", "α", "β", "π", "₁", "≤"]
+    with pytest.raises(paper_pdf.UnrenderableText):
+        paper_pdf.render_paper(document)
+
+
+def test_embedded_font_renders_maths_and_greek(embedded_font):
+    document = _document("Show that n ≤ 2π for Ω(n) with α and β.")
+    assert paper_pdf.unrenderable(document) == []
+    data = paper_pdf.render_paper(document)
+    assert b"/Subtype /CIDFontType2" in data and b"/FontFile2" in data and b"/ToUnicode" in data
+
+
+def test_content_key_follows_the_font(embedded_font):
+    document = _document("Define a stack.")
+    key = paper_pdf.content_key(document)
+    paper_pdf.PDF_FONT = paper_pdf.PDF_BOLD_FONT = None
+    assert paper_pdf.content_key(document) != key
@@ -0,0 +1,23 @@
+from app import crud, models, qp_generator, schemas
+
+
+def test_pools_are_bounded(db, sample, monkeypatch):
+    monkeypatch.setattr(qp_generator, "_pools", qp_generator.LRUCache(2, qp_generator.POOL_TTL_SECONDS))
+    for course_id in (sample.id, sample.id + 1, sample.id + 2):
+        qp_generator.get_pool(db, course_id)
+    assert qp_generator._pools.stats()["size"] == 2
+    assert qp_generator._pools.get(sample.id) == (False, None)
+
+
+def test_new_question_invalidates_pool(db, sample):
+    pool = qp_generator.get_pool(db, sample.id)
+    assert len(pool) == 3 and qp_generator.get_pool(db, sample.id) is pool
+    question = db.query(models.Question).first()
+    crud.create_question(db, schemas.QuestionCreate(
+        course_id=sample.id, co_id=question.co_id, blooms_level_id=question.blooms_level_id,
+        difficulty_level_id=question.difficulty_level_id, unit_id=question.unit_id, marks=2.0,
+        question_text="What is a circular queue?",
+    ))
+    assert qp_generator.get_pool(db, sample.id) is pool
+    db.commit()
+    assert len(qp_generator.get_pool(db, sample.id)) == 4
@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy import text
+from app import migrations, query_plans
+from app.database import build_engine
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    # Plans do not depend on the data, so an empty migrated database will do
+    engine = build_engine(f"sqlite:///{tmp_path}/plans.db")
+    migrations.migrate(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name, call, table, indexes", query_plans.HOT_QUERIES,
+                         ids=[name for name, *_ in query_plans.HOT_QUERIES])
+def test_hot_query_uses_its_index(sqlite_engine, name, call, table, indexes):
+    # No SCAN of the table, and every SEARCH through an expected index
+    assert query_plans.check_query(sqlite_engine, call, table, indexes) == []
+
+
+def test_check_reports_a_dropped_index(sqlite_engine):
+    with sqlite_engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_course_outcomes_course"))
+    assert [name for name, _ in query_plans.check(sqlite_engine)] == ["course outcomes of a course"]